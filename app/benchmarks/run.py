@@ -0,0 +1,234 @@
+"""
+End-to-end benchmark of the survey pipeline on synthetic surveys, fully offline.
+
+Usage (from the app directory):
+    python -m benchmarks.run --sizes 1k,10k,100k
+    python -m benchmarks.run --sizes 1m --questions 40 --anonymous-ratio 0.5
+    python -m benchmarks.run --update-baseline
+
+Each stage (ingest, schema introspection, SQL execution, chart config generation,
+a bar chart of a low-cardinality question, stats, serialization, streaming CSV/NDJSON export) is timed with a stub LLM and stub survey API, its peak
+Python memory is recorded with tracemalloc, and results are compared against
+benchmarks/baselines.json. The exit code is 1 when a stage regresses by more
+than the threshold. Raising a stage's baseline needs a --justify note, which is
+kept in baselines.json next to the numbers.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, Any, List, Tuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Time and memory below these floors is noise; a stage is only compared above them
+SECONDS_FLOOR = 0.05
+PEAK_MB_FLOOR = 1.0
+STAGES = ["ingest", "schema", "sql_execution", "chart_config", "chart_low_cardinality", "stats", "serialization",
+          "export_csv", "export_ndjson"]
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith("k"):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+def measure(fn: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """
+    Fastest wall time over repeats (the least disturbed by other work on the machine),
+    then one extra run under tracemalloc for peak memory.
+    """
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(timings), 6), "peak_mb": round(peak / (1024 * 1024), 3)}
+
+
+def run_size(survey_id: int, answer_rows: int, questions: int, anonymous_ratio: float,
+             repeats: int) -> Dict[str, Dict[str, float]]:
+    from helpers import fetcher
+    from helpers.processor import SQLProcessor
+    from helpers.graph import VisualizationRecommendation, BarChart
+    from helpers.export import validate_export, export_stream
+    from benchmarks.synthetic import generate_entries, question_text, StubSurveyAPI
+
+    entries = generate_entries(answer_rows, questions, anonymous_ratio)
+    fetcher.http_session = StubSurveyAPI(entries, [question_text(i) for i in range(1, questions + 1)])
+
+    results = {}
+    results["ingest"] = measure(lambda: fetcher.get_data_from_api(survey_id, refresh=True), repeats)
+
+    processor = SQLProcessor(survey_id=survey_id)
+    question = "How do ratings of the service differ by district?"
+
+    def introspect():
+        processor.get_table_info()
+        processor.get_table_columns()
+        processor.schema.render(question)
+
+    results["schema"] = measure(introspect, repeats)
+
+    sql = f'SELECT * FROM "{processor.table_name}"'
+    results["sql_execution"] = measure(lambda: processor.execute_query(sql, preprocess=False), repeats)
+
+    query_result = processor.execute_query(sql, preprocess=False)
+    results["chart_config"] = measure(lambda: processor.create_visualizations(query_result, question), repeats)
+    # Seven districts over every row: the common dashboard-style chart, counted without re-running the query
+    district = next(column for column in query_result["columns"] if "district" in column)
+    districts = VisualizationRecommendation(
+        recommendations=[BarChart(x_column=district, y_column=None, title="Districts", color_column=None)],
+        reasoning="benchmark"
+    )
+    results["chart_low_cardinality"] = measure(
+        lambda: processor.create_visualizations(query_result, question, districts), repeats
+    )
+    results["stats"] = measure(processor.get_aggregated_stats, repeats)
+
+    response = {
+        "success": True,
+        "sql_query": sql,
+        "query_result": query_result,
+        "visualizations": processor.create_visualizations(query_result, question),
+    }
+    results["serialization"] = measure(lambda: json.dumps(response, default=str), repeats)
+
+    db_path, table_name = fetcher.get_data_from_api(survey_id)
+    for format in ("csv", "ndjson"):
+        columns = validate_export(db_path, table_name, format)
+        results[f"export_{format}"] = measure(
+            lambda: sum(len(chunk) for chunk in export_stream(db_path, table_name, format, columns)), repeats
+        )
+    return results
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Tuple[str, str, float, float]]:
+    """
+    (size/stage, metric, measured, baseline) for every stage slower or larger than its
+    baseline by more than threshold. Values under the noise floors never count.
+    """
+    regressions = []
+    for size, stages in report.items():
+        for stage, values in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            if not expected:
+                continue
+            for metric, floor in (("seconds", SECONDS_FLOOR), ("peak_mb", PEAK_MB_FLOOR)):
+                limit = max(expected[metric], floor) * (1 + threshold)
+                if values[metric] > limit:
+                    regressions.append((f"{size}/{stage}", metric, values[metric], expected[metric]))
+    return regressions
+
+
+def parse_justifications(notes: List[str]) -> Dict[str, str]:
+    """
+    --justify values of the form size/stage=reason.
+    """
+    justifications = {}
+    for note in notes:
+        key, _, reason = note.partition("=")
+        if "/" not in key or not reason.strip():
+            raise SystemExit(f"--justify expects size/stage=reason, got: {note}")
+        justifications[key.strip()] = reason.strip()
+    return justifications
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end survey pipeline benchmark")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="answer row counts, e.g. 1k,10k,100k,1m")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--anonymous-ratio", type=float, default=0.3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated LLM latency in seconds")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--justify", action="append", default=[], metavar="SIZE/STAGE=REASON",
+                        help="why a stage's baseline is raised; required for each raised stage")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    # Configure before helpers are imported: isolated data dir, stub LLM, no network
+    data_dir = os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="surveybot-bench-")
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_LATENCY"] = str(args.llm_latency)
+    os.environ.setdefault("SQLITE_REPLICA_MODE", "off")
+    # Stages are timed uncached; repeated runs would otherwise measure shared cache hits
+    os.environ.setdefault("SHARED_CACHE", "false")
+
+    report = {}
+    try:
+        for offset, size in enumerate(args.sizes.split(",")):
+            label = size.strip().lower()
+            report[label] = run_size(900000 + offset, parse_size(label), args.questions,
+                                     args.anonymous_ratio, args.repeats)
+            print(f"\n== {label} answer rows ({args.questions} questions, {args.anonymous_ratio:.0%} anonymous)")
+            print(f"{'stage':<24}{'seconds':>12}{'peak MB':>12}")
+            for stage in STAGES:
+                values = report[label][stage]
+                print(f"{stage:<24}{values['seconds']:>12.4f}{values['peak_mb']:>12.2f}")
+    finally:
+        # The generated surveys are only needed while they are measured
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+
+    regressions = compare(report, baseline, args.threshold)
+    if args.update_baseline:
+        justifications = parse_justifications(args.justify)
+        raised = {key for key, *_ in regressions}
+        unjustified = sorted(raised - set(justifications))
+        if unjustified:
+            print("\nBaseline not updated; these stages would be raised without a --justify note:")
+            for key in unjustified:
+                print(f"  {key}")
+            return 1
+        # Only stages that moved beyond the threshold are rewritten, so noise does not churn the file
+        previous = {size: baseline[size] for size in report if size in baseline}
+        moved = raised | {key for key, *_ in compare(previous, report, args.threshold)}
+        for size, stages in report.items():
+            for stage, values in stages.items():
+                if stage not in baseline.get(size, {}) or f"{size}/{stage}" in moved:
+                    baseline.setdefault(size, {})[stage] = values
+        baseline.setdefault("justifications", {}).update(
+            {key: reason for key, reason in justifications.items() if key in raised}
+        )
+        with open(args.baseline, "w") as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\nRegressions:")
+        for key, metric, measured, expected in regressions:
+            print(f"  {key} {metric}: {measured} > {expected} (+{args.threshold:.0%})")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Cold start benchmark: import cost of the API process, per module.
+
+Usage (from the app directory):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --module helpers.processor --top 30
+    python -m benchmarks.startup --max-seconds 1.5
+
+Each run imports the target in a fresh interpreter with `python -X importtime`,
+so nothing is cached in sys.modules. The report lists the total wall time, the
+slowest modules by cumulative import time and the cost of the lazily imported
+LLM/visualization stack (helpers.processor) on top of main. The exit code is 1
+when the median import time of the target exceeds --max-seconds.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, Any, List
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "-- target --"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def import_profile(module: str, preload: str = "") -> Dict[str, Any]:
+    """
+    Import module in a fresh interpreter and parse the -X importtime report.
+    Modules imported by preload are excluded from the report.
+    """
+    code = (f"import sys, time; {f'import {preload}; ' if preload else ''}"
+            f"sys.stderr.write('{MARKER}\\n'); t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t)")
+    env = dict(os.environ, DATA_DIR=os.environ.get("DATA_DIR") or tempfile.mkdtemp(prefix="surveybot-startup-"))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    process_seconds = time.perf_counter() - started
+
+    modules = []
+    for line in completed.stderr.split(MARKER, 1)[-1].splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2
+            })
+    return {
+        "import_seconds": float(completed.stdout.strip().splitlines()[-1]),
+        "process_seconds": process_seconds,
+        "modules": modules
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    last = runs[-1]
+    slowest = sorted(last["modules"], key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+    # Group by top-level package so third party stacks (langchain, fastapi, ...) stand out
+    packages: Dict[str, float] = {}
+    for entry in last["modules"]:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + entry["self_ms"]
+    return {
+        "import_seconds": round(statistics.median(run["import_seconds"] for run in runs), 4),
+        "process_seconds": round(statistics.median(run["process_seconds"] for run in runs), 4),
+        "slowest_modules": slowest,
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top])
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import cost of the API process")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--lazy", default="helpers.processor", help="lazily imported module to cost on top of --module")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--max-seconds", type=float, help="fail when the median import time exceeds this")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = {args.module: summarize([import_profile(args.module) for _ in range(args.repeats)], args.top)}
+    if args.lazy:
+        report[args.lazy] = summarize(
+            [import_profile(args.lazy, preload=args.module) for _ in range(args.repeats)], args.top
+        )
+
+    for module, summary in report.items():
+        label = module if module == args.module else f"{module} (after {args.module})"
+        print(f"\n== import {label}: {summary['import_seconds']:.3f}s "
+              f"(interpreter total {summary['process_seconds']:.3f}s)")
+        print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+        for entry in summary["slowest_modules"]:
+            print(f"{entry['cumulative_ms']:>14.1f}{entry['self_ms']:>10.1f}  {'  ' * entry['depth']}{entry['module']}")
+        print(f"\n{'self ms':>14}  package")
+        for package, self_ms in summary["packages_ms"].items():
+            print(f"{self_ms:>14.1f}  {package}")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.max_seconds is not None and report[args.module]["import_seconds"] > args.max_seconds:
+        print(f"\nimport {args.module} took {report[args.module]['import_seconds']:.3f}s > {args.max_seconds}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Synthetic survey data and a stand-in for the survey API, for offline benchmarks.
+"""
+
+import random
+from typing import List, Dict, Any
+from urllib.parse import urlparse, parse_qs
+
+CHOICES = ["Strongly agree", "Agree", "Neutral", "Disagree", "Strongly disagree"]
+DISTRICTS = ["North", "South", "East", "West", "Central", "Coastal", "Highlands"]
+
+
+def question_text(index: int) -> str:
+    kind = index % 4
+    if kind == 0:
+        return f"Q{index} How would you rate the service from 1 to 10?"
+    if kind == 1:
+        return f"Q{index} Do you agree that the program helped you?"
+    if kind == 2:
+        return f"Q{index} Which district do you live in?"
+    return f"Q{index} Did you attend the training session?"
+
+
+def answer_for(index: int, rng: random.Random) -> str:
+    kind = index % 4
+    if kind == 0:
+        return str(rng.randint(1, 10))
+    if kind == 1:
+        return rng.choice(CHOICES)
+    if kind == 2:
+        return rng.choice(DISTRICTS)
+    return rng.choice(["Yes", "No"])
+
+
+def generate_entries(answer_rows: int, questions: int = 20, anonymous_ratio: float = 0.3,
+                     seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Build survey API answer entries (one per respondent per question) totalling answer_rows.
+    """
+    rng = random.Random(seed)
+    texts = [question_text(i) for i in range(1, questions + 1)]
+    entries = []
+    respondent = 0
+    while len(entries) < answer_rows:
+        respondent += 1
+        anonymous = rng.random() < anonymous_ratio
+        for index, text in enumerate(texts, start=1):
+            if len(entries) >= answer_rows:
+                break
+            entry = {
+                "question": text,
+                "surAnswer": answer_for(index, rng),
+                "responseId": f"r{respondent}",
+            }
+            if not anonymous:
+                entry["contactId"] = f"c{respondent}"
+                entry["name"] = f"Respondent {respondent}"
+            entries.append(entry)
+    return entries
+
+
+class StubResponse:
+    def __init__(self, payload: Dict[str, Any]):
+        self._payload = payload
+        self.status_code = 200
+
+    def json(self) -> Dict[str, Any]:
+        return self._payload
+
+    def raise_for_status(self):
+        return None
+
+
+class StubSurveyAPI:
+    """
+    Serves synthetic entries with the same paging and login shapes as the real
+    survey API. Drop-in replacement for helpers.fetcher.http_session.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], questions: List[str], page_size: int = 1000):
+        self.entries = entries
+        self.questions = questions
+        self.page_size = page_size
+        self.calls = 0
+
+    def post(self, url: str, json=None, headers=None, **kwargs) -> StubResponse:
+        self.calls += 1
+        return StubResponse({"access_token": "benchmark-token"})
+
+    def get(self, url: str, headers=None, **kwargs) -> StubResponse:
+        self.calls += 1
+        query = parse_qs(urlparse(url).query)
+        if "page" in query:
+            page = int(query["page"][0])
+            last_page = max(1, -(-len(self.entries) // self.page_size))
+            start = (page - 1) * self.page_size
+            return StubResponse({
+                "data": {
+                    "meta": {"lastPage": last_page},
+                    "data": self.entries[start:start + self.page_size],
+                }
+            })
+        return StubResponse({
+            "success": True,
+            "data": {
+                "survey": {
+                    "pages": [{"questions": [{"question": text} for text in self.questions]}]
+                }
+            }
+        })
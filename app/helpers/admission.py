@@ -0,0 +1,196 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+from .metrics import registry, Gauge, Histogram, Counter
+
+# Priorities: lower is served first
+PRIORITY_CHEAP = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+POOL_LIMITS = {
+    "llm": int(os.getenv("ADMISSION_LLM_CONCURRENCY", "4")),
+    "ingest": int(os.getenv("ADMISSION_INGEST_CONCURRENCY", "1")),
+    "sql": int(os.getenv("ADMISSION_SQL_CONCURRENCY", str(os.cpu_count() or 4))),
+}
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Longest a request may spend waiting for slots; stays well under nginx's 60s proxy_read_timeout
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20"))
+# Work outside a request (background refreshes) may wait longer
+BACKGROUND_TIMEOUT = float(os.getenv("ADMISSION_BACKGROUND_TIMEOUT", "600"))
+
+queue_depth = registry.register(Gauge("surveybot_admission_queue_depth", "Work waiting for a slot per pool"))
+active_slots = registry.register(Gauge("surveybot_admission_active", "Slots in use per pool"))
+wait_seconds = registry.register(Histogram("surveybot_admission_wait_seconds", "Time spent waiting for a slot"))
+shed_total = registry.register(Counter("surveybot_admission_shed_total", "Work turned away per pool and reason"))
+
+_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar("admission_request", default=None)
+
+
+class Overloaded(Exception):
+    """
+    Raised when work cannot get a slot before its deadline or the wait queue is full.
+    """
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Server busy ({pool}); retry in {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """
+    Bounded concurrency for one kind of work with a bounded priority wait queue.
+    Waiters are served by (priority, arrival) and give up at their deadline.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = MAX_QUEUE):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.avg_hold = 1.0  # EWMA of seconds a slot is held, seeds Retry-After
+
+    def retry_after(self) -> int:
+        backlog = (len(self._waiting) + 1) / self.limit
+        return max(1, int(round(backlog * self.avg_hold)))
+
+    def _publish(self):
+        queue_depth.set(len(self._waiting), pool=self.name)
+        active_slots.set(self.active, pool=self.name)
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None):
+        started = time.monotonic()
+        deadline = deadline if deadline is not None else started + QUEUE_TIMEOUT
+        with self._cond:
+            if self.active < self.limit and not self._waiting:
+                self.active += 1
+                self.admitted += 1
+                self._publish()
+                wait_seconds.observe(0.0, pool=self.name)
+                return
+            if len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                shed_total.inc(pool=self.name, reason="queue_full")
+                raise Overloaded(self.name, self.retry_after())
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            self._publish()
+            try:
+                while not (self._waiting[0] == ticket and self.active < self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        shed_total.inc(pool=self.name, reason="deadline")
+                        raise Overloaded(self.name, self.retry_after())
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiting)
+                self.active += 1
+                self.admitted += 1
+            except Overloaded:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._publish()
+                # Let the next waiter re-check whether it is now at the head
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        wait_seconds.observe(waited, pool=self.name)
+        with self._cond:
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def release(self, held: float):
+        with self._cond:
+            self.active -= 1
+            self.avg_hold = 0.8 * self.avg_hold + 0.2 * held
+            self._publish()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "queue_depth": len(self._waiting),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "rejected": self.rejected,
+                "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+                "max_wait_seconds": round(self.max_wait, 4),
+                "avg_hold_seconds": round(self.avg_hold, 4)
+            }
+
+
+class AdmissionController:
+    """
+    Separate pools for LLM calls, ingests and SQL execution so one kind of
+    expensive work cannot starve the others.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, max_queue: int = MAX_QUEUE):
+        self.pools = {name: AdmissionPool(name, limit, max_queue) for name, limit in (limits or POOL_LIMITS).items()}
+
+    @contextmanager
+    def slot(self, pool: str):
+        """
+        Hold a slot of the pool for the block, queueing with the current request's
+        priority and deadline (background work queues behind requests).
+        """
+        current = _request.get()
+        if current is None:
+            priority, deadline = PRIORITY_BACKGROUND, time.monotonic() + BACKGROUND_TIMEOUT
+        else:
+            priority, deadline = current["priority"], current["deadline"]
+        target = self.pools[pool]
+        target.acquire(priority, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            target.release(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+admission = AdmissionController()
+
+
+@contextmanager
+def admitted_request(priority: int = PRIORITY_NORMAL, timeout: float = QUEUE_TIMEOUT):
+    """
+    Scope for one API request: slots taken inside it wait at most until the request's deadline.
+    """
+    token = _request.set({"priority": priority, "deadline": time.monotonic() + timeout})
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def set_priority(priority: int):
+    """
+    Reclassify the current request once its cost is known (e.g. a fast path match).
+    """
+    current = _request.get()
+    if current is not None:
+        current["priority"] = priority
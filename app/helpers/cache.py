@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional
+
+from .pool import pooled_reader, pooled_writer
+from .storage import storage
+
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE", "true").lower() == "true"
+
+
+class SharedCache:
+    """
+    Small key/value cache in a SQLite file under DATA_DIR, shared by all worker
+    processes. Values are stored as JSON in namespaces (auth, schema, query, ...)
+    with an optional TTL; each namespace can be capped to its newest entries.
+    """
+
+    def __init__(self, path: str, enabled: bool = SHARED_CACHE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with pooled_writer(self.path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires REAL,
+                        created REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                """)
+            self._initialized = True
+
+    def _count(self, namespace: str, event: str):
+        with self._stats_lock:
+            counts = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0})
+            counts[event] += 1
+
+    def get(self, namespace: str, key: str, touch: bool = False) -> Optional[Any]:
+        """
+        Cached value or None. touch=True marks a hit as recently used, making
+        max_entries evict least recently used entries instead of oldest writes.
+        """
+        if not self.enabled:
+            return None
+        self._ensure_initialized()
+        with pooled_reader(self.path) as conn:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        self._count(namespace, "hits" if row else "misses")
+        if row and touch:
+            with pooled_writer(self.path) as conn:
+                conn.execute("UPDATE cache SET created = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key))
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None,
+            max_entries: Optional[int] = None):
+        if not self.enabled:
+            return
+        self._ensure_initialized()
+        now = time.time()
+        with pooled_writer(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires, created) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, default=str), now + ttl if ttl else None, now)
+            )
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND expires <= ?", (namespace, now))
+            if max_entries:
+                conn.execute(
+                    """
+                    DELETE FROM cache WHERE namespace = ? AND key NOT IN (
+                        SELECT key FROM cache WHERE namespace = ? ORDER BY created DESC LIMIT ?
+                    )
+                    """,
+                    (namespace, namespace, max_entries)
+                )
+        self._count(namespace, "writes")
+
+    def delete(self, namespace: str, key: str):
+        if not self.enabled:
+            return
+        self._ensure_initialized()
+        with pooled_writer(self.path) as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counts of this worker and entries stored per namespace.
+        """
+        entries = {}
+        if self.enabled:
+            self._ensure_initialized()
+            with pooled_reader(self.path) as conn:
+                entries = dict(conn.execute("SELECT namespace, COUNT(*) FROM cache GROUP BY namespace").fetchall())
+        with self._stats_lock:
+            counts = {namespace: dict(values) for namespace, values in self._stats.items()}
+        return {"enabled": self.enabled, "path": self.path, "entries": entries, "worker": counts}
+
+
+def file_key(path: str) -> str:
+    """
+    Cache key for an immutable snapshot file, including its mtime so a recreated file never hits stale entries.
+    """
+    return f"{path}@{os.stat(path).st_mtime_ns}"
+
+
+shared_cache = SharedCache(os.path.join(storage.data_dir, "cache.db"))
@@ -0,0 +1,114 @@
+import json
+import time
+import hashlib
+from typing import Dict, Any, List
+
+# Internal tables start with an underscore and are left out of the SQL prompts
+CATALOG_TABLE = "_questions"
+CATALOG_META_TABLE = "_questions_meta"
+CATALOG_FIELDS = ("question_id", "text", "page", "page_order", "column_name", "question_type", "options", "source")
+
+
+def catalog_hash(entries: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(entries, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_catalog(conn) -> List[Dict[str, Any]]:
+    """
+    Question catalog stored in a snapshot, in survey order. Empty for snapshots ingested
+    before the catalog existed.
+    """
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join(CATALOG_FIELDS)} FROM {CATALOG_TABLE} ORDER BY position"
+        ).fetchall()
+    except Exception:
+        return []
+    entries = []
+    for row in rows:
+        entry = dict(zip(CATALOG_FIELDS, row))
+        entry["options"] = json.loads(entry["options"] or "[]")
+        entries.append(entry)
+    return entries
+
+
+def store_catalog(conn, entries: List[Dict[str, Any]]) -> bool:
+    """
+    Save the catalog into a snapshot being built. The snapshot starts as a copy of the
+    previous one, so the tables are only rewritten when the catalog changed. Returns
+    whether they were.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+            position INTEGER PRIMARY KEY,
+            question_id TEXT,
+            text TEXT NOT NULL,
+            page INTEGER,
+            page_order INTEGER,
+            column_name TEXT NOT NULL,
+            question_type TEXT,
+            options TEXT NOT NULL,
+            source TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_META_TABLE} (
+            catalog_hash TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    digest = catalog_hash(entries)
+    stored = conn.execute(f"SELECT catalog_hash FROM {CATALOG_META_TABLE}").fetchone()
+    if stored is not None and stored[0] == digest:
+        return False
+
+    conn.execute(f"DELETE FROM {CATALOG_TABLE}")
+    conn.executemany(
+        f"INSERT INTO {CATALOG_TABLE} (position, {', '.join(CATALOG_FIELDS)}) "
+        f"VALUES (?, {', '.join('?' for _ in CATALOG_FIELDS)})",
+        [
+            (position, *[json.dumps(entry[field]) if field == "options" else entry[field] for field in CATALOG_FIELDS])
+            for position, entry in enumerate(entries, start=1)
+        ]
+    )
+    conn.execute(f"DELETE FROM {CATALOG_META_TABLE}")
+    conn.execute(f"INSERT INTO {CATALOG_META_TABLE} (catalog_hash, updated_at) VALUES (?, ?)", (digest, time.time()))
+    return True
+
+
+def column_descriptions(entries: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Original question text per column (the first question when several share a column).
+    """
+    descriptions = {}
+    for entry in entries:
+        descriptions.setdefault(entry["column_name"], entry["text"])
+    return descriptions
+
+
+def order_columns(columns: List[str], entries: List[Dict[str, Any]]) -> List[str]:
+    """
+    Question columns in survey order; columns missing from the catalog follow in table order.
+    """
+    present = set(columns)
+    ordered = [column for column in dict.fromkeys(entry["column_name"] for entry in entries) if column in present]
+    listed = set(ordered)
+    return ordered + [column for column in columns if column not in listed]
+
+
+def describe_columns(columns: List[str], entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Question columns in survey order, each with the original text and type of its question.
+    Both are None for columns missing from the catalog.
+    """
+    questions = {}
+    for entry in entries:
+        questions.setdefault(entry["column_name"], entry)
+    return [
+        {
+            "column_name": column,
+            "text": questions.get(column, {}).get("text"),
+            "question_type": questions.get(column, {}).get("question_type")
+        }
+        for column in order_columns(columns, entries)
+    ]
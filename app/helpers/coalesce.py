@@ -0,0 +1,37 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .metrics import coalesced_waiters, record_cache
+
+
+class Coalescer:
+    """
+    Single flight for async work in one worker: while a computation for a key is running,
+    later calls with the same key await its result instead of starting their own. The
+    number of requests that joined each computation is observed when it finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        record_cache(self.name, future is not None)
+        if future is None:
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            self._waiters[key] = 0
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._waiters[key] += 1
+        # Shielded so a client that disconnects does not cancel the computation for the others
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, done: asyncio.Future):
+        self._inflight.pop(key, None)
+        coalesced_waiters.observe(self._waiters.pop(key, 0), name=self.name)
+        if not done.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            done.exception()
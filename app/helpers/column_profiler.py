@@ -0,0 +1,125 @@
+import os
+import re
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Results larger than this are profiled on a uniform random sample of this many rows
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "10000"))
+# Columns with more distinct values (identifiers, free text) have only their most common ones parsed
+PROFILE_MAX_DISTINCT = int(os.getenv("PROFILE_MAX_DISTINCT", "1000"))
+# Share of non-null values that must parse for a column to count as numerical or datetime
+PROFILE_TYPE_THRESHOLD = float(os.getenv("PROFILE_TYPE_THRESHOLD", "0.9"))
+
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$")
+
+
+def parse_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) else None
+
+
+def column_arrays(data: List[Dict], columns: List[str], limit: int = PROFILE_SAMPLE_ROWS) -> List[tuple]:
+    """
+    One tuple of values per column, from all rows or a seeded uniform sample of limit rows.
+    """
+    if len(data) > limit:
+        indices = np.sort(np.random.default_rng(0).choice(len(data), limit, replace=False))
+        data = [data[i] for i in indices.tolist()]
+    if not data or not columns:
+        return [() for _ in columns]
+    rows = list(map(itemgetter(*columns), data))
+    return list(zip(*rows)) if len(columns) > 1 else [tuple(rows)]
+
+
+def profile_column(values: tuple) -> Dict[str, Any]:
+    """
+    Kind, null share, numeric/date parsable shares, cardinality and numeric range of one column.
+    Values are counted once and each distinct value is parsed once. Text columns with more than
+    PROFILE_MAX_DISTINCT distinct values have their shares and range estimated from the most common ones.
+    """
+    counts = Counter(values)
+    nulls = counts.pop(None, 0) + counts.pop("", 0)
+    present = parsed_rows = len(values) - nulls
+
+    numbers, weights, dates = [], [], 0
+    try:
+        # Fast path: every distinct value is a number or numeric text
+        numbers = np.asarray(list(counts), dtype=float)
+        weights = np.fromiter(counts.values(), dtype=float, count=len(counts))
+        finite = np.isfinite(numbers)
+        numbers, weights = numbers[finite], weights[finite]
+    except (TypeError, ValueError):
+        numbers, weights = [], []
+        parsed = counts if len(counts) <= PROFILE_MAX_DISTINCT else dict(counts.most_common(PROFILE_MAX_DISTINCT))
+        parsed_rows = sum(parsed.values())
+        for value, count in parsed.items():
+            number = parse_number(value)
+            if number is not None:
+                numbers.append(number)
+                weights.append(count)
+            elif isinstance(value, str) and ISO_DATE.match(value):
+                dates += count
+
+    numeric_share = float(np.sum(weights)) / parsed_rows if parsed_rows else 0.0
+    date_share = dates / parsed_rows if parsed_rows else 0.0
+    if not present:
+        kind = "empty"
+    elif numeric_share >= PROFILE_TYPE_THRESHOLD:
+        kind = "numerical"
+    elif date_share >= PROFILE_TYPE_THRESHOLD:
+        kind = "datetime"
+    else:
+        kind = "categorical"
+
+    profile = {
+        "kind": kind,
+        "null_share": round(nulls / len(values), 4) if values else 0.0,
+        "numeric_share": round(numeric_share, 4),
+        "date_share": round(date_share, 4),
+        "distinct": len(counts),
+        "unique": present > 1 and len(counts) == present
+    }
+    if len(numbers):
+        array, weight = np.asarray(numbers), np.asarray(weights)
+        profile.update({
+            "min": float(array.min()),
+            "max": float(array.max()),
+            "mean": round(float(np.average(array, weights=weight)), 4)
+        })
+    return profile
+
+
+def profile_columns(data: List[Dict], columns: List[str], limit: int = PROFILE_SAMPLE_ROWS) -> Dict[str, Any]:
+    """
+    Profile of every column of a query result. Distinct counts are of the sample when the result is sampled.
+    """
+    arrays = column_arrays(data, columns, limit)
+    return {
+        "rows": len(data),
+        "sampled_rows": min(len(data), limit),
+        "columns": {column: profile_column(values) for column, values in zip(columns, arrays)}
+    }
+
+
+def describe_column(name: str, profile: Dict[str, Any]) -> str:
+    """
+    Compact description for the chart recommendation prompt, e.g. score(numerical, 5 distinct, range 1–5).
+    """
+    details = [profile["kind"], f"{profile['distinct']} distinct"]
+    if profile["unique"]:
+        details.append("unique")
+    if profile["null_share"]:
+        details.append(f"{profile['null_share']:.0%} null")
+    if profile["kind"] == "numerical" and "min" in profile:
+        details.append(f"range {profile['min']:g}–{profile['max']:g}")
+    return f"{name}({', '.join(details)})"
@@ -0,0 +1,177 @@
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+from .replica import replicas
+from .snapshots import pinned_snapshot, resolve_snapshot, snapshots
+from .cache import shared_cache, file_key
+from .catalog import load_catalog, column_descriptions, describe_columns, order_columns
+
+# Internal tables start with an underscore and are left out of the SQL prompts
+DASHBOARD_TABLE = "_dashboard"
+# Bump when the dashboard layout changes; snapshots holding an older format are rebuilt on read
+DASHBOARD_FORMAT = 3
+META_COLUMNS = ("contact_id", "name", "is_anonymous")
+# Categorical questions with at most this many distinct answers get a doughnut instead of a bar chart
+DOUGHNUT_MAX_ANSWERS = 5
+
+
+def runner(conn):
+    """
+    Query function for SQLSource over a plain connection.
+    """
+    return lambda sql, params=(): conn.execute(sql, params).fetchall()
+
+
+def question_charts(conn, table_name: str, questions: List[str],
+                    descriptions: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    One chart per question, chosen from the profile of its answers: histograms or counts for
+    numbers, a doughnut or bar of answer counts for short categorical answers, responses per
+    day for dates. Free text and empty questions get no chart. Titles use the question text
+    from descriptions (column -> text) when given.
+    """
+    # The chart models and NumPy are imported here so they stay off the API's startup path
+    from .column_profiler import profile_column, PROFILE_SAMPLE_ROWS
+    from .graph import SQLSource, BarChart, DoughnutChart, LineChart, CHART_MAX_CATEGORIES, quote
+
+    run = runner(conn)
+    if not questions:
+        return []
+    total = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    order = " ORDER BY random()" if total > PROFILE_SAMPLE_ROWS else ""
+    sample = run(f"SELECT {', '.join(quote(q) for q in questions)} FROM {table_name}{order} LIMIT {PROFILE_SAMPLE_ROWS}")
+    columns = list(zip(*sample)) if sample else [() for _ in questions]
+
+    charts = []
+    for question, values in zip(questions, columns):
+        profile = profile_column(values)
+        kind, column = profile["kind"], quote(question)
+        text = (descriptions or {}).get(question, question)
+        title = f"Answers to {text}"
+        if kind == "numerical":
+            chart = BarChart(x_column=question, y_column=None, title=title, color_column=None)
+            config = chart.aggregate_config(SQLSource(
+                f"SELECT {column} FROM {table_name} WHERE {column} IS NOT NULL AND {column} != ''", run
+            ), {"columns": {question: profile}})
+        elif kind == "categorical" and profile["distinct"] <= DOUGHNUT_MAX_ANSWERS:
+            chart = DoughnutChart(values_column="count", names_column="answer", title=title)
+            config = chart.aggregate_config(SQLSource(
+                f"SELECT {column} AS answer, 1 AS count FROM {table_name} WHERE {column} IS NOT NULL AND {column} != ''", run
+            ))
+        elif kind == "categorical" and profile["distinct"] <= CHART_MAX_CATEGORIES:
+            chart = BarChart(x_column=question, y_column=None, title=title, color_column=None)
+            config = chart.aggregate_config(SQLSource(
+                f"SELECT {column} FROM {table_name} WHERE {column} IS NOT NULL AND {column} != ''", run
+            ))
+        elif kind == "datetime":
+            chart = LineChart(x_column="day", y_column="count", title=f"Responses per day: {text}", color_column=None)
+            config = chart.aggregate_config(SQLSource(
+                f"SELECT substr({column}, 1, 10) AS day, COUNT(*) AS count FROM {table_name} "
+                f"WHERE {column} IS NOT NULL GROUP BY 1 ORDER BY 1", run
+            ))
+        else:
+            continue
+        charts.append({
+            "question": question,
+            "text": text,
+            "kind": kind,
+            "chart_type": chart.chart_type,
+            "title": chart.title,
+            "config": config
+        })
+    return charts
+
+
+def build_dashboard(conn, survey_id: int, table_name: str, data_version: Optional[int]) -> Dict[str, Any]:
+    """
+    Default dashboard of a survey without any LLM call: response counts, the anonymous split
+    and one chart per question.
+    """
+    from .graph import SQLSource, PieChart
+
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})").fetchall()]
+    catalog = load_catalog(conn)
+    questions = order_columns([column for column in columns if column not in META_COLUMNS], catalog)
+    total, anonymous = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(is_anonymous = 1), 0) FROM {table_name}"
+    ).fetchone()
+
+    split = PieChart(values_column="count", names_column="respondent_type", title="Anonymous vs named responses")
+    split_config = split.aggregate_config(SQLSource(
+        f"SELECT CASE WHEN is_anonymous = 1 THEN 'Anonymous' ELSE 'Named' END AS respondent_type, "
+        f"1 AS count FROM {table_name}",
+        runner(conn)
+    ))
+
+    return {
+        "survey_id": survey_id,
+        "format": DASHBOARD_FORMAT,
+        "data_version": data_version,
+        "built_at": time.time(),
+        "summary": {
+            "total_responses": total,
+            "anonymous_responses": anonymous,
+            "named_responses": total - anonymous,
+            "total_questions": len(questions),
+            "questions": describe_columns(questions, catalog)
+        },
+        "charts": [
+            {"question": None, "text": None, "kind": "summary", "chart_type": split.chart_type, "title": split.title, "config": split_config}
+        ] + question_charts(conn, table_name, questions, column_descriptions(catalog))
+    }
+
+
+def store_dashboard(conn, dashboard: Dict[str, Any]):
+    """
+    Save a dashboard into a snapshot being built, replacing any copied from the previous version.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DASHBOARD_TABLE} (
+            format INTEGER PRIMARY KEY,
+            data_version INTEGER,
+            built_at REAL NOT NULL,
+            content TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"DELETE FROM {DASHBOARD_TABLE}")
+    conn.execute(
+        f"INSERT INTO {DASHBOARD_TABLE} (format, data_version, built_at, content) VALUES (?, ?, ?, ?)",
+        (dashboard["format"], dashboard["data_version"], dashboard["built_at"], json.dumps(dashboard, default=str))
+    )
+
+
+def precompute_dashboard(conn, survey_id: int, table_name: str, data_version: Optional[int]):
+    """
+    Build and store the dashboard during ingest. Failures are reported, never raised: the
+    dashboard is rebuilt on first read instead.
+    """
+    try:
+        store_dashboard(conn, build_dashboard(conn, survey_id, table_name, data_version))
+    except Exception as e:
+        print(f"Error precomputing dashboard for survey {survey_id}: {e}")
+
+
+def load_dashboard(db_path: str, survey_id: int, table_name: str) -> Dict[str, Any]:
+    """
+    The dashboard stored in the current snapshot: one indexed read. Snapshots from before the
+    dashboard existed (or with an older format) are read-only, so their dashboard is built
+    once and kept in the shared cache instead.
+    """
+    with pinned_snapshot(db_path), replicas.reader(db_path) as conn:
+        try:
+            row = conn.execute(
+                f"SELECT content FROM {DASHBOARD_TABLE} WHERE format = ?", (DASHBOARD_FORMAT,)
+            ).fetchone()
+        except Exception:
+            row = None
+        if row is not None:
+            return json.loads(row[0])
+
+        cache_key = file_key(resolve_snapshot(db_path))
+        cached = shared_cache.get("dashboard", cache_key)
+        if cached is not None:
+            return cached
+        dashboard = build_dashboard(conn, survey_id, table_name, snapshots.current_version(db_path))
+    shared_cache.set("dashboard", cache_key, dashboard, max_entries=256)
+    return dashboard
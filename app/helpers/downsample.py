@@ -0,0 +1,98 @@
+import os
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Most points a line or scatter chart sends to the browser
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+
+
+def to_float(values: Sequence) -> np.ndarray:
+    """
+    Values as a float array, NaN where a value is missing or not numeric (answers are often numeric TEXT).
+    """
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        converted = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                converted[i] = float(value)
+            except (TypeError, ValueError):
+                converted[i] = np.nan
+        return converted
+
+
+def lttb(y: Sequence, target: int = CHART_MAX_POINTS, x: Optional[Sequence] = None) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets: the first and last
+    point plus, per bucket, the point forming the largest triangle with the previously
+    kept point and the mean of the next bucket. x defaults to the position, which is
+    how Chart.js spaces category labels. Missing y values count as 0 when choosing.
+    """
+    n = len(y)
+    if target >= n or target < 3:
+        return np.arange(n) if target >= n else np.linspace(0, n - 1, max(target, 1)).astype(int)
+
+    ys = np.nan_to_num(to_float(y))
+    xs = np.arange(n, dtype=float) if x is None else np.nan_to_num(to_float(x))
+    # target - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, target - 1).astype(int)
+    sums_x = np.add.reduceat(xs[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(ys[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    means_x = np.append(sums_x / sizes, xs[-1])
+    means_y = np.append(sums_y / sizes, ys[-1])
+
+    kept = np.empty(target, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(target - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = means_x[bucket + 1], means_y[bucket + 1]
+        areas = np.abs(
+            (xs[previous] - next_x) * (ys[start:end] - ys[previous])
+            - (xs[previous] - xs[start:end]) * (next_y - ys[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def grid_sample(x: Sequence, y: Sequence, target: int = CHART_MAX_POINTS,
+                groups: Optional[Sequence] = None, seed: int = 0) -> np.ndarray:
+    """
+    Indices of at most target points for a scatter chart: one point per occupied cell
+    of a sqrt(target) x sqrt(target) grid (per group, so small groups survive), topped
+    up with a random sample of the rest so dense regions still look dense. Sorted, and
+    deterministic for a given seed.
+    """
+    n = len(x)
+    if n <= target:
+        return np.arange(n)
+
+    side = max(1, int(math.sqrt(target)))
+    cells = []
+    for values in (to_float(x), to_float(y)):
+        finite = np.isfinite(values)
+        low = values[finite].min() if finite.any() else 0.0
+        high = values[finite].max() if finite.any() else 0.0
+        scaled = (values - low) / (high - low) * side if high > low else np.zeros(n)
+        # Non-numeric values share one extra cell per axis
+        cells.append(np.where(finite, np.clip(scaled, 0, side - 1), side).astype(int))
+    key = cells[0] * (side + 1) + cells[1]
+    if groups is not None:
+        codes = {group: code for code, group in enumerate(dict.fromkeys(groups))}
+        key = key + np.array([codes[group] for group in groups]) * (side + 1) ** 2
+
+    _, first = np.unique(key, return_index=True)
+    rng = np.random.default_rng(seed)
+    if len(first) >= target:
+        return np.sort(rng.choice(first, target, replace=False))
+    rest = np.setdiff1d(np.arange(n), first, assume_unique=True)
+    return np.sort(np.concatenate([first, rng.choice(rest, target - len(first), replace=False)]))
+
+
+def take(values: List, indices: np.ndarray) -> List:
+    return [values[i] for i in indices.tolist()]
@@ -0,0 +1,173 @@
+import io
+import os
+import csv
+import json
+from typing import Dict, Any, List, Optional, Iterator
+
+from .pool import pooled_reader
+from .snapshots import snapshots
+
+# Rows fetched from the cursor and encoded per chunk; memory stays proportional to this, not to the survey
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_FORMATS: Dict[str, Dict[str, str]] = {
+    "csv": {"media_type": "text/csv; charset=utf-8", "extension": "csv"},
+    "ndjson": {"media_type": "application/x-ndjson", "extension": "ndjson"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+    "arrow": {"media_type": "application/vnd.apache.arrow.stream", "extension": "arrows"},
+}
+
+
+class ExportError(Exception):
+    """
+    Raised for export requests that cannot be served (unknown format or column, pyarrow not installed).
+    """
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ExportError("Parquet and Arrow exports require pyarrow (see requirements.txt)")
+
+
+def export_columns(conn, table_name: str, requested: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    """
+    Name and declared type of the columns to export, in table order unless a subset is requested.
+    """
+    available = [(row[1], (row[2] or "").upper()) for row in conn.execute(f"PRAGMA table_info({table_name})").fetchall()]
+    if not requested:
+        return [{"name": name, "type": declared} for name, declared in available]
+    declared = dict(available)
+    unknown = [name for name in requested if name not in declared]
+    if unknown:
+        raise ExportError(f"Unknown columns: {', '.join(unknown)}")
+    return [{"name": name, "type": declared[name]} for name in dict.fromkeys(requested)]
+
+
+def validate_export(db_path: str, table_name: str, format: str, requested: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    """
+    Check an export request before any bytes are streamed, so errors can still become HTTP statuses.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format '{format}'; use one of {', '.join(EXPORT_FORMATS)}")
+    if format in ("parquet", "arrow"):
+        require_pyarrow()
+    with pooled_reader(snapshots.current_path(db_path)) as conn:
+        return export_columns(conn, table_name, requested)
+
+
+def iter_chunks(db_path: str, table_name: str, columns: List[Dict[str, str]],
+                chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """
+    Rows of the current snapshot in chunks straight from the cursor. The snapshot is pinned
+    explicitly (not through pinned_snapshot) because a streaming response resumes this
+    generator on different threadpool threads.
+    """
+    path = snapshots.acquire(db_path)
+    if path is None:
+        return
+    try:
+        with pooled_reader(path) as conn:
+            selected = ", ".join('"' + column["name"].replace('"', '""') + '"' for column in columns)
+            cursor = conn.execute(f"SELECT {selected} FROM {table_name} ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        snapshots.release(path)
+
+
+def encode_csv(chunks: Iterator[List[tuple]], columns: List[Dict[str, str]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column["name"] for column in columns])
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks: Iterator[List[tuple]], columns: List[Dict[str, str]]) -> Iterator[bytes]:
+    names = [column["name"] for column in columns]
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in rows).encode()
+
+
+class _Sink:
+    """
+    Write-only file object that hands out what was written since the last drain.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def arrow_schema(pa, columns: List[Dict[str, str]]):
+    types = {"INTEGER": pa.int64(), "BOOLEAN": pa.bool_(), "REAL": pa.float64()}
+    return pa.schema([(column["name"], types.get(column["type"], pa.string())) for column in columns])
+
+
+def arrow_array(pa, values: tuple, type):
+    # SQLite has no boolean storage class; BOOLEAN columns come back as 0/1
+    if type == pa.bool_():
+        values = [None if value is None else bool(value) for value in values]
+    return pa.array(list(values), type=type)
+
+
+def encode_arrow(chunks: Iterator[List[tuple]], columns: List[Dict[str, str]], parquet: bool) -> Iterator[bytes]:
+    """
+    Parquet (one row group per chunk) or Arrow IPC stream (one record batch per chunk).
+    """
+    pa = require_pyarrow()
+    schema = arrow_schema(pa, columns)
+    sink = _Sink()
+    if parquet:
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in chunks:
+            arrays = [arrow_array(pa, values, field.type) for values, field in zip(zip(*rows), schema)]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            if parquet:
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(db_path: str, table_name: str, format: str, columns: List[Dict[str, str]],
+                  chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Encoded bytes of the survey table, produced chunk by chunk.
+    """
+    chunks = iter_chunks(db_path, table_name, columns, chunk_rows)
+    if format == "csv":
+        return encode_csv(chunks, columns)
+    if format == "ndjson":
+        return encode_ndjson(chunks, columns)
+    return encode_arrow(chunks, columns, parquet=format == "parquet")
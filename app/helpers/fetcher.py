@@ -1,23 +1,73 @@
 import requests
-import sqlite3
 import os
+import json
+import hashlib
+from collections import Counter
 from contextlib import contextmanager
+from .pool import pooled_writer
+from .replica import replicas
+from .snapshots import snapshots
+from .storage import storage
+from .metrics import span
+from .profiler import profiled
+from .cache import shared_cache
+from .admission import admission, Overloaded
+from .dashboard import precompute_dashboard
+from .catalog import load_catalog, store_catalog
 
 
 SURVEY_API_USERNAME = os.getenv("SURVEY_API_USERNAME")
 SURVEY_API_PASSWORD = os.getenv("SURVEY_API_PASSWORD")
+# Access tokens are shared by all workers through the on-disk cache
+AUTH_TOKEN_TTL = float(os.getenv("AUTH_TOKEN_TTL", "1800"))
+
+# Answer entry fields identifying the submission an answer belongs to, checked in order
+SUBMISSION_ID_FIELDS = ("responseId", "submissionId", "surveyResponseId")
+
+# One keep-alive session for all survey API calls; benchmarks swap in a stub
+http_session = requests.Session()
+
+
+def get_auth_headers(refresh=False):
+    """
+    Bearer headers for the survey API, reusing a cached access token unless refresh is set.
+    Returns None when login does not yield a token.
+    """
+    token = None if refresh else shared_cache.get("auth", SURVEY_API_USERNAME or "")
+    if not token:
+        url = "https://testing.scale1.api.crm.onowenable.com/api/login"
+        payload = {
+            "username": SURVEY_API_USERNAME,
+            "password": SURVEY_API_PASSWORD
+        }
+        headers = {
+            "Content-Type": "application/json"
+        }
+
+        with span("login"):
+            response = http_session.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            token = response.json().get("access_token")
+
+        if not token:
+            return None
+        shared_cache.set("auth", SURVEY_API_USERNAME or "", token, ttl=AUTH_TOKEN_TTL)
+
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+
+
+def is_unauthorized(error):
+    return isinstance(error, requests.HTTPError) and error.response is not None and error.response.status_code == 401
 
 
 @contextmanager
 def get_db_connection(db_path):
-    conn = sqlite3.connect(db_path, timeout=30)
-    try:
-        conn.execute('PRAGMA journal_mode=WAL;')
-        conn.execute('PRAGMA synchronous=NORMAL;')
+    # Ingest shares the survey's single pooled writer; WAL is set once when it is opened
+    with pooled_writer(db_path) as conn:
         yield conn
-    finally:
-        conn.commit()
-        conn.close()
 
 
 def sanitize_column_name(text):
@@ -53,43 +103,144 @@ def ensure_table_exists(cursor, survey_id, questions):
                 cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN "{col}" TEXT')
 
 
+def submission_id(entry):
+    for field in SUBMISSION_ID_FIELDS:
+        value = entry.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def anonymous_ids(entries):
+    """
+    Stable contact_id for each anonymous answer entry (None for named ones), the same for
+    every answer of one submission. Entries carrying a submission id use it. Otherwise
+    consecutive anonymous entries form one submission until a question repeats, and the id
+    is a hash of its answers, numbered when identical submissions occur, so ids survive
+    refreshes as long as the answers do.
+    """
+    ids = [None] * len(entries)
+    run, asked, occurrences = [], set(), Counter()
+
+    def close_run():
+        if not run:
+            return
+        answers = sorted((entries[i].get("question") or "", str(entries[i].get("surAnswer"))) for i in run)
+        digest = hashlib.sha1(json.dumps(answers).encode()).hexdigest()[:16]
+        occurrences[digest] += 1
+        key = f"anon_{digest}" if occurrences[digest] == 1 else f"anon_{digest}_{occurrences[digest]}"
+        for i in run:
+            ids[i] = key
+        run.clear()
+        asked.clear()
+
+    for i, entry in enumerate(entries):
+        if entry.get("contactId"):
+            close_run()
+            continue
+        submission = submission_id(entry)
+        if submission is not None:
+            close_run()
+            ids[i] = f"anon_{submission}"
+            continue
+        question = entry.get("question")
+        if question in asked:
+            close_run()
+        run.append(i)
+        asked.add(question)
+    close_run()
+    return ids
+
+
+def fetch_survey_definition(auth_headers, survey_id):
+    """
+    The survey definition (pages and their questions), or None when it cannot be fetched.
+    An expired token is raised so the ingest retries after logging in again.
+    """
+    url = f"https://testing.survey.api.crm.onowenable.com/api/surveys/{survey_id}"
+    try:
+        with span("page_fetch"):
+            resp = http_session.get(url, headers=auth_headers)
+            resp.raise_for_status()
+            survey_data = resp.json()
+        return survey_data if survey_data.get("success") else None
+    except Exception as e:
+        if is_unauthorized(e):
+            raise
+        print(f"Error fetching survey definition {survey_id}: {e}")
+        return None
+
+
+def question_catalog(definition, answered, previous):
+    """
+    Catalog entries for a new snapshot: the definition's questions in page order, then
+    questions only seen in answers, in first-seen order. Without a definition the
+    definition entries of the previous catalog are kept.
+    """
+    if definition is not None:
+        entries = extract_question_catalog(definition)
+    else:
+        entries = [entry for entry in previous if entry["source"] == "definition"]
+    known = {entry["text"] for entry in entries}
+    for text in answered:
+        if text in known:
+            continue
+        known.add(text)
+        entries.append({
+            "question_id": None,
+            "text": text,
+            "page": None,
+            "page_order": None,
+            "column_name": sanitize_column_name(text),
+            "question_type": None,
+            "options": [],
+            "source": "responses"
+        })
+    return entries
+
+
+@profiled("ingest")
 def fetch_all_survey_responses(auth_headers, survey_id, db_path):
     try:
-        anon_counter = 1
         url = f"https://testing.survey.api.crm.onowenable.com/api/surveys/responses/all?surveyId={survey_id}&page=1"
-        resp = requests.get(url, headers=auth_headers)
-        resp.raise_for_status()
-        data = resp.json()
+        with span("page_fetch"):
+            resp = http_session.get(url, headers=auth_headers)
+            resp.raise_for_status()
+            data = resp.json()
         last_page = data["data"]["meta"]["lastPage"]
 
         all_entries = []
 
         for page in range(1, last_page + 1):
             url = f"https://testing.survey.api.crm.onowenable.com/api/surveys/responses/all?surveyId={survey_id}&page={page}"
-            resp = requests.get(url, headers=auth_headers)
-            resp.raise_for_status()
-            page_data = resp.json()["data"]["data"]
+            with span("page_fetch"):
+                resp = http_session.get(url, headers=auth_headers)
+                resp.raise_for_status()
+                page_data = resp.json()["data"]["data"]
             all_entries.extend(page_data)
 
-        questions = set(entry["question"] for entry in all_entries if entry.get("question"))
+        # Answered questions in first-seen order
+        questions = list(dict.fromkeys(entry["question"] for entry in all_entries if entry.get("question")))
+        definition = fetch_survey_definition(auth_headers, survey_id)
 
-        with get_db_connection(db_path) as conn:
+        # Build the next snapshot in a side file; readers keep using the current one
+        # until it is published with an atomic rename
+        with span("ingest"), snapshots.build(db_path) as side_path, get_db_connection(side_path) as conn:
             cursor = conn.cursor()
             ensure_table_exists(cursor, survey_id, questions)
 
             responses = {}
 
-            for entry in all_entries:
+            for entry, anonymous_id in zip(all_entries, anonymous_ids(all_entries)):
                 contact_id = entry.get("contactId")
                 name = entry.get("name")
                 question = entry.get("question")
                 answer = entry.get("surAnswer")
 
                 if not contact_id:
-                    contact_id = f"anon_{anon_counter}"
+                    contact_id = anonymous_id
                     name = "Anonymous"
                     is_anonymous = True
-                    anon_counter += 1
                 else:
                     is_anonymous = False
 
@@ -105,6 +256,9 @@ def fetch_all_survey_responses(auth_headers, survey_id, db_path):
                     responses[key][sanitize_column_name(question)] = answer
 
             table_name = f"survey_{survey_id}"
+            # Every ingest fetches all answers, so anonymous rows are rebuilt from scratch; this also
+            # drops rows left from snapshots that gave each anonymous answer its own row
+            cursor.execute(f"DELETE FROM {table_name} WHERE is_anonymous = 1")
             for data in responses.values():
                 columns = ', '.join([f'"{k}"' for k in data])
                 placeholders = ', '.join(['?' for _ in data])
@@ -117,45 +271,104 @@ def fetch_all_survey_responses(auth_headers, survey_id, db_path):
                 '''
                 cursor.execute(sql, tuple(data.values()))
 
+            # Question catalog for prompts, summaries and charts; rewritten only when it changed
+            with span("question_catalog"):
+                store_catalog(conn, question_catalog(definition, questions, load_catalog(conn)))
+
+            # Default dashboard for first paint, stored in the snapshot it describes
+            with span("dashboard"):
+                precompute_dashboard(conn, survey_id, table_name, (snapshots.current_version(db_path) or 0) + 1)
+
+        storage.record_sync(survey_id)
+        # Hot surveys are served from memory; swap in a copy of the new snapshot
+        replicas.refresh(db_path)
+
     except Exception as e:
         raise
 
 
-def get_data_from_api(survey_id):
+def ingest_survey(survey_id, db_path):
+    """
+    Log in (reusing the cached token) and fetch all responses into a new snapshot.
+    Returns False when login does not yield a token.
+    """
+    auth_headers = get_auth_headers()
+    if not auth_headers:
+        return False
+
     try:
-        # Set database path based on survey ID
-        db_path = os.getenv("DB_PATH", f"survey_{survey_id}.db")
-        
-        url = "https://testing.scale1.api.crm.onowenable.com/api/login"
-        payload = {
-            "username": SURVEY_API_USERNAME,
-            "password": SURVEY_API_PASSWORD
-        }
-        headers = {
-            "Content-Type": "application/json"
-        }
+        fetch_all_survey_responses(auth_headers, survey_id, db_path)
+    except Exception as e:
+        if not is_unauthorized(e):
+            raise
+        # Cached token expired early; log in again once
+        auth_headers = get_auth_headers(refresh=True)
+        if not auth_headers:
+            return False
+        fetch_all_survey_responses(auth_headers, survey_id, db_path)
+    return True
 
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        token = response.json().get("access_token")
 
-        if not token:
-            return None
+def get_data_from_api(survey_id, refresh=False):
+    try:
+        # One database family per survey under DATA_DIR/surveys
+        db_path = storage.survey_path(survey_id)
+        table_name = f"survey_{survey_id}"
 
-        auth_headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        # Already ingested surveys are served locally without logging in
+        if not refresh and snapshots.exists(db_path):
+            return db_path, table_name
         
-        if not os.path.exists(db_path):
-            fetch_all_survey_responses(auth_headers, survey_id, db_path)
-            return db_path, f"survey_{survey_id}"
-
-        return db_path, f"survey_{survey_id}"
-
+        # Ingests are heavy; the admission controller bounds how many run at once
+        with admission.slot("ingest"):
+            # Another request may have ingested the survey while this one waited
+            if (refresh or not snapshots.exists(db_path)) and not ingest_survey(survey_id, db_path):
+                return None
+        return db_path, table_name
+
+    except Overloaded:
+        raise
     except Exception as e:
         return None
 
+def first_value(item, keys):
+    return next((item[key] for key in keys if item.get(key) not in (None, "")), None)
+
+
+def extract_question_catalog(survey_data):
+    """
+    Catalog entries (id, text, page, order, column, type, options) of every question in a
+    survey definition, in page and question order.
+    """
+    entries = []
+    if not survey_data.get("success"):
+        return entries
+
+    pages = survey_data.get("data", {}).get("survey", {}).get("pages", [])
+    for page_number, page in enumerate(pages, start=1):
+        for order, question in enumerate(page.get("questions", []), start=1):
+            text = question.get("question", "")
+            if not text:
+                continue
+            question_id = first_value(question, ("id", "_id", "questionId"))
+            options = []
+            for option in question.get("options") or question.get("choices") or []:
+                label = first_value(option, ("label", "text", "value", "option")) if isinstance(option, dict) else option
+                if label not in (None, ""):
+                    options.append(str(label))
+            entries.append({
+                "question_id": str(question_id) if question_id is not None else None,
+                "text": text,
+                "page": page_number,
+                "page_order": order,
+                "column_name": sanitize_column_name(text),
+                "question_type": first_value(question, ("type", "questionType")),
+                "options": options,
+                "source": "definition"
+            })
+    return entries
+
+
 def extract_questions_from_survey_data(survey_data):
     """
     Extract all questions from survey API response
@@ -167,31 +380,14 @@ def extract_questions_from_survey_data(survey_data):
         List of question strings
     """
     try:
-        questions = []
-        
-        # Navigate to the survey data
-        if not survey_data.get("success"):
-            return questions
-            
-        survey = survey_data.get("data", {}).get("survey", {})
-        pages = survey.get("pages", [])
-        
-        for page in pages:
-            page_questions = page.get("questions", [])
-            for question in page_questions:
-                question_text = question.get("question", "")
-                if question_text:
-                    questions.append(question_text)
-        
-        return questions
-        
+        return [entry["text"] for entry in extract_question_catalog(survey_data)]
     except Exception as e:
         print(f"Error extracting questions: {e}")
         return []
 
 def get_survey_questions(survey_id):
     """
-    Get all questions from a survey
+    Get all questions from a survey, in survey order, from the question catalog stored at ingest
     
     Args:
         survey_id: Survey identifier
@@ -200,33 +396,12 @@ def get_survey_questions(survey_id):
         List of question strings or None if error
     """
     try:
-        url = "https://testing.scale1.api.crm.onowenable.com/api/login"
-        payload = {
-            "username": SURVEY_API_USERNAME,
-            "password": SURVEY_API_PASSWORD
-        }
-        headers = {
-            "Content-Type": "application/json"
-        }
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        token = response.json().get("access_token")
-
-        if not token:
+        located = get_data_from_api(survey_id)
+        if not located:
             return None
-
-        auth_headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        url = f"https://testing.survey.api.crm.onowenable.com/api/surveys/{survey_id}"
-        response = requests.get(url, headers=auth_headers)
-        response.raise_for_status()
-        
-        survey_data = response.json()
-        questions = extract_questions_from_survey_data(survey_data)
-        
-        return questions
+        db_path, _ = located
+        with replicas.reader(db_path) as conn:
+            return [entry["text"] for entry in load_catalog(conn)]
         
     except Exception as e:
         print(f"Error getting survey questions: {e}")
@@ -2,19 +2,286 @@ import os
 import sqlite3
 import json
 import time
+import hashlib
+import numpy as np
+from collections import Counter
+from operator import itemgetter
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from typing import Literal, List, Optional, Dict, Any, Union
-from langchain_openai import OpenAI
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
+from typing import Literal, List, Optional, Dict, Any, Union, Callable, Tuple
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import PydanticOutputParser
+from .llm import get_llm
+from .metrics import span, record_llm_call, record_cache
+from .admission import admission, Overloaded
+from .downsample import CHART_MAX_POINTS, lttb, grid_sample, take
+from .cache import shared_cache
+from .intents import normalize_question
+from .column_profiler import profile_columns, describe_column, parse_number
 
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Count bar charts over numeric columns with more distinct values than this become histograms
+CHART_MAX_CATEGORIES = int(os.getenv("CHART_MAX_CATEGORIES", "30"))
+CHART_HISTOGRAM_BINS = int(os.getenv("CHART_HISTOGRAM_BINS", "20"))
+# Parsed chart recommendations are reused for results of the same shape and question
+VISUALIZATION_CACHE_TTL = float(os.getenv("VISUALIZATION_CACHE_TTL", "86400"))
+VISUALIZATION_CACHE_MAX_ENTRIES = int(os.getenv("VISUALIZATION_CACHE_MAX_ENTRIES", "1000"))
+# Rows SQLSource samples for a large scatter chart, as a multiple of CHART_MAX_POINTS
+POINTS_OVERSAMPLE = 4
+
+
+def is_numerical(profile: Optional[Dict[str, Any]], column: str) -> bool:
+    return bool(profile) and profile["columns"].get(column, {}).get("kind") == "numerical"
+
+
+def label_order(label: str):
+    """
+    Sort key putting numeric labels in numeric order ("2" before "10").
+    """
+    try:
+        return (0, float(label), "")
+    except ValueError:
+        return (1, 0.0, label)
+
+
+def quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def numeric_test(column: str) -> str:
+    """
+    SQL condition for values that are numbers or numeric text (survey answers are stored as TEXT).
+    """
+    return (f"(typeof({column}) IN ('integer', 'real') OR "
+            f"(trim({column}) GLOB '*[0-9]*' AND trim({column}) NOT GLOB '*[^0-9.eE+-]*'))")
+
+
+def category_labels(rows: List[tuple], numerical: Optional[bool]) -> Tuple[List[str], List[int]]:
+    """
+    Labels and counts of (value, count) rows, numeric labels in numeric order for numerical columns.
+    """
+    if numerical:
+        rows = sorted(rows, key=lambda row: label_order(str(row[0])))
+    return [str(label) for label, _ in rows], [count for _, count in rows]
+
+
+def histogram_bins(low: float, width: float, counts: Dict[int, int]) -> Tuple[List[str], List[int]]:
+    """
+    Labels and counts of CHART_HISTOGRAM_BINS equal-width bins from low; counts maps bin index to rows.
+    """
+    bins = CHART_HISTOGRAM_BINS
+    return ([f"{low + i * width:g}–{low + (i + 1) * width:g}" for i in range(bins)],
+            [counts.get(i, 0) for i in range(bins)])
+
+
+class SQLSource:
+    """
+    A query that charts aggregate in SQLite, using it as a subquery, so only the
+    aggregated rows reach Python. Used for the precomputed dashboard, whose rows are
+    never fetched, and for query results too large for the query cache; smaller
+    results are charted from their fetched rows through RowSource.
+    """
+
+    def __init__(self, sql: str, run: Callable[[str, tuple], List[tuple]]):
+        self.sql = sql.strip().rstrip(";")
+        self._run = run
+
+    def query(self, select: str, params: tuple = ()) -> List[tuple]:
+        """
+        Run select with {source} replaced by the executed query.
+        """
+        return self._run(select.replace("{source}", f"({self.sql}) AS source"), params)
+
+    def category_counts(self, column: str, numerical: Optional[bool] = None) -> Tuple[List[str], List[int]]:
+        """
+        Rows per value of column. Numeric columns with more than CHART_MAX_CATEGORIES
+        distinct values are folded into CHART_HISTOGRAM_BINS equal-width bins by SQLite.
+        numerical comes from the column profile; without one every value must parse as
+        a number.
+        """
+        x = quote(column)
+        grouped = f"SELECT CAST({x} AS TEXT), COUNT(*) FROM {{source}} GROUP BY 1 ORDER BY 1"
+        if numerical is False:
+            return category_labels(self.query(grouped), numerical)
+        rows = self.query(f"{grouped} LIMIT {CHART_MAX_CATEGORIES + 1}")
+        if len(rows) <= CHART_MAX_CATEGORIES:
+            return category_labels(rows, numerical)
+
+        numeric = numeric_test(x)
+        present, numbers, low, high = self.query(
+            f"SELECT COUNT({x}), SUM({numeric}), MIN(CASE WHEN {numeric} THEN CAST({x} AS REAL) END), "
+            f"MAX(CASE WHEN {numeric} THEN CAST({x} AS REAL) END) FROM {{source}}"
+        )[0]
+        # A profiled numerical column may hold a few non-numeric answers; they are left out of the histogram
+        if not numbers or (not numerical and numbers < present) or high <= low:
+            return category_labels(self.query(grouped), numerical)
+        width = (high - low) / CHART_HISTOGRAM_BINS
+        binned = self.query(
+            f"SELECT MIN(CAST((CAST({x} AS REAL) - ?) / ? AS INTEGER), ?), COUNT(*) FROM {{source}} "
+            f"WHERE {numeric} GROUP BY 1",
+            (low, width, CHART_HISTOGRAM_BINS - 1)
+        )
+        return histogram_bins(low, width, dict(binned))
+
+    def series_means(self, x_column: str, y_column: str, color_column: Optional[str] = None) -> List[tuple]:
+        """
+        (series, x label, mean of y) per series and x value; the series is None without a
+        color column. Raises ValueError when y is not numeric.
+        """
+        x, y = quote(x_column), quote(y_column)
+        series = f"CAST({quote(color_column)} AS TEXT)" if color_column else "NULL"
+        rows = self.query(
+            f"SELECT {series}, CAST({x} AS TEXT), AVG(CAST({y} AS REAL)), "
+            f"SUM({y} IS NOT NULL AND NOT {numeric_test(y)}) FROM {{source}} GROUP BY 1, 2"
+        )
+        if any(invalid for *_, invalid in rows):
+            raise ValueError(f"Column {y_column} is not numeric")
+        return [(group, label, value) for group, label, value, _ in rows]
+
+    def totals(self, names_column: str, values_column: str, limit: Optional[int] = None) -> Tuple[List[str], List]:
+        """
+        Total of values_column per name, largest first, at most limit names.
+        Raises ValueError when values are not numeric.
+        """
+        names, values = quote(names_column), quote(values_column)
+        rows = self.query(
+            f"SELECT CAST({names} AS TEXT), SUM({values}), SUM({values} IS NOT NULL AND NOT {numeric_test(values)}) "
+            f"FROM {{source}} GROUP BY 1 ORDER BY 2 DESC" + (f" LIMIT {int(limit)}" if limit else "")
+        )
+        if any(invalid for _, _, invalid in rows):
+            raise ValueError(f"Column {values_column} is not numeric")
+        return [str(name) for name, _, _ in rows], [total for _, total, _ in rows]
+
+    def select(self, columns: List[str], numeric: Tuple[bool, ...] = ()) -> List[tuple]:
+        """
+        Every row of columns; those flagged in numeric are read as numbers.
+        """
+        selected = [f"CAST({quote(column)} AS REAL)" if flag else quote(column)
+                    for column, flag in zip(columns, list(numeric) + [False] * len(columns))]
+        return self.query(f"SELECT {', '.join(selected)} FROM {{source}}")
+
+    def points(self, columns: List[str], numeric: Tuple[bool, ...] = ()) -> Tuple[List[tuple], int]:
+        """
+        Rows of columns for a scatter chart and the number of rows in the source. Beyond
+        CHART_MAX_POINTS rows SQLite returns a random sample of a few times that many, so
+        the chart never loads every row; the caller grid-samples it down.
+        """
+        total = self.query("SELECT COUNT(*) FROM {source}")[0][0]
+        if total <= CHART_MAX_POINTS:
+            return self.select(columns, numeric), total
+        selected = [f"CAST({quote(column)} AS REAL)" if flag else quote(column)
+                    for column, flag in zip(columns, list(numeric) + [False] * len(columns))]
+        rows = self.query(
+            f"SELECT {', '.join(selected)} FROM {{source}} WHERE abs(random()) % ? < ?",
+            (total, POINTS_OVERSAMPLE * CHART_MAX_POINTS)
+        )
+        return rows, total
+
+
+class RowSource:
+    """
+    The same aggregations as SQLSource over rows already fetched into Python, so
+    charting a small or cached query result does not run the query again.
+    """
+
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+    def column(self, column: str) -> List[Any]:
+        return list(map(itemgetter(column), self.data))
+
+    def category_counts(self, column: str, numerical: Optional[bool] = None) -> Tuple[List[str], List[int]]:
+        """
+        Rows per value of column, folded into a histogram like SQLSource.category_counts.
+        """
+        counts = Counter(self.column(column))
+        if not all(isinstance(value, str) for value in counts if value is not None):
+            merged = Counter()
+            for value, count in counts.items():
+                merged[None if value is None else str(value)] += count
+            counts = merged
+        missing = counts.pop(None, 0)
+        # Same order as SQLite's ORDER BY: NULL first, then the labels
+        rows = ([(None, missing)] if missing else []) + [(label, counts[label]) for label in sorted(counts)]
+        if len(rows) <= CHART_MAX_CATEGORIES or numerical is False:
+            return category_labels(rows, numerical)
+
+        numbers = [(parse_number(label), count) for label, count in rows if label is not None]
+        present = sum(count for _, count in numbers)
+        numbers = [(number, count) for number, count in numbers if number is not None]
+        # A profiled numerical column may hold a few non-numeric answers; they are left out of the histogram
+        if not numbers or (not numerical and sum(count for _, count in numbers) < present):
+            return category_labels(rows, numerical)
+        low, high = min(number for number, _ in numbers), max(number for number, _ in numbers)
+        if high <= low:
+            return category_labels(rows, numerical)
+        width = (high - low) / CHART_HISTOGRAM_BINS
+        binned = Counter()
+        for number, count in numbers:
+            binned[min(int((number - low) / width), CHART_HISTOGRAM_BINS - 1)] += count
+        return histogram_bins(low, width, binned)
+
+    def series_means(self, x_column: str, y_column: str, color_column: Optional[str] = None) -> List[tuple]:
+        sums = {}
+        for row in self.data:
+            group = row[color_column] if color_column else None
+            label, value = row[x_column], row[y_column]
+            key = (None if group is None else str(group), None if label is None else str(label))
+            total = sums.setdefault(key, [0.0, 0])
+            if value is None:
+                continue
+            number = parse_number(value)
+            if number is None:
+                raise ValueError(f"Column {y_column} is not numeric")
+            total[0] += number
+            total[1] += 1
+        return [(group, label, total / count if count else None) for (group, label), (total, count) in sums.items()]
+
+    def totals(self, names_column: str, values_column: str, limit: Optional[int] = None) -> Tuple[List[str], List]:
+        totals = {}
+        for row in self.data:
+            name, value = row[names_column], row[values_column]
+            name = None if name is None else str(name)
+            totals.setdefault(name, None)
+            if value is None:
+                continue
+            number = value if isinstance(value, int) and not isinstance(value, bool) else parse_number(value)
+            if number is None:
+                raise ValueError(f"Column {values_column} is not numeric")
+            totals[name] = number if totals[name] is None else totals[name] + number
+        rows = sorted(totals.items(), key=lambda row: (row[1] is None, -(row[1] or 0)))[:limit]
+        return [str(name) for name, _ in rows], [total for _, total in rows]
+
+    def select(self, columns: List[str], numeric: Tuple[bool, ...] = ()) -> List[tuple]:
+        return self._rows([self.column(column) for column in columns], numeric)
+
+    def points(self, columns: List[str], numeric: Tuple[bool, ...] = ()) -> Tuple[List[tuple], int]:
+        """
+        Rows of columns for a scatter chart, grid-sampled to CHART_MAX_POINTS before any
+        value is converted, and the number of rows in the source.
+        """
+        values = [self.column(column) for column in columns]
+        if len(self.data) > CHART_MAX_POINTS:
+            kept = grid_sample(values[0], values[1], CHART_MAX_POINTS, values[2] if len(values) > 2 else None)
+            values = [take(column, kept) for column in values]
+        return self._rows(values, numeric), len(self.data)
+
+    @staticmethod
+    def _rows(values: List[List[Any]], numeric: Tuple[bool, ...]) -> List[tuple]:
+        for i, flag in enumerate(numeric):
+            if flag:
+                # Answers repeat, so each distinct value is parsed once
+                parsed = {value: parse_number(value) for value in set(values[i])}
+                values[i] = [parsed[value] for value in values[i]]
+        return list(zip(*values)) if values else []
+
+
+ChartSource = Union[SQLSource, RowSource]
+
 
 class ChartJSDataset(BaseModel):
     label: str
-    data: List[Union[int, float]]
+    data: List[Optional[Union[int, float]]]
     backgroundColor: Optional[Union[str, List[str]]] = None
     borderColor: Optional[Union[str, List[str]]] = None
     borderWidth: Optional[int] = 1
@@ -40,29 +307,34 @@ class BarChart(BaseModel):
             # Grouped bar chart
             labels = [str(row[self.x_column]) for row in data]
             values = [row[self.y_column] for row in data]
-            
-            dataset = ChartJSDataset(
-                label=self.y_column,
-                data=values,
-                backgroundColor='rgba(54, 162, 235, 0.6)',
-                borderColor='rgba(54, 162, 235, 1)'
-            )
-        else:
-            # Count-based bar chart
-            value_counts = {}
-            for row in data:
-                key = str(row[self.x_column])
-                value_counts[key] = value_counts.get(key, 0) + 1
-            
-            labels = list(value_counts.keys())
-            values = list(value_counts.values())
-            
-            dataset = ChartJSDataset(
-                label="Count",
-                data=values,
-                backgroundColor='rgba(54, 162, 235, 0.6)',
-                borderColor='rgba(54, 162, 235, 1)'
-            )
+            return self._config(labels, values, self.y_column)
+        
+        # Count-based bar chart
+        value_counts = {}
+        for row in data:
+            key = str(row[self.x_column])
+            value_counts[key] = value_counts.get(key, 0) + 1
+        
+        return self._config(list(value_counts.keys()), list(value_counts.values()), "Count")
+
+    def aggregate_config(self, source: ChartSource, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if self.y_column:
+            # One bar per x value (the total of y), largest first; numeric x values in numeric order
+            bars = list(zip(*source.totals(self.x_column, self.y_column, CHART_MAX_POINTS)))
+            if is_numerical(profile, self.x_column):
+                bars.sort(key=lambda bar: label_order(bar[0]))
+            return self._config([label for label, _ in bars], [value for _, value in bars], self.y_column)
+        numerical = is_numerical(profile, self.x_column) if profile else None
+        labels, values = source.category_counts(self.x_column, numerical)
+        return self._config(labels, values, "Count")
+
+    def _config(self, labels: List[str], values: List, label: str) -> Dict[str, Any]:
+        dataset = ChartJSDataset(
+            label=label,
+            data=values,
+            backgroundColor='rgba(54, 162, 235, 0.6)',
+            borderColor='rgba(54, 162, 235, 1)'
+        )
         
         return {
             "type": "bar",
@@ -105,22 +377,73 @@ class LineChart(BaseModel):
         else:
             labels = [str(row[self.x_column]) for row in data]
             values = [row[self.y_column] for row in data]
-            
-            datasets = [ChartJSDataset(
-                label=self.y_column,
-                data=values,
-                backgroundColor='rgba(75, 192, 192, 0.6)',
-                borderColor='rgba(75, 192, 192, 1)',
-                fill=False
-            )]
+            datasets = self._single_series(values)
         
-        return {
+        return self._config(labels, datasets)
+
+    def aggregate_config(self, source: ChartSource, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # One point per (series, x): the mean of y, aligned to the sorted x labels
+        rows = source.series_means(self.x_column, self.y_column, self.color_column)
+        labels = set(str(label) for _, label, _ in rows)
+        labels = sorted(labels, key=label_order) if is_numerical(profile, self.x_column) else sorted(labels)
+        series = {}
+        for group, label, value in rows:
+            series.setdefault(str(group), {})[str(label)] = value
+        if not self.color_column:
+            return self._config(labels, self._single_series([series.get("None", {}).get(label) for label in labels]))
+        
+        datasets = []
+        colors = ['rgba(255, 99, 132, 0.6)', 'rgba(54, 162, 235, 0.6)', 'rgba(255, 206, 86, 0.6)']
+        for i, group in enumerate(sorted(series)):
+            datasets.append(ChartJSDataset(
+                label=group,
+                data=[series[group].get(label) for label in labels],
+                backgroundColor=colors[i % len(colors)],
+                borderColor=colors[i % len(colors)].replace('0.6', '1'),
+                fill=False
+            ))
+        return self._config(labels, datasets)
+
+    def _single_series(self, values: List) -> List[ChartJSDataset]:
+        return [ChartJSDataset(
+            label=self.y_column,
+            data=values,
+            backgroundColor='rgba(75, 192, 192, 0.6)',
+            borderColor='rgba(75, 192, 192, 1)',
+            fill=False
+        )]
+
+    def _config(self, labels: List[str], datasets: List[ChartJSDataset]) -> Dict[str, Any]:
+        original = len(labels)
+        if original > CHART_MAX_POINTS:
+            labels, datasets = self._downsample(labels, datasets)
+        config = {
             "type": "line",
             "data": ChartJSData(labels=labels, datasets=datasets).dict(),
             "options": ChartJSOptions(
                 plugins={"title": {"display": True, "text": self.title}}
             ).dict()
         }
+        if original > CHART_MAX_POINTS:
+            config["metadata"] = {"original_points": original, "points": len(labels), "sampling": "lttb"}
+        return config
+
+    def _downsample(self, labels: List[str], datasets: List[ChartJSDataset]):
+        """
+        Keep the union of each series' LTTB points (the target is split between the
+        series) so every series stays aligned to the same labels.
+        """
+        aligned = [dataset for dataset in datasets if len(dataset.data) == len(labels)]
+        share = max(3, CHART_MAX_POINTS // max(1, len(aligned)))
+        kept = np.unique(np.concatenate(
+            [lttb(dataset.data, share) for dataset in aligned] or [lttb([0] * len(labels), CHART_MAX_POINTS)]
+        ))
+        for dataset in datasets:
+            if len(dataset.data) == len(labels):
+                dataset.data = take(dataset.data, kept)
+            elif len(dataset.data) > CHART_MAX_POINTS:
+                dataset.data = take(dataset.data, lttb(dataset.data, CHART_MAX_POINTS))
+        return take(labels, kept), datasets
 
 class PieChart(BaseModel):
     chart_type: Literal["pie"] = "pie"
@@ -131,7 +454,13 @@ class PieChart(BaseModel):
     def to_chartjs_config(self, data: List[Dict]) -> Dict[str, Any]:
         labels = [str(row[self.names_column]) for row in data]
         values = [row[self.values_column] for row in data]
-        
+        return self._config(labels, values)
+
+    def aggregate_config(self, source: ChartSource, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        labels, values = source.totals(self.names_column, self.values_column)
+        return self._config(labels, values)
+
+    def _config(self, labels: List[str], values: List) -> Dict[str, Any]:
         colors = [
             'rgba(255, 99, 132, 0.6)',
             'rgba(54, 162, 235, 0.6)',
@@ -164,7 +493,13 @@ class DoughnutChart(BaseModel):
     def to_chartjs_config(self, data: List[Dict]) -> Dict[str, Any]:
         labels = [str(row[self.names_column]) for row in data]
         values = [row[self.values_column] for row in data]
-        
+        return self._config(labels, values)
+
+    def aggregate_config(self, source: ChartSource, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        labels, values = source.totals(self.names_column, self.values_column)
+        return self._config(labels, values)
+
+    def _config(self, labels: List[str], values: List) -> Dict[str, Any]:
         colors = [
             'rgba(255, 99, 132, 0.6)',
             'rgba(54, 162, 235, 0.6)',
@@ -196,15 +531,32 @@ class ScatterChart(BaseModel):
     color_column: Optional[str] = Field(description="Column for color grouping")
     
     def to_chartjs_config(self, data: List[Dict]) -> Dict[str, Any]:
+        columns = [self.x_column, self.y_column] + ([self.color_column] if self.color_column else [])
+        return self._config([tuple(row[column] for column in columns) for row in data])
+
+    def aggregate_config(self, source: ChartSource, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        columns = [self.x_column, self.y_column] + ([self.color_column] if self.color_column else [])
+        numeric = (is_numerical(profile, self.x_column), is_numerical(profile, self.y_column))
+        return self._config(*source.points(columns, numeric))
+
+    def _config(self, rows: List[tuple], original: Optional[int] = None) -> Dict[str, Any]:
+        """
+        original is the row count rows were sampled from, when the source sampled them.
+        """
+        original = len(rows) if original is None else original
+        if len(rows) > CHART_MAX_POINTS:
+            columns = list(zip(*rows))
+            rows = take(rows, grid_sample(columns[0], columns[1], CHART_MAX_POINTS,
+                                          columns[2] if self.color_column else None))
         if self.color_column:
             groups = {}
-            for row in data:
-                group_key = str(row[self.color_column])
+            for x, y, group in rows:
+                group_key = str(group)
                 if group_key not in groups:
                     groups[group_key] = []
                 groups[group_key].append({
-                    "x": row[self.x_column],
-                    "y": row[self.y_column]
+                    "x": x,
+                    "y": y
                 })
             
             datasets = []
@@ -217,7 +569,7 @@ class ScatterChart(BaseModel):
                     "borderColor": colors[i % len(colors)].replace('0.6', '1')
                 })
         else:
-            points = [{"x": row[self.x_column], "y": row[self.y_column]} for row in data]
+            points = [{"x": x, "y": y} for x, y in rows]
             datasets = [{
                 "label": f"{self.x_column} vs {self.y_column}",
                 "data": points,
@@ -225,7 +577,7 @@ class ScatterChart(BaseModel):
                 "borderColor": 'rgba(75, 192, 192, 1)'
             }]
         
-        return {
+        config = {
             "type": "scatter",
             "data": {"datasets": datasets},
             "options": {
@@ -237,6 +589,9 @@ class ScatterChart(BaseModel):
                 }
             }
         }
+        if original > CHART_MAX_POINTS:
+            config["metadata"] = {"original_points": original, "points": len(rows), "sampling": "grid"}
+        return config
 
 ChartConfig = Union[BarChart, LineChart, PieChart, DoughnutChart, ScatterChart]
 
@@ -245,9 +600,29 @@ class VisualizationRecommendation(BaseModel):
     recommendations: List[ChartConfig] = Field(description="List of recommended chart configurations")
     reasoning: str = Field(description="Explanation of why these charts were recommended")
 
+def size_bucket(rows: int) -> str:
+    """
+    Order of magnitude of a row count ("0", "1", "10", "100", ...), so similar results share recommendations.
+    """
+    return "0" if rows <= 0 else "1" + "0" * (len(str(rows)) - 1)
+
+
+def recommendation_signature(column_types: Dict[str, str], rows: int, user_query: str) -> str:
+    """
+    Cache key for chart recommendations: column names and types in order, the size bucket and the normalized question.
+    """
+    shape = json.dumps([list(column_types.items()), size_bucket(rows), normalize_question(user_query)])
+    return hashlib.sha256(shape.encode()).hexdigest()
+
+
+def chart_columns(chart: ChartConfig) -> List[str]:
+    fields = ["x_column", "y_column", "color_column", "values_column", "names_column"]
+    return [getattr(chart, field) for field in fields if getattr(chart, field, None)]
+
+
 class DataAnalyzer:
     def __init__(self):
-        self.llm = OpenAI(api_key=openai_api_key, temperature=0)
+        self.llm = get_llm("chart_recommendation")
         self.parser = PydanticOutputParser(pydantic_object=VisualizationRecommendation)
         self.prompt = PromptTemplate(
             template="""
@@ -259,6 +634,8 @@ DATA SIZE: {data_size}
 COLUMNS & TYPES:
 {column_info}
 
+Prefer columns with few distinct values for bar/pie charts; never chart unique identifier columns as categories.
+
 AVAILABLE CHART TYPES:
 - bar: categorical data distributions 
 - line: trends over time/ordered data
@@ -275,54 +652,91 @@ For the explanation, explain why the data insight is important, not why the grap
             partial_variables={"format_instructions": self.parser.get_format_instructions()}
         )
 
-    def analyze_data(self, data: list, columns: list) -> dict:
-        column_types = {}
-        if data:
-            sample_row = data[0]
-            for col in columns:
-                value = sample_row.get(col, None)
-                if isinstance(value, (int, float)):
-                    column_types[col] = 'numerical'
-                else:
-                    column_types[col] = 'categorical'
+    def analyze_data(self, data: list, columns: list, profile: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Column kinds from a profile of all rows (or a bounded sample), so numeric answers stored as TEXT count as numerical.
+        """
+        profile = profile or profile_columns(data, columns)
+        column_types = {col: column["kind"] for col, column in profile["columns"].items()} if data else {}
         return {
             "data": data,
             "columns": columns,
             "data_size": f"{len(data)} rows × {len(columns)} columns",
             "numerical_columns": [col for col, typ in column_types.items() if typ == 'numerical'],
             "categorical_columns": [col for col, typ in column_types.items() if typ == 'categorical'],
-            "column_types": column_types
+            "column_types": column_types,
+            "profile": profile
         }
 
-    def recommend_visualizations(self, data: list, columns: list, user_query: str) -> tuple[VisualizationRecommendation, list]:
-        data_info = self.analyze_data(data, columns)
-        column_info = ", ".join([f"{col}({typ})" for col, typ in data_info["column_types"].items()])
+    def cached_recommendations(self, signature: str, columns: list) -> Optional[VisualizationRecommendation]:
+        """
+        Recommendations stored for this signature, if every column they chart is still in the result.
+        """
+        cached = shared_cache.get("visualization", signature, touch=True)
+        if cached is None:
+            return None
+        try:
+            recommendations = VisualizationRecommendation(**cached)
+        except Exception:
+            recommendations = None
+        if recommendations is None or not all(
+            column in columns for chart in recommendations.recommendations for column in chart_columns(chart)
+        ):
+            shared_cache.delete("visualization", signature)
+            return None
+        return recommendations
+
+    def recommend_visualizations(self, data: list, columns: list, user_query: str,
+                                 profile: Optional[Dict[str, Any]] = None) -> tuple[VisualizationRecommendation, list]:
+        data_info = self.analyze_data(data, columns, profile)
+        signature = recommendation_signature(data_info["column_types"], len(data), user_query)
+        cached = self.cached_recommendations(signature, columns)
+        record_cache("visualization", cached is not None)
+        if cached is not None:
+            return cached, data_info["data"]
+        column_info = ", ".join(
+            describe_column(col, data_info["profile"]["columns"][col]) for col in data_info["column_types"]
+        )
         formatted_prompt = self.prompt.format(
             user_query=user_query,
             data_size=data_info["data_size"],
             column_info=column_info
         )
-        response = self.llm(formatted_prompt)
+        with admission.slot("llm"), span("visualization_llm"):
+            response = self.llm.invoke(formatted_prompt)
+        record_llm_call("chart_recommendation")
         try:
             recommendations = self.parser.parse(response)
+            # Fallbacks after a parse failure are not cached, so the next question retries the LLM
+            shared_cache.set("visualization", signature, recommendations.dict(), ttl=VISUALIZATION_CACHE_TTL,
+                             max_entries=VISUALIZATION_CACHE_MAX_ENTRIES)
             return recommendations, data_info["data"]
         except Exception as e:
             return self._fallback_recommendations(data_info), data_info["data"]
 
     def _fallback_recommendations(self, data_info: dict) -> VisualizationRecommendation:
         recommendations = []
-        numerical_cols = data_info["numerical_columns"]
-        categorical_cols = data_info["categorical_columns"]
+        profiles = data_info["profile"]["columns"]
+        numerical_cols = [col for col in data_info["numerical_columns"] if not profiles[col]["unique"]]
+        # Columns with a handful of distinct values make readable bars; identifiers never do
+        categorical_cols = sorted(
+            (col for col in data_info["categorical_columns"] if not profiles[col]["unique"]),
+            key=lambda col: profiles[col]["distinct"] > CHART_MAX_CATEGORIES
+        )
         if len(numerical_cols) >= 2:
             recommendations.append(ScatterChart(
                 x_column=numerical_cols[0],
                 y_column=numerical_cols[1],
-                title=f"{numerical_cols[0]} vs {numerical_cols[1]}"
+                title=f"{numerical_cols[0]} vs {numerical_cols[1]}",
+                color_column=None
             ))
-        if len(categorical_cols) >= 1:
+        bar_column = categorical_cols[0] if categorical_cols else (numerical_cols[0] if numerical_cols else None)
+        if bar_column:
             recommendations.append(BarChart(
-                x_column=categorical_cols[0],
-                title=f"Distribution of {categorical_cols[0]}"
+                x_column=bar_column,
+                y_column=None,
+                title=f"Distribution of {bar_column}",
+                color_column=None
             ))
         return VisualizationRecommendation(
             recommendations=recommendations,
@@ -332,8 +746,16 @@ For the explanation, explain why the data insight is important, not why the grap
 class ChartJSGenerator:
     
     @staticmethod
-    def generate_chart_config(data: List[Dict], config: ChartConfig) -> Dict[str, Any]:
-        """Generate Chart.js configuration from data and chart config"""
+    def generate_chart_config(data: List[Dict], config: ChartConfig, source: Optional[ChartSource] = None,
+                              profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate Chart.js configuration from data and chart config, aggregating through the source when one is given"""
+        if source is not None:
+            try:
+                return config.aggregate_config(source, profile)
+            except Overloaded:
+                raise
+            except Exception:
+                pass
         try:
             return config.to_chartjs_config(data)
         except Exception as e:
@@ -345,9 +767,21 @@ class SmartVisualizationSystem:
         self.analyzer = DataAnalyzer()
         self.generator = ChartJSGenerator()
 
-    def create_visualizations(self, data: list, columns: list, user_query: str) -> dict:
+    def create_visualizations(self, data: list, columns: list, user_query: str,
+                              recommendations: Optional[VisualizationRecommendation] = None,
+                              source: Optional[ChartSource] = None,
+                              on_chart: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Recommend charts for a query result and build their configs. on_chart, when given, is
+        called with each chart as soon as it is built.
+        """
         try:
-            recommendations, data_rows = self.analyzer.recommend_visualizations(data, columns, user_query)
+            with span("column_profile"):
+                profile = profile_columns(data, columns)
+            if recommendations is not None:
+                data_rows = data
+            else:
+                recommendations, data_rows = self.analyzer.recommend_visualizations(data, columns, user_query, profile)
             if not recommendations.recommendations:
                 return {
                     "charts": [],
@@ -356,20 +790,25 @@ class SmartVisualizationSystem:
                     "data_size": len(data_rows) if data_rows else 0
                 }
             charts = []
-            for i, config in enumerate(recommendations.recommendations):
-                chart_config = self.generator.generate_chart_config(data_rows, config)
-                if chart_config:
-                    charts.append({
-                        "config": chart_config,
-                        "chart_type": config.chart_type,
-                        "title": config.title
-                    })
+            with span("chart_build"):
+                for i, config in enumerate(recommendations.recommendations):
+                    chart_config = self.generator.generate_chart_config(data_rows, config, source, profile)
+                    if chart_config:
+                        charts.append({
+                            "config": chart_config,
+                            "chart_type": config.chart_type,
+                            "title": config.title
+                        })
+                        if on_chart is not None:
+                            on_chart(charts[-1])
             return {
                 "charts": charts,
                 "reasoning": recommendations.reasoning,
                 "total_charts": len(charts),
                 "data_size": len(data_rows) if data_rows else 0
             }
+        except Overloaded:
+            raise
         except Exception as e: 
             return {
                 "charts": [],
@@ -0,0 +1,53 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Mapping
+
+from .snapshots import snapshots
+
+# Seconds browsers and nginx may reuse a survey read response before revalidating it
+SURVEY_CACHE_MAX_AGE = int(os.getenv("SURVEY_CACHE_MAX_AGE", "5"))
+
+
+def snapshot_validators(db_path: str) -> Optional[Dict[str, str]]:
+    """
+    ETag, Last-Modified and Cache-Control headers for responses derived from a survey's current
+    snapshot. The data version is read from the snapshot pointer, so no SQLite connection is
+    opened. None when the survey has not been ingested yet.
+    """
+    version = snapshots.current_version(db_path)
+    if version is None:
+        return None
+    try:
+        # The pointer is rewritten when a version is published; pre-snapshot databases have none
+        modified = os.path.getmtime(snapshots.pointer_path(db_path) if version else os.path.abspath(db_path))
+    except OSError:
+        return None
+    return {
+        # The publish time tells apart equal version numbers of a survey whose files were recreated
+        "ETag": f'"v{version}-{int(modified * 1000):x}"',
+        "Last-Modified": formatdate(modified, usegmt=True),
+        "Cache-Control": f"public, max-age={SURVEY_CACHE_MAX_AGE}"
+    }
+
+
+def is_not_modified(request_headers: Mapping[str, str], validators: Dict[str, str]) -> bool:
+    """
+    Whether a conditional GET can be answered with 304. If-None-Match takes precedence over
+    If-Modified-Since, as in RFC 9110. Last-Modified only has one-second resolution, so two
+    publishes within a second share it; If-Modified-Since is therefore only honoured for
+    responses without an ETag.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        etag = validators["ETag"]
+        return "*" in tags or any(tag == etag or tag == f"W/{etag}" for tag in tags)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and "ETag" not in validators:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            return parsedate_to_datetime(validators["Last-Modified"]) <= since
+        except (TypeError, ValueError):
+            return False
+    return False
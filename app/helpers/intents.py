@@ -0,0 +1,189 @@
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import List, Dict, Any, Optional
+
+from .fetcher import sanitize_column_name
+
+META_COLUMNS = ['contact_id', 'name', 'is_anonymous']
+
+_FILLER = r"(?:please |can you |could you |i want |i need |show me |give me |get me |list |show |return |display |what are |what is |what's )*"
+_STOP_WORDS = {"the", "a", "an", "of", "to", "for", "in", "on", "do", "you", "your", "is", "are", "what", "how"}
+_RESPONSES = r"(?:responses|respondents|submissions|answers|entries|rows|records|people)"
+
+ALL_RESPONSES = re.compile(rf"^{_FILLER}(?:all|every|each)(?: of)?(?: the)? (?:survey )?{_RESPONSES}(?: data)?$")
+COUNT_RESPONSES = re.compile(
+    rf"^{_FILLER}(?:how many|the number of|number of|count of|count|the total(?: number of)?|total(?: number of)?)"
+    rf"(?: the)?(?: survey)? {_RESPONSES}(?: are there| do we have| did we get| in total| total| responded| answered)?$"
+)
+COUNT_ANONYMOUS = re.compile(
+    rf"^{_FILLER}(?:how many|the number of|number of|count of|count)(?: the)? (?P<kind>anonymous|named|non anonymous|identified) {_RESPONSES}(?: are there| do we have)?$"
+)
+ANONYMOUS_SPLIT = re.compile(
+    rf"^{_FILLER}(?:(?:the )?(?:breakdown|split|distribution|ratio|comparison) of )?(?:the )?"
+    r"anonymous (?:vs|versus|and|or|compared to) (?:named|non anonymous|identified)(?: (?:responses|respondents))?$"
+)
+DISTRIBUTION = re.compile(
+    rf"^{_FILLER}(?:the )?(?:distribution|breakdown|frequency|counts|count|split) (?:of|for) "
+    r"(?:the )?(?:answers to |responses to |answers for |responses for |question )?(?P<question>.+)$"
+)
+HOW_ANSWERED = re.compile(
+    r"^how did (?:people|respondents|everyone|users) (?:answer|respond to) (?:the question )?(?P<question>.+)$"
+)
+AVERAGE = re.compile(
+    rf"^{_FILLER}(?:the )?(?:average|mean|avg)(?: value| answer| response| score)? (?:of |for |to )?"
+    r"(?:the )?(?:answers to |responses to |question )?(?P<question>.+)$"
+)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercase, strip punctuation and collapse whitespace so patterns stay simple.
+    """
+    text = text.lower().replace("_", " ")
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class IntentStats:
+    """
+    Thread-safe counters for fast path hits and the LLM latency they avoid.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.by_intent: Dict[str, int] = {}
+        self.fast_path_seconds = 0.0
+        self.llm_path_seconds = 0.0
+
+    def record_hit(self, intent: str, elapsed: float):
+        with self._lock:
+            self.hits += 1
+            self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+            self.fast_path_seconds += elapsed
+
+    def record_miss(self, elapsed: float):
+        with self._lock:
+            self.misses += 1
+            self.llm_path_seconds += elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            avg_fast_ms = (self.fast_path_seconds / self.hits * 1000) if self.hits else 0.0
+            avg_llm_ms = (self.llm_path_seconds / self.misses * 1000) if self.misses else 0.0
+            saved_ms = max(avg_llm_ms - avg_fast_ms, 0.0) * self.hits if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "by_intent": dict(self.by_intent),
+                "avg_fast_path_ms": round(avg_fast_ms, 3),
+                "avg_llm_path_ms": round(avg_llm_ms, 3),
+                "estimated_latency_saved_ms": round(saved_ms, 3)
+            }
+
+
+intent_stats = IntentStats()
+
+
+class IntentMatcher:
+    """
+    Recognizes the most common survey questions and emits SQL for them directly,
+    so they never reach the LLM. Returns None when the question is not understood.
+    """
+
+    def __init__(self, table_name: str, columns: List[str], cutoff: float = 0.6,
+                 numeric_columns: Optional[List[str]] = None):
+        self.table_name = table_name
+        self.question_columns = [col for col in columns if col not in META_COLUMNS]
+        self.cutoff = cutoff
+        # Averages are only emitted for columns whose answers are numbers; CAST turns free text into 0.
+        # Answers are stored as TEXT, so this comes from the data rather than the declared types
+        self.numeric_columns = [col for col in self.question_columns if col in set(numeric_columns or [])]
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        if not question or not question.strip():
+            return None
+        text = normalize_question(question)
+        table = f'"{self.table_name}"'
+
+        if ALL_RESPONSES.match(text):
+            return {"intent": "all_responses", "column": None, "sql": f"SELECT * FROM {table}"}
+
+        if COUNT_RESPONSES.match(text):
+            return {"intent": "count_responses", "column": None, "sql": f"SELECT COUNT(*) AS count FROM {table}"}
+
+        found = COUNT_ANONYMOUS.match(text)
+        if found:
+            flag = 1 if found.group("kind") == "anonymous" else 0
+            return {
+                "intent": "count_anonymous" if flag else "count_named",
+                "column": "is_anonymous",
+                "sql": f"SELECT COUNT(*) AS count FROM {table} WHERE is_anonymous = {flag}"
+            }
+
+        if ANONYMOUS_SPLIT.match(text):
+            return {
+                "intent": "anonymous_split",
+                "column": "is_anonymous",
+                "sql": (
+                    f"SELECT CASE WHEN is_anonymous = 1 THEN 'Anonymous' ELSE 'Named' END AS respondent_type, "
+                    f"COUNT(*) AS count FROM {table} GROUP BY respondent_type ORDER BY count DESC"
+                )
+            }
+
+        found = AVERAGE.match(text)
+        if found:
+            column = self.resolve_column(found.group("question"), self.numeric_columns)
+            if column:
+                return {
+                    "intent": "average",
+                    "column": column,
+                    "sql": (
+                        f'SELECT AVG(CAST("{column}" AS REAL)) AS average, COUNT("{column}") AS answered '
+                        f'FROM {table} WHERE "{column}" IS NOT NULL AND TRIM("{column}") != \'\''
+                    )
+                }
+
+        found = DISTRIBUTION.match(text) or HOW_ANSWERED.match(text)
+        if found:
+            column = self.resolve_column(found.group("question"))
+            if column:
+                return {
+                    "intent": "distribution",
+                    "column": column,
+                    "sql": (
+                        f'SELECT "{column}", COUNT(*) AS count FROM {table} '
+                        f'WHERE "{column}" IS NOT NULL GROUP BY "{column}" ORDER BY count DESC'
+                    )
+                }
+
+        return None
+
+    def resolve_column(self, question_text: str, columns: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Fuzzy-match free question text to the closest question column (or the closest of columns).
+        """
+        target = sanitize_column_name(normalize_question(question_text))
+        if not target:
+            return None
+        target_words = set(target.split("_"))
+        key_words = target_words - _STOP_WORDS or target_words
+
+        best_column, best_score = None, 0.0
+        for column in self.question_columns if columns is None else columns:
+            if column == target:
+                return column
+            ratio = SequenceMatcher(None, target, column).ratio()
+            column_words = set(normalize_question(column).split())
+            overlap = len(target_words & column_words) / len(target_words | column_words) if column_words else 0.0
+            coverage = len(key_words & column_words) / len(key_words)
+            score = max(ratio, overlap, 0.9 * coverage)
+            if score > best_score:
+                best_column, best_score = column, score
+
+        return best_column if best_score >= self.cutoff else None
+
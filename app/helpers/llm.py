@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+
+# Pipeline stages that call an LLM; each can use its own provider and model
+LLM_STAGES = ("sql_generation", "sql_repair", "chart_recommendation")
+
+
+class StubLLM(LLM):
+    """
+    Deterministic offline LLM for benchmarks and tests. Answers each stage's
+    prompt with schema-valid output (SQL for the SQL stages, VisualizationRecommendation
+    JSON for chart recommendation) after a configurable latency.
+    """
+
+    stage: str = "sql_generation"
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"stage": self.stage, "latency": self.latency}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.stage == "sql_repair":
+            return self._repair_sql(prompt)
+        if self.stage == "chart_recommendation":
+            return self._recommend_charts(prompt)
+        return self._generate_sql(prompt)
+
+    @staticmethod
+    def _generate_sql(prompt: str) -> str:
+        table = re.search(r"Table '([^']+)'", prompt)
+        table_name = table.group(1) if table else "survey"
+        question = re.search(r"^Question: (.*)$", prompt, re.MULTILINE)
+        question_text = question.group(1).lower() if question else ""
+        if "how many" in question_text or "count" in question_text:
+            return f'SELECT COUNT(*) AS count FROM "{table_name}"'
+        return f'SELECT * FROM "{table_name}"'
+
+    @staticmethod
+    def _repair_sql(prompt: str) -> str:
+        original = re.search(r"Original query:\n(.*?)\n\s*\nRules:", prompt, re.DOTALL)
+        return original.group(1).strip() if original else "SELECT 1"
+
+    @staticmethod
+    def _recommend_charts(prompt: str) -> str:
+        block = re.search(r"COLUMNS & TYPES:\n(.*?)\n\s*\n", prompt, re.DOTALL)
+        columns = re.findall(r"\s*(.+?)\((numerical|categorical)[^)]*\)(?:,|$)", block.group(1)) if block else []
+        categorical = [name.strip() for name, kind in columns if kind == "categorical"]
+        numerical = [name.strip() for name, kind in columns if kind == "numerical"]
+
+        recommendations = []
+        if categorical:
+            recommendations.append({
+                "chart_type": "bar",
+                "x_column": categorical[0],
+                "y_column": None,
+                "title": f"Distribution of {categorical[0]}",
+                "color_column": None
+            })
+        if len(numerical) >= 2:
+            recommendations.append({
+                "chart_type": "scatter",
+                "x_column": numerical[0],
+                "y_column": numerical[1],
+                "title": f"{numerical[0]} vs {numerical[1]}",
+                "color_column": None
+            })
+        return json.dumps({
+            "recommendations": recommendations,
+            "reasoning": "Deterministic stub recommendation"
+        })
+
+
+def _openai(stage: str, model: Optional[str]) -> LLM:
+    from langchain_openai import OpenAI
+
+    options = {"model": model} if model else {}
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), temperature=0, **options)
+
+
+def _stub(stage: str, model: Optional[str]) -> LLM:
+    return StubLLM(stage=stage, latency=float(os.getenv("LLM_STUB_LATENCY", "0")))
+
+
+PROVIDERS: Dict[str, Callable[[str, Optional[str]], LLM]] = {
+    "openai": _openai,
+    "stub": _stub,
+}
+
+
+def register_provider(name: str, factory: Callable[[str, Optional[str]], LLM]):
+    """
+    Make another backend available to the LLM_PROVIDER settings.
+    """
+    PROVIDERS[name] = factory
+
+
+def get_llm(stage: str) -> LLM:
+    """
+    LLM for a pipeline stage. LLM_PROVIDER_<STAGE> / LLM_MODEL_<STAGE> override
+    the LLM_PROVIDER / LLM_MODEL defaults (provider defaults to openai).
+    """
+    if stage not in LLM_STAGES:
+        raise ValueError(f"Unknown LLM stage: {stage}")
+    key = stage.upper()
+    provider = os.getenv(f"LLM_PROVIDER_{key}", os.getenv("LLM_PROVIDER", "openai")).lower()
+    model = os.getenv(f"LLM_MODEL_{key}", os.getenv("LLM_MODEL")) or None
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}' for stage {stage}")
+    return PROVIDERS[provider](stage, model)
@@ -0,0 +1,346 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from typing import Dict, Any, List, Optional
+
+
+POOL_MAX_READERS = int(os.getenv("SQLITE_POOL_MAX_READERS", "4"))
+POOL_IDLE_TIMEOUT = float(os.getenv("SQLITE_POOL_IDLE_TIMEOUT", "300"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("SQLITE_POOL_CHECKOUT_TIMEOUT", "30"))
+# Seconds between sweeps of the background reaper that closes idle readers (0 disables it)
+POOL_REAP_INTERVAL = float(os.getenv("SQLITE_POOL_REAP_INTERVAL", "60"))
+# Bounds open file descriptors when serving many surveys: least recently used pools are closed
+MAX_OPEN_POOLS = int(os.getenv("SQLITE_MAX_OPEN_POOLS", "64"))
+
+# Read connections are tuned for analytics scans over a mostly static file
+READER_PRAGMAS = [
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))};",
+    f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KB', '16384'))};",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA query_only=ON;",
+]
+
+
+class PoolTimeout(Exception):
+    """Raised when no reader connection becomes free within the checkout timeout."""
+
+
+class PoolClosed(RuntimeError):
+    """Raised when checking out from a pool that has been closed or swapped out."""
+
+
+class ConnectionPool:
+    """
+    Per-database SQLite pool: up to max_readers read-only connections shared
+    across threads, plus a single writer connection serialized by a lock.
+    Idle readers are closed after idle_timeout seconds. Pass reader_uri to
+    read from something other than the file itself (e.g. an in-memory replica).
+    """
+
+    def __init__(self, db_path: str, max_readers: int = POOL_MAX_READERS,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT, checkout_timeout: float = POOL_CHECKOUT_TIMEOUT,
+                 reader_uri: Optional[str] = None):
+        self.db_path = db_path
+        self.reader_uri = reader_uri or f"file:{db_path}?mode=ro"
+        self.max_readers = max_readers
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        self._idle: List[tuple] = []  # (connection, last_used)
+        self._open_readers = 0
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        self.metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "readers_created": 0,
+            "readers_closed": 0,
+            "writer_checkouts": 0,
+        }
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.reader_uri,
+            uri=True,
+            timeout=30,
+            check_same_thread=False
+        )
+        for pragma in READER_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _connect_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL;')
+        conn.execute('PRAGMA synchronous=NORMAL;')
+        return conn
+
+    def _close_idle_locked(self, now: float):
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                conn.close()
+                self._open_readers -= 1
+                self.metrics["readers_closed"] += 1
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    def close_idle(self):
+        """
+        Close reader connections that have not been used within the idle timeout.
+        """
+        with self._cond:
+            self._close_idle_locked(time.monotonic())
+
+    @contextmanager
+    def reader(self):
+        """
+        Check out a read-only connection; it is returned to the pool on exit.
+        """
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def checkout(self) -> sqlite3.Connection:
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        with self._cond:
+            if self._closed:
+                raise PoolClosed(f"Connection pool for {self.db_path} is closed")
+            self._close_idle_locked(started)
+            waited = False
+            while True:
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._open_readers < self.max_readers:
+                    # Reserve the slot before connecting outside the lock
+                    self._open_readers += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics["timeouts"] += 1
+                    raise PoolTimeout(f"No reader connection available for {self.db_path}")
+                waited = True
+                self._cond.wait(remaining)
+
+            elapsed = time.monotonic() - started
+            self.metrics["checkouts"] += 1
+            if waited:
+                self.metrics["waits"] += 1
+                self.metrics["wait_seconds"] += elapsed
+                self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], elapsed)
+
+        if conn is None:
+            try:
+                conn = self._connect_reader()
+            except Exception:
+                with self._cond:
+                    self._open_readers -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.metrics["readers_created"] += 1
+        return conn
+
+    def checkin(self, conn: sqlite3.Connection):
+        with self._cond:
+            if self._closed:
+                conn.close()
+                self._open_readers -= 1
+                self.metrics["readers_closed"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def writer(self):
+        """
+        Exclusive access to the single writer connection. Commits on success, rolls back on error.
+        """
+        with self._writer_lock:
+            if self._closed:
+                raise PoolClosed(f"Connection pool for {self.db_path} is closed")
+            if self._writer is None:
+                self._writer = self._connect_writer()
+            self.metrics["writer_checkouts"] += 1
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def close(self):
+        """
+        Close idle connections now; readers still checked out are closed on checkin.
+        """
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                conn.close()
+                self._open_readers -= 1
+                self.metrics["readers_closed"] += 1
+            self._idle = []
+            self._cond.notify_all()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def busy(self) -> bool:
+        """
+        True while a reader is checked out or the writer is in use.
+        """
+        with self._cond:
+            readers_in_use = self._open_readers - len(self._idle)
+        return readers_in_use > 0 or self._writer_lock.locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "db_path": self.db_path,
+                "open_readers": self._open_readers,
+                "idle_readers": len(self._idle),
+                "in_use_readers": self._open_readers - len(self._idle),
+                "max_readers": self.max_readers,
+                **self.metrics,
+                "wait_seconds": round(self.metrics["wait_seconds"], 6),
+                "max_wait_seconds": round(self.metrics["max_wait_seconds"], 6),
+            }
+
+
+_pools: "OrderedDict[str, ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """
+    Shared pool for a database file, created on first use. At most MAX_OPEN_POOLS
+    are kept; the least recently used idle pools are closed beyond that, so callers
+    use pooled_reader/pooled_writer, which retry when that happens before they check out.
+    """
+    key = os.path.abspath(db_path)
+    evicted = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key)
+            _pools[key] = pool
+            excess = len(_pools) - MAX_OPEN_POOLS
+            for path in list(_pools):
+                if excess <= 0:
+                    break
+                if path != key and not _pools[path].busy():
+                    evicted.append(_pools.pop(path))
+                    excess -= 1
+        else:
+            _pools.move_to_end(key)
+    for victim in evicted:
+        victim.close()
+    return pool
+
+
+# get_pool may hand out a pool that is evicted before the caller checks out from it
+POOL_CLOSED_RETRIES = 3
+
+
+@contextmanager
+def pooled_reader(db_path: str):
+    """
+    Read connection from the shared pool of db_path, looking the pool up again if it was
+    closed between get_pool and the checkout.
+    """
+    for attempt in range(POOL_CLOSED_RETRIES):
+        pool = get_pool(db_path)
+        try:
+            conn = pool.checkout()
+            break
+        except PoolClosed:
+            if attempt == POOL_CLOSED_RETRIES - 1:
+                raise
+    try:
+        yield conn
+    finally:
+        pool.checkin(conn)
+
+
+@contextmanager
+def pooled_writer(db_path: str):
+    """
+    The writer connection of the shared pool of db_path, retried like pooled_reader.
+    Commits on success, rolls back on error.
+    """
+    with ExitStack() as stack:
+        for attempt in range(POOL_CLOSED_RETRIES):
+            try:
+                conn = stack.enter_context(get_pool(db_path).writer())
+                break
+            except PoolClosed:
+                if attempt == POOL_CLOSED_RETRIES - 1:
+                    raise
+        yield conn
+
+
+def close_pool(db_path: str):
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close()
+
+
+def close_idle_connections():
+    """
+    Close idle readers across every pool.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+_reaper_stop: Optional[threading.Event] = None
+
+
+def start_idle_reaper(interval: float = POOL_REAP_INTERVAL) -> Optional[threading.Event]:
+    """
+    Close idle readers every interval seconds in a background thread. Checkout also reaps
+    its own pool, but pools of surveys that stop being queried are never checked out again.
+    Returns an event that stops the reaper when set; None when disabled.
+    """
+    global _reaper_stop
+    if interval <= 0:
+        return None
+    with _pools_lock:
+        if _reaper_stop is not None and not _reaper_stop.is_set():
+            return _reaper_stop
+        stop = _reaper_stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                close_idle_connections()
+            except Exception as e:
+                print(f"Closing idle connections failed: {e}")
+
+    threading.Thread(target=run, name="pool-reaper", daemon=True).start()
+    return stop
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
@@ -1,30 +1,60 @@
 import os
-import sqlite3
-from typing import List, Dict, Any, Tuple
+import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Callable
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from langchain_openai import OpenAI
-from langchain_community.utilities import SQLDatabase
-from langchain.chains import LLMChain
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .fetcher import get_data_from_api
-from .graph import SmartVisualizationSystem
+from .llm import get_llm
+from .graph import SmartVisualizationSystem, VisualizationRecommendation, BarChart, PieChart, SQLSource, RowSource, numeric_test, quote
+from .column_profiler import PROFILE_SAMPLE_ROWS, PROFILE_TYPE_THRESHOLD
+from .intents import IntentMatcher, intent_stats
+from .schema import CompactSchema, prompt_stats
+from .catalog import load_catalog, column_descriptions, describe_columns
+from .replica import replicas
+from .snapshots import pinned_snapshot, resolve_snapshot, snapshots
+from .storage import storage
+from .metrics import span, record_llm_call, record_cache, rows_returned
+from .profiler import profiled
+from .cache import shared_cache, file_key
+from .admission import admission, set_priority, Overloaded, PRIORITY_CHEAP
+
+MAX_CACHED_PROCESSORS = int(os.getenv("MAX_CACHED_PROCESSORS", "32"))
+# Results of queries against a snapshot are shared by all workers through the on-disk cache
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+# Larger results are not cached, and their charts aggregate in SQLite instead of over the fetched rows
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "5000"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "500"))
+SCHEMA_CACHE_MAX_ENTRIES = 256
+
+def pinned(method):
+    """
+    Run a SQLProcessor method against a single survey snapshot from start to finish.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with pinned_snapshot(self.db_path):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class SQLProcessor:
     def __init__(self, survey_id: int):
         """
         Initialize processor with survey data from API and set up database connections.
         """
+        self.survey_id = survey_id
         self.db_path, self.table_name = get_data_from_api(survey_id)
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.snapshot_version = snapshots.current_version(self.db_path)
         
-        self.engine = create_engine(f"sqlite:///{self.db_path}")
-        self.db = SQLDatabase(self.engine)
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
+        replicas.record_access(self.db_path)
         
-        self.llm = OpenAI(api_key=self.openai_api_key, temperature=0)
+        self.generation_llm = get_llm("sql_generation")
+        self.repair_llm = get_llm("sql_repair")
         
         self.query_prompt = PromptTemplate(
             input_variables=["question", "table_info"],
@@ -68,57 +98,119 @@ Rules:
 Fixed query:"""
         )
         self.visualization_system = SmartVisualizationSystem()
+        columns = self.get_table_columns()
+        self.intent_matcher = IntentMatcher(self.table_name, columns, numeric_columns=self.get_numeric_columns(columns))
+        self.compact_prompts = os.getenv("PROMPT_COMPACTION", "true").lower() == "true"
+        self.schema = CompactSchema(
+            self.table_name,
+            columns,
+            descriptions=column_descriptions(self.get_question_catalog()),
+            max_columns=int(os.getenv("PROMPT_MAX_COLUMNS", "30"))
+        )
+
+    def reader(self):
+        """
+        Check out a read connection on the pinned (or current) snapshot, served from the
+        in-memory replica when the survey is hot.
+        """
+        return replicas.reader(self.db_path)
+
+    def get_table_columns(self) -> List[str]:
+        """
+        Column names of the survey table, in schema order.
+        """
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"PRAGMA table_info({self.table_name})")
+            return [col[1] for col in cursor.fetchall()]
+
+    def get_numeric_columns(self, columns: List[str]) -> List[str]:
+        """
+        Columns whose non-empty answers are numbers or numeric text, judged on the first
+        PROFILE_SAMPLE_ROWS rows like the chart column profile.
+        """
+        if not columns:
+            return []
+        counts = ", ".join(
+            f"SUM({quote(col)} IS NOT NULL AND trim({quote(col)}) != ''), SUM({numeric_test(quote(col))})"
+            for col in columns
+        )
+        selected = ", ".join(quote(col) for col in columns)
+        with self.reader() as conn:
+            row = conn.execute(
+                f"SELECT {counts} FROM (SELECT {selected} FROM {self.table_name} LIMIT {PROFILE_SAMPLE_ROWS})"
+            ).fetchone()
+        return [
+            col for col, answered, numeric in zip(columns, row[::2], row[1::2])
+            if answered and numeric / answered >= PROFILE_TYPE_THRESHOLD
+        ]
+
+    def snapshot_key(self) -> str:
+        """
+        Identity of the snapshot being read, for the shared caches.
+        """
+        return file_key(resolve_snapshot(self.db_path))
 
     def get_table_info(self) -> str:
         """
         Retrieves database schema information for query generation using pure SQL.
+        Cached per snapshot, since a published snapshot never changes.
         """
-        cursor = self.conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        table_info = []
-        for table_row in tables:
-            table_name = table_row[0]
-            
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
+        cache_key = self.snapshot_key()
+        cached = shared_cache.get("schema", cache_key)
+        if cached is not None:
+            return cached
+
+        with self.reader() as conn:
+            cursor = conn.cursor()
             
-            column_names = [col[1] for col in columns]
-            column_types = [f"{col[1]} ({col[2]})" for col in columns]
+            # Internal tables (_dashboard, ...) are not part of the survey schema
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '\\_%' ESCAPE '\\'")
+            tables = cursor.fetchall()
             
-            table_info.append(f"Table '{table_name}' columns: {', '.join(column_types)}")
+            table_info = []
+            for table_row in tables:
+                table_name = table_row[0]
+                
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                columns = cursor.fetchall()
+                
+                column_types = [f"{col[1]} ({col[2]})" for col in columns]
+                
+                table_info.append(f"Table '{table_name}' columns: {', '.join(column_types)}")
         
-        return "\n".join(table_info)
+        table_info = "\n".join(table_info)
+        shared_cache.set("schema", cache_key, table_info, max_entries=SCHEMA_CACHE_MAX_ENTRIES)
+        return table_info
 
     def get_sample_data(self, limit: int = 5) -> Dict[str, List[Dict]]:
         """
         Get sample data from all tables using pure SQL.
         """
-        cursor = self.conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        sample_data = {}
-        for table_row in tables:
-            table_name = table_row[0]
+        with self.reader() as conn:
+            cursor = conn.cursor()
             
-            try:
-                cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit}")
-                rows = cursor.fetchall()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '\\_%' ESCAPE '\\'")
+            tables = cursor.fetchall()
+            
+            sample_data = {}
+            for table_row in tables:
+                table_name = table_row[0]
                 
-                if rows:
-                    columns = [description[0] for description in cursor.description]
-                    sample_data[table_name] = [
-                        dict(zip(columns, row)) for row in rows
-                    ]
-                else:
-                    sample_data[table_name] = []
+                try:
+                    cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit}")
+                    rows = cursor.fetchall()
                     
-            except Exception as e:
-                sample_data[table_name] = {"error": str(e)}
+                    if rows:
+                        columns = [description[0] for description in cursor.description]
+                        sample_data[table_name] = [
+                            dict(zip(columns, row)) for row in rows
+                        ]
+                    else:
+                        sample_data[table_name] = []
+                        
+                except Exception as e:
+                    sample_data[table_name] = {"error": str(e)}
                 
         return sample_data
 
@@ -132,14 +224,20 @@ Fixed query:"""
         if "limit" not in input_text.lower():
             input_text += " (do not limit results unless specifically asked)"
         
-        table_info = self.get_table_info()
+        full_info = self.get_table_info()
+        table_info = self.schema.render(input_text) if self.compact_prompts else full_info
         
         try:
-            chain = self.query_prompt | self.llm | StrOutputParser()
-            response = chain.invoke({
-                "question": input_text,
-                "table_info": table_info
-            })
+            chain = self.query_prompt | self.generation_llm | StrOutputParser()
+            started = time.perf_counter()
+            with admission.slot("llm"), span("sql_generation"):
+                response = chain.invoke({
+                    "question": input_text,
+                    "table_info": table_info
+                })
+            record_llm_call("sql_generation")
+            prompt_stats.record("sql_generation", self.prompt_mode, len(full_info), len(table_info),
+                                time.perf_counter() - started)
             
             sql_query = response.strip()
             
@@ -149,8 +247,13 @@ Fixed query:"""
             if not sql_query.upper().startswith(('SELECT', 'WITH')):
                 raise ValueError(f"Invalid SQL query. Must start with SELECT or WITH. Got: {sql_query[:20]}...")
             
-            return self.preprocess_query(sql_query)
+            if self.compact_prompts:
+                sql_query = self.schema.to_real(sql_query)
             
+            return self.preprocess_query(sql_query, question=input_text)
+            
+        except Overloaded:
+            raise
         except Exception as e:
             try:
                 fallback_query = f'SELECT COUNT(*) as count FROM "{self.table_name}"'
@@ -161,26 +264,46 @@ Fixed query:"""
             
             raise ValueError(f"Failed to generate valid SQL query: {str(e)}")
 
-    def preprocess_query(self, query: str) -> str:
+    @property
+    def prompt_mode(self) -> str:
+        return "compact" if self.compact_prompts else "full"
+
+    def preprocess_query(self, query: str, question: str = "") -> str:
         """
         Validates and fixes SQL query to ensure proper execution.
+        With prompt compaction the query is sent using column aliases and mapped back afterwards.
         """
-        table_info = self.get_table_info()
+        full_info = self.get_table_info()
+        if self.compact_prompts:
+            prompt_query = self.schema.to_alias(query)
+            table_info = self.schema.render(question, include=self.schema.referenced_aliases(prompt_query))
+        else:
+            prompt_query, table_info = query, full_info
         
         try:
-            chain = self.preprocessing_prompt | self.llm | StrOutputParser()
-            response = chain.invoke({
-                "query": query,
-                "table_info": table_info
-            })
+            chain = self.preprocessing_prompt | self.repair_llm | StrOutputParser()
+            started = time.perf_counter()
+            with admission.slot("llm"), span("sql_repair"):
+                response = chain.invoke({
+                    "query": prompt_query,
+                    "table_info": table_info
+                })
+            record_llm_call("sql_repair")
+            prompt_stats.record("sql_repair", self.prompt_mode, len(full_info), len(table_info),
+                                time.perf_counter() - started)
             
             fixed_query = response.strip()
             
             if not fixed_query.upper().startswith(('SELECT', 'WITH')):
                 raise ValueError("Fixed query doesn't start with SELECT or WITH")
             
+            if self.compact_prompts:
+                fixed_query = self.schema.to_real(fixed_query)
+            
             return fixed_query
             
+        except Overloaded:
+            raise
         except Exception:
             return query
 
@@ -204,42 +327,60 @@ Fixed query:"""
         Test if a query can be executed without errors.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            cursor.fetchone()
+            with self.reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                cursor.fetchone()
             return True
         except Exception:
             return False
 
-    def execute_query(self, query: str) -> Dict[str, Any]:
+    @pinned
+    def execute_query(self, query: str, preprocess: bool = True) -> Dict[str, Any]:
         """
         Executes SQL query and returns results with metadata using pure SQL.
+        Set preprocess=False for trusted SQL that must not go through the LLM repair step.
         """
         try:
             query = self.clean_sql_query(query)
-            query = self.preprocess_query(query)
-            
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            
-            columns = [description[0] for description in cursor.description]
-            
-            rows = cursor.fetchall()
+            if preprocess:
+                query = self.preprocess_query(query)
+            
+            cache_key = hashlib.sha256(f"{self.snapshot_key()}\n{query}".encode()).hexdigest()
+            cached = shared_cache.get("query", cache_key)
+            record_cache("query_result", cached is not None)
+            if cached is not None:
+                rows_returned.observe(cached["row_count"])
+                return cached
+            
+            with admission.slot("sql"), span("sql_execution"), self.reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                
+                columns = [description[0] for description in cursor.description]
+                
+                rows = cursor.fetchall()
             
             data = [dict(zip(columns, row)) for row in rows]
+            rows_returned.observe(len(data))
             
-            return {
+            result = {
                 "data": data,
                 "columns": columns,
                 "row_count": len(data),
                 "success": True,
                 "query_executed": query
             }
+            if len(data) <= QUERY_CACHE_MAX_ROWS:
+                shared_cache.set("query", cache_key, result, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES)
+            return result
             
+        except Overloaded:
+            raise
         except Exception as e:  
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("SELECT 1")
+                with self.reader() as conn:
+                    conn.execute("SELECT 1")
                 connection_error = False
             except Exception:
                 connection_error = True
@@ -255,6 +396,7 @@ Fixed query:"""
                 "query_executed": query
             }
 
+    @pinned
     def get_aggregated_stats(self, table_name: str = None) -> Dict[str, Any]:
         """
         Get basic statistics about the database using SQL aggregations.
@@ -262,48 +404,78 @@ Fixed query:"""
         if not table_name:
             table_name = self.table_name
             
-        cursor = self.conn.cursor()
         stats = {}
         
         try:
-            cursor.execute(f"SELECT COUNT(*) as total_rows FROM {table_name}")
-            stats["total_rows"] = cursor.fetchone()[0]
-            
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = cursor.fetchall()
-            
-            stats["columns"] = []
-            for col_info in columns_info:
-                col_name = col_info[1]
-                col_type = col_info[2]
+            with admission.slot("sql"), span("stats"), self.reader() as conn:
+                cursor = conn.cursor()
                 
-                col_stats = {
-                    "name": col_name,
-                    "type": col_type,
-                    "null_count": 0,
-                    "distinct_count": 0
-                }
+                cursor.execute(f"SELECT COUNT(*) as total_rows FROM {table_name}")
+                stats["total_rows"] = cursor.fetchone()[0]
                 
-                try:
-                    cursor.execute(f'SELECT COUNT(*) FROM {table_name} WHERE "{col_name}" IS NULL')
-                    col_stats["null_count"] = cursor.fetchone()[0]
-                    
-                    cursor.execute(f'SELECT COUNT(DISTINCT "{col_name}") FROM {table_name}')
-                    col_stats["distinct_count"] = cursor.fetchone()[0]
-                    
-                except Exception as e:
-                    col_stats["error"] = str(e)
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                columns_info = cursor.fetchall()
                 
-                stats["columns"].append(col_stats)
+                stats["columns"] = []
+                for col_info in columns_info:
+                    col_name = col_info[1]
+                    col_type = col_info[2]
+                
+                    col_stats = {
+                        "name": col_name,
+                        "type": col_type,
+                        "null_count": 0,
+                        "distinct_count": 0
+                    }
+                
+                    try:
+                        cursor.execute(f'SELECT COUNT(*) FROM {table_name} WHERE "{col_name}" IS NULL')
+                        col_stats["null_count"] = cursor.fetchone()[0]
+                
+                        cursor.execute(f'SELECT COUNT(DISTINCT "{col_name}") FROM {table_name}')
+                        col_stats["distinct_count"] = cursor.fetchone()[0]
+                
+                    except Exception as e:
+                        col_stats["error"] = str(e)
+                
+                    stats["columns"].append(col_stats)
                 
         except Exception as e:
             stats["error"] = str(e)
             
         return stats
 
-    def create_visualizations(self, query_result: Dict[str, Any], user_query: str) -> Dict[str, Any]:
+    def intent_recommendations(self, intent: Dict[str, Any]) -> VisualizationRecommendation:
+        """
+        Deterministic chart choice for a fast path intent, so it skips the visualization LLM too.
+        """
+        charts = []
+        column = intent.get("column")
+        if intent["intent"] == "distribution":
+            charts.append(BarChart(
+                x_column=column,
+                y_column="count",
+                title=f"Distribution of {column}",
+                color_column=None
+            ))
+        elif intent["intent"] == "anonymous_split":
+            charts.append(PieChart(
+                values_column="count",
+                names_column="respondent_type",
+                title="Anonymous vs named responses"
+            ))
+        return VisualizationRecommendation(
+            recommendations=charts,
+            reasoning=f"Chart selected for the recognized '{intent['intent']}' question"
+        )
+
+    def create_visualizations(self, query_result: Dict[str, Any], user_query: str,
+                              recommendations: VisualizationRecommendation = None,
+                              on_chart: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
         """
         Use SmartVisualizationSystem to generate visualization suggestions and chart configs.
+        Small (and so cacheable) results are charted from the rows already fetched; larger ones
+        aggregate in SQLite against the pinned snapshot, so only aggregated rows reach Python.
         """
         if not query_result["success"] or not query_result["data"]:
             return {
@@ -314,16 +486,49 @@ Fixed query:"""
             }
         data = query_result["data"]
         columns = query_result["columns"]   
-        result = self.visualization_system.create_visualizations(data, columns, user_query)
+        if len(data) > QUERY_CACHE_MAX_ROWS:
+            source = SQLSource(query_result["query_executed"], self.run_chart_query)
+        else:
+            source = RowSource(data)
+        result = self.visualization_system.create_visualizations(
+            data, columns, user_query, recommendations, source, on_chart
+        )
         return result
 
-    def process_query_with_visualizations(self, user_query: str) -> Dict[str, Any]:
+    def run_chart_query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """
+        Query function for SQLSource: an aggregation over the executed query, on the pinned snapshot.
+        """
+        with admission.slot("sql"), self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @profiled("process_query")
+    @pinned
+    def process_query_with_visualizations(self, user_query: str, include_stats: bool = True,
+                                          emit: Callable[[str, Any], None] = None) -> Dict[str, Any]:
         """
         Complete pipeline: generates SQL, executes query, and analyzes for visualizations.
+        include_stats=False skips the table statistics (batches need them at most once).
+        emit, when given, is called with each stage's output as soon as it is ready:
+        ("sql", ...), ("query_result", ...), ("chart", ...) per chart, then ("stats", ...).
         """
-        try:    
-            sql_query = self.create_query(user_query)
-            query_result = self.execute_query(sql_query)
+        emit = emit or (lambda event, payload: None)
+        try:
+            started = time.perf_counter()
+            intent = self.intent_matcher.match(user_query)
+            record_cache("fast_path", intent is not None)
+            if intent:
+                # Fast path requests need no LLM; serve them ahead of full pipeline work
+                set_priority(PRIORITY_CHEAP)
+                sql_query = intent["sql"]
+                emit("sql", {"sql_query": sql_query, "fast_path": intent["intent"]})
+                query_result = self.execute_query(sql_query, preprocess=False)
+                intent_stats.record_hit(intent["intent"], time.perf_counter() - started)
+            else:
+                sql_query = self.create_query(user_query)
+                emit("sql", {"sql_query": sql_query, "fast_path": None})
+                query_result = self.execute_query(sql_query)
+                intent_stats.record_miss(time.perf_counter() - started)
             
             if not query_result["success"]:
                 return {
@@ -338,16 +543,26 @@ Fixed query:"""
                     "error": query_result.get("error", "Query execution failed")
                 }
             
-            viz_result = self.create_visualizations(query_result, user_query)
+            emit("query_result", query_result)
+            recommendations = self.intent_recommendations(intent) if intent else None
+            viz_result = self.create_visualizations(
+                query_result, user_query, recommendations, lambda chart: emit("chart", chart)
+            )
+            stats = self.get_aggregated_stats() if include_stats else None
+            if stats is not None:
+                emit("stats", stats)
             
             return {
                 "sql_query": sql_query,
                 "query_result": query_result,
                 "visualizations": viz_result,
                 "success": True,
-                "stats": self.get_aggregated_stats()
+                "fast_path": intent["intent"] if intent else None,
+                "stats": stats
             }
             
+        except Overloaded:
+            raise
         except Exception as e:
             return {
                 "sql_query": "",
@@ -367,38 +582,44 @@ Fixed query:"""
                 "error": str(e)
             }
 
-    def get_survey_questions(self) -> List[str]:
+    @pinned
+    def get_question_catalog(self) -> List[Dict[str, Any]]:
+        """
+        Questions of the survey as stored at ingest: text, page, order, column, type and options.
+        """
+        with self.reader() as conn:
+            return load_catalog(conn)
+
+    @pinned
+    def get_survey_questions(self) -> List[Dict[str, Any]]:
         """
-        Get all questions for the survey from the database schema.
+        Get all questions of the survey in catalog order: column name, original text and type.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(f"PRAGMA table_info({self.table_name})")
-            columns = cursor.fetchall()
-            
             question_columns = []
-            for col in columns:
-                col_name = col[1]
+            for col_name in self.get_table_columns():
                 if col_name not in ['contact_id', 'name', 'is_anonymous']:
                     question_columns.append(col_name)
             
-            return question_columns
+            return describe_columns(question_columns, self.get_question_catalog())
         except Exception as e:
             print(f"Error getting survey questions: {e}")
             return []
 
+    @pinned
     def get_survey_summary(self) -> Dict[str, Any]:
         """
         Get a summary of survey responses including response count and basic stats.
         """
         try:
-            cursor = self.conn.cursor()
-            
-            cursor.execute(f"SELECT COUNT(*) as total_responses FROM {self.table_name}")
-            total_responses = cursor.fetchone()[0]
-            
-            cursor.execute(f"SELECT COUNT(*) as anonymous_count FROM {self.table_name} WHERE is_anonymous = 1")
-            anonymous_count = cursor.fetchone()[0]
+            with self.reader() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute(f"SELECT COUNT(*) as total_responses FROM {self.table_name}")
+                total_responses = cursor.fetchone()[0]
+                
+                cursor.execute(f"SELECT COUNT(*) as anonymous_count FROM {self.table_name} WHERE is_anonymous = 1")
+                anonymous_count = cursor.fetchone()[0]
             named_count = total_responses - anonymous_count
             
             questions = self.get_survey_questions()
@@ -423,17 +644,43 @@ Fixed query:"""
                 "questions": []
             }
 
-    def __del__(self):
-        """
-        Clean up database connection on object destruction.
-        """
-        if hasattr(self, 'conn'):
-            self.conn.close()
+
+_processors: "OrderedDict[int, SQLProcessor]" = OrderedDict()
+_processors_lock = threading.Lock()
+_survey_locks: Dict[int, threading.Lock] = {}
+
+
+def get_processor(survey_id: int) -> SQLProcessor:
+    """
+    Shared SQLProcessor for a survey. Processors are kept in an LRU of
+    MAX_CACHED_PROCESSORS and rebuilt when a newer snapshot has been published,
+    so schema-derived state (intent matcher, column aliases) stays current.
+    """
+    with _processors_lock:
+        survey_lock = _survey_locks.setdefault(survey_id, threading.Lock())
+    with survey_lock:
+        with _processors_lock:
+            processor = _processors.get(survey_id)
+        if processor is not None and processor.snapshot_version == snapshots.current_version(storage.survey_path(survey_id)):
+            replicas.record_access(processor.db_path)
+            with _processors_lock:
+                _processors.move_to_end(survey_id)
+            record_cache("processor", True)
+            return processor
+
+        record_cache("processor", False)
+        processor = SQLProcessor(survey_id=survey_id)
+        with _processors_lock:
+            _processors[survey_id] = processor
+            _processors.move_to_end(survey_id)
+            while len(_processors) > MAX_CACHED_PROCESSORS:
+                _processors.popitem(last=False)
+        return processor
 
 
 if __name__ == "__main__":
     import json
-    processor = SQLProcessor(survey_id=3200079)
+    processor = get_processor(survey_id=3200079)
     
     result = processor.process_query_with_visualizations("Give me all the responses")
     
@@ -0,0 +1,187 @@
+import os
+import io
+import hmac
+import json
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+from .storage import storage
+
+# Requests carrying this token in an X-Profile-Token header are profiled. It is never read from
+# the query string, which ends up in access logs and browser history.
+# Unset disables opt-in profiling and the profile endpoints.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Fraction of all requests profiled without opting in
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MAX_RETAINED = int(os.getenv("PROFILE_MAX_RETAINED", "50"))
+
+_requested: ContextVar[Optional[Dict[str, Any]]] = ContextVar("profile_request", default=None)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    # Compared as bytes: compare_digest rejects str with non-ASCII characters, which headers can carry
+    return bool(PROFILE_ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+
+class ProfileStore:
+    """
+    Keeps the most recent cProfile results as pstats files (<id>.prof, readable by
+    snakeviz, gprof2dot or flameprof) with a JSON sidecar, capped at max_retained.
+    Only one profile runs at a time per process so profiling overhead stays bounded.
+    """
+
+    def __init__(self, directory: str, max_retained: int = PROFILE_MAX_RETAINED):
+        self.directory = directory
+        self.max_retained = max_retained
+        self._active = threading.Lock()
+        self.skipped = 0
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        if not profile_id.isalnum():
+            raise ValueError(f"Invalid profile id: {profile_id}")
+        return os.path.join(self.directory, f"{profile_id}.{suffix}")
+
+    @contextmanager
+    def profile(self, label: str, context: Optional[Dict[str, Any]] = None):
+        """
+        Run the block under cProfile and store the result. Yields the profile id,
+        or None when another profile is already running.
+        """
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            yield None
+            return
+        profile_id = uuid.uuid4().hex[:16]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                yield profile_id
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+            self._save(profile_id, profiler, {
+                "id": profile_id,
+                "label": label,
+                "created": time.time(),
+                "duration_seconds": round(duration, 6),
+                "context": context or {}
+            })
+        finally:
+            self._active.release()
+
+    def _save(self, profile_id: str, profiler: cProfile.Profile, meta: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(self._path(profile_id, "prof"))
+        with open(self._path(profile_id, "json"), "w") as handle:
+            json.dump(meta, handle)
+        self._trim()
+
+    def _trim(self):
+        entries = self.list()
+        for entry in entries[self.max_retained:]:
+            self.delete(entry["id"])
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Stored profiles, newest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as handle:
+                    entries.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda entry: entry.get("created", 0), reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(profile_id, "json")) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def pstats_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, "prof")
+        return path if os.path.exists(path) else None
+
+    def report(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """
+        Human readable top functions of a stored profile.
+        """
+        path = self.pstats_path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def delete(self, profile_id: str):
+        for suffix in ("prof", "json"):
+            try:
+                os.remove(self._path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+profiles = ProfileStore(os.path.join(storage.data_dir, "profiles"))
+
+
+def should_profile(token: Optional[str]) -> bool:
+    """
+    Opt in with the admin token, otherwise sample at PROFILE_SAMPLE_RATE.
+    """
+    if is_admin(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def request_profile(context: Dict[str, Any]):
+    """
+    Mark the current request for profiling. Returns a holder that receives the
+    ids of the profiles taken while serving it, and a token for end_request.
+    """
+    holder = {"context": context, "ids": []}
+    return holder, _requested.set(holder)
+
+
+def end_request(token):
+    _requested.reset(token)
+
+
+def profiled(label: str):
+    """
+    Profile the decorated function when the current request asked for it. Nested
+    profiled calls are covered by the outermost one.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            holder = _requested.get()
+            if holder is None or holder.get("active"):
+                return fn(*args, **kwargs)
+            holder["active"] = True
+            try:
+                with profiles.profile(label, holder["context"]) as profile_id:
+                    if profile_id:
+                        holder["ids"].append(profile_id)
+                    return fn(*args, **kwargs)
+            finally:
+                holder["active"] = False
+        return wrapper
+    return decorator
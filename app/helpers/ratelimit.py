@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import threading
+
+from limits.storage import Storage
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from .pool import pooled_reader, pooled_writer
+from .storage import storage
+
+# Shared by every worker process so limits hold per client, not per client and worker.
+# Set to memory:// for the old per-process behaviour.
+RATE_LIMIT_STORAGE_URI = os.getenv(
+    "RATE_LIMIT_STORAGE_URI",
+    f"sqlite:///{os.path.join(storage.data_dir, 'ratelimits.db')}"
+)
+
+
+class SQLiteStorage(Storage):
+    """
+    limits storage backed by a local SQLite file, so fixed-window counters are
+    shared across uvicorn workers without an external service. Each increment is
+    a single atomic upsert. URIs follow SQLAlchemy: sqlite:///relative/path.db or
+    sqlite:////absolute/path.db.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    # Expired windows are purged every this many increments
+    PURGE_EVERY = 1000
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = os.path.abspath(uri[len("sqlite:///"):])
+        self._increments = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _ensure_initialized(self):
+        """
+        Create the file on first use rather than when the limiter is built at import time.
+        """
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with pooled_writer(self.path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS rate_limits (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL,
+                        expiry REAL NOT NULL
+                    )
+                """)
+            self._initialized = True
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        self._ensure_initialized()
+        with pooled_writer(self.path) as conn:
+            value = conn.execute(
+                """
+                INSERT INTO rate_limits (key, value, expiry) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = CASE WHEN expiry <= ? THEN excluded.value ELSE value + excluded.value END,
+                    expiry = CASE WHEN expiry <= ? THEN excluded.expiry ELSE expiry END
+                RETURNING value
+                """,
+                (key, amount, now + expiry, now, now)
+            ).fetchone()[0]
+            with self._lock:
+                self._increments += 1
+                purge = self._increments % self.PURGE_EVERY == 0
+            if purge:
+                conn.execute("DELETE FROM rate_limits WHERE expiry <= ?", (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        self._ensure_initialized()
+        with pooled_reader(self.path) as conn:
+            row = conn.execute(
+                "SELECT value FROM rate_limits WHERE key = ? AND expiry > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        self._ensure_initialized()
+        with pooled_reader(self.path) as conn:
+            row = conn.execute("SELECT expiry FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row and row[0] > time.time() else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._ensure_initialized()
+            with pooled_reader(self.path) as conn:
+                conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        self._ensure_initialized()
+        with pooled_writer(self.path) as conn:
+            return conn.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str):
+        self._ensure_initialized()
+        with pooled_writer(self.path) as conn:
+            conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+# The one limiter for the app and all routers
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE_URI)
@@ -0,0 +1,265 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from .pool import ConnectionPool, PoolClosed, get_pool
+from .snapshots import resolve_snapshot, snapshots
+
+
+REPLICA_MODE = os.getenv("SQLITE_REPLICA_MODE", "off").lower()  # "memory" to enable
+REPLICA_MEMORY_BUDGET_MB = float(os.getenv("SQLITE_REPLICA_MEMORY_BUDGET_MB", "256"))
+REPLICA_ADMIT_AFTER = int(os.getenv("SQLITE_REPLICA_ADMIT_AFTER", "3"))
+REPLICA_DECAY_SECONDS = float(os.getenv("SQLITE_REPLICA_DECAY_SECONDS", "600"))
+
+
+def database_size(db_path: str) -> int:
+    """
+    Logical size of a SQLite database in bytes (page_count * page_size).
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+    finally:
+        conn.close()
+
+
+class Replica:
+    """
+    A shared-cache :memory: copy of one survey snapshot. The anchor connection
+    keeps the in-memory database alive; readers come from a pool on its URI.
+    """
+
+    def __init__(self, source_path: str, generation: int):
+        self.source_path = source_path
+        self.generation = generation
+        name = f"replica_{abs(hash(source_path))}_{generation}"
+        self.uri = f"file:{name}?mode=memory&cache=shared"
+
+        self.anchor = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        try:
+            source.backup(self.anchor)
+        finally:
+            source.close()
+        page_count = self.anchor.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.anchor.execute("PRAGMA page_size").fetchone()[0]
+        self.size_bytes = page_count * page_size
+        self.loaded_at = time.time()
+        self.pool = ConnectionPool(source_path, reader_uri=self.uri)
+
+    def close(self):
+        # Readers still checked out keep the memory database alive until they are returned
+        self.pool.close()
+        self.anchor.close()
+
+
+class ReplicaManager:
+    """
+    Admits frequently queried surveys into in-memory replicas and evicts the
+    least frequently used ones when the memory budget would be exceeded.
+    Access counts decay by half every decay_seconds so old popularity fades.
+    Replicas are copied outside the lock, on a background thread for admissions
+    and reloads, and only swapped in under it, so reads never wait for a copy.
+    """
+
+    def __init__(self, enabled: bool = REPLICA_MODE == "memory",
+                 budget_bytes: int = int(REPLICA_MEMORY_BUDGET_MB * 1024 * 1024),
+                 admit_after: int = REPLICA_ADMIT_AFTER, decay_seconds: float = REPLICA_DECAY_SECONDS):
+        self.enabled = enabled
+        self.budget_bytes = budget_bytes
+        self.admit_after = admit_after
+        self.decay_seconds = decay_seconds
+
+        self._lock = threading.RLock()
+        self._replicas: Dict[str, Replica] = {}
+        self._loading: Dict[str, threading.Thread] = {}
+        self._frequency: Dict[str, float] = {}
+        self._generation = 0
+        self._last_decay = time.monotonic()
+        self.metrics = {"admissions": 0, "evictions": 0, "refreshes": 0, "rejections": 0}
+
+    def _decay_locked(self):
+        now = time.monotonic()
+        while now - self._last_decay >= self.decay_seconds:
+            self._frequency = {path: count / 2 for path, count in self._frequency.items() if count >= 0.5}
+            self._last_decay += self.decay_seconds
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(replica.size_bytes for replica in self._replicas.values())
+
+    def record_access(self, db_path: str):
+        """
+        Count one access. Once the survey is hot enough, or when its replica was built
+        from an older snapshot (e.g. another worker ran the ingest), load it in the background.
+        """
+        if not self.enabled or not db_path:
+            return
+        key = os.path.abspath(db_path)
+        with self._lock:
+            self._decay_locked()
+            self._frequency[key] = self._frequency.get(key, 0) + 1
+            replica = self._replicas.get(key)
+            if key in self._loading or (replica is None and self._frequency[key] < self.admit_after):
+                return
+            source_path = snapshots.current_path(key)
+            if source_path is None or (replica is not None and replica.source_path == source_path):
+                return
+            self._generation += 1
+            loader = threading.Thread(
+                target=self._load, args=(key, source_path, self._generation), name="replica-load", daemon=True
+            )
+            self._loading[key] = loader
+            loader.start()
+
+    def wait_for_loads(self, timeout: Optional[float] = None):
+        """
+        Wait for background replica loads to finish (tests and benchmarks).
+        """
+        with self._lock:
+            loaders = list(self._loading.values())
+        for loader in loaders:
+            loader.join(timeout)
+
+    def _make_room_locked(self, key: str, size: int) -> bool:
+        if size > self.budget_bytes:
+            return False
+        # The survey's own replica is replaced, so its memory counts as free
+        current = self._replicas.get(key)
+        free = self.budget_bytes - self.used_bytes() + (current.size_bytes if current else 0)
+        if free >= size:
+            return True
+        # Only evict replicas that are colder than the candidate
+        frequency = self._frequency.get(key, 0)
+        candidates = sorted(
+            (path for path in self._replicas if path != key and self._frequency.get(path, 0) < frequency),
+            key=lambda path: self._frequency.get(path, 0)
+        )
+        victims = []
+        for path in candidates:
+            victims.append(path)
+            free += self._replicas[path].size_bytes
+            if free >= size:
+                break
+        if free < size:
+            return False
+        for path in victims:
+            self._replicas.pop(path).close()
+            self.metrics["evictions"] += 1
+        return True
+
+    def _load(self, key: str, source_path: str, generation: int):
+        """
+        Copy source_path into a new replica without holding the lock, then swap it in if it
+        fits the budget. A replica of an older snapshot that cannot be replaced is dropped,
+        since reads pinned to the new snapshot would never use it.
+        """
+        replica = None
+        try:
+            if database_size(source_path) <= self.budget_bytes:
+                replica = Replica(source_path, generation)
+        except sqlite3.Error as e:
+            print(f"Error loading replica of {source_path}: {e}")
+
+        with self._lock:
+            if self._loading.get(key) is threading.current_thread():
+                del self._loading[key]
+            previous = self._replicas.get(key)
+            if replica is None or not self._make_room_locked(key, replica.size_bytes):
+                self.metrics["rejections"] += 1
+                if previous is not None and previous.source_path != source_path:
+                    self._replicas.pop(key)
+                else:
+                    previous = None
+            else:
+                self._replicas[key] = replica
+                self.metrics["refreshes" if previous is not None else "admissions"] += 1
+                replica = None
+        # Closed outside the lock; in-flight readers finish on the previous copy
+        for stale in (replica, previous):
+            if stale is not None:
+                stale.close()
+
+    def refresh(self, db_path: str):
+        """
+        Rebuild a survey's replica from its newly published snapshot and swap it in
+        atomically. Runs on the ingest that published it; in-flight readers finish on
+        the previous copy.
+        """
+        if not self.enabled or not db_path:
+            return
+        key = os.path.abspath(db_path)
+        with self._lock:
+            source_path = snapshots.current_path(key)
+            if key not in self._replicas or source_path is None:
+                return
+            self._generation += 1
+            generation = self._generation
+        self._load(key, source_path, generation)
+
+    def drop(self, db_path: str):
+        with self._lock:
+            replica = self._replicas.pop(os.path.abspath(db_path), None)
+        if replica is not None:
+            replica.close()
+
+    def reader_pool(self, db_path: str) -> ConnectionPool:
+        """
+        Pool to read a survey from: its in-memory replica if admitted and built from
+        the snapshot this read is pinned to, otherwise that snapshot's file.
+        """
+        source_path = resolve_snapshot(db_path) or db_path
+        if self.enabled:
+            with self._lock:
+                replica = self._replicas.get(os.path.abspath(db_path))
+            if replica is not None and replica.source_path == source_path:
+                return replica.pool
+        return get_pool(source_path)
+
+    @contextmanager
+    def reader(self, db_path: str):
+        """
+        Check out a read connection for a survey, retrying if its replica is swapped mid-checkout.
+        """
+        attempts = 3
+        for attempt in range(attempts):
+            pool = self.reader_pool(db_path)
+            try:
+                conn = pool.checkout()
+                break
+            except PoolClosed:
+                if attempt == attempts - 1:
+                    raise
+        try:
+            yield conn
+        finally:
+            pool.checkin(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            replicas: List[Dict[str, Any]] = [
+                {
+                    "db_path": path,
+                    "source_path": replica.source_path,
+                    "generation": replica.generation,
+                    "size_bytes": replica.size_bytes,
+                    "frequency": round(self._frequency.get(path, 0), 2),
+                    "loaded_at": replica.loaded_at,
+                }
+                for path, replica in self._replicas.items()
+            ]
+            return {
+                "enabled": self.enabled,
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": sum(item["size_bytes"] for item in replicas),
+                "replicas": replicas,
+                **self.metrics,
+            }
+
+
+replicas = ReplicaManager()
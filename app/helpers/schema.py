@@ -0,0 +1,211 @@
+import re
+import threading
+from typing import List, Dict, Any, Optional, Iterable
+
+from .intents import META_COLUMNS, normalize_question
+
+# Double-quoted identifiers, single-quoted literals, or anything else
+_SQL_TOKENS = re.compile(r'("(?:[^"]|"")*")|(\'(?:[^\']|\'\')*\')|([^"\']+)')
+_ALIAS = re.compile(r"\bq(\d+)\b", re.IGNORECASE)
+# Bare identifiers that are not function calls
+_IDENTIFIER = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b(?!\s*\()")
+# SQLite keywords (https://www.sqlite.org/lang_keywords.html); never rewritten as column names
+_SQL_KEYWORDS = set("""
+    ABORT ACTION ADD AFTER ALL ALTER ALWAYS ANALYZE AND AS ASC ATTACH AUTOINCREMENT BEFORE BEGIN BETWEEN BY
+    CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT CONSTRAINT CREATE CROSS CURRENT CURRENT_DATE
+    CURRENT_TIME CURRENT_TIMESTAMP DATABASE DEFAULT DEFERRABLE DEFERRED DELETE DESC DETACH DISTINCT DO DROP
+    EACH ELSE END ESCAPE EXCEPT EXCLUDE EXCLUSIVE EXISTS EXPLAIN FAIL FILTER FIRST FOLLOWING FOR FOREIGN FROM
+    FULL GENERATED GLOB GROUP GROUPS HAVING IF IGNORE IMMEDIATE IN INDEX INDEXED INITIALLY INNER INSERT INSTEAD
+    INTERSECT INTO IS ISNULL JOIN KEY LAST LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT NOTHING NOTNULL
+    NULL NULLS OF OFFSET ON OR ORDER OTHERS OUTER OVER PARTITION PLAN PRAGMA PRECEDING PRIMARY QUERY RAISE
+    RANGE RECURSIVE REFERENCES REGEXP REINDEX RELEASE RENAME REPLACE RESTRICT RETURNING RIGHT ROLLBACK ROW ROWS
+    SAVEPOINT SELECT SET TABLE TEMP TEMPORARY THEN TIES TO TRANSACTION TRIGGER UNBOUNDED UNION UNIQUE UPDATE
+    USING VACUUM VALUES VIEW VIRTUAL WHEN WHERE WINDOW WITH WITHOUT
+""".split())
+_STOP_WORDS = {
+    "the", "a", "an", "of", "to", "for", "in", "on", "and", "or", "do", "did", "does", "you", "your",
+    "is", "are", "was", "were", "what", "which", "who", "how", "many", "much", "me", "show", "give",
+    "all", "list", "by", "with", "from", "that", "this", "people", "responses", "respondents", "answer",
+    "answers", "answered", "question", "survey", "per", "each", "number", "count",
+}
+
+
+def _keywords(text: str) -> set:
+    words = set()
+    for word in normalize_question(text).split():
+        if word in _STOP_WORDS or len(word) < 2:
+            continue
+        words.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return words
+
+
+class CompactSchema:
+    """
+    Compact prompt view of a survey table. Question columns get short stable
+    aliases (q1, q2, ...) in schema order with a one-line description, columns
+    unrelated to the question are pruned, and generated SQL is mapped back to
+    the real column names before execution.
+    """
+
+    def __init__(self, table_name: str, columns: List[str], descriptions: Optional[Dict[str, str]] = None,
+                 max_columns: int = 30, description_length: int = 80):
+        self.table_name = table_name
+        self.meta_columns = [col for col in columns if col in META_COLUMNS]
+        self.question_columns = [col for col in columns if col not in META_COLUMNS]
+        self.max_columns = max_columns
+        self.description_length = description_length
+
+        self.alias_to_column: Dict[str, str] = {}
+        self.column_to_alias: Dict[str, str] = {}
+        self.descriptions: Dict[str, str] = {}
+        descriptions = descriptions or {}
+        for index, column in enumerate(self.question_columns, start=1):
+            alias = f"q{index}"
+            self.alias_to_column[alias] = column
+            self.column_to_alias[column] = alias
+            text = descriptions.get(column) or column.replace("_", " ")
+            if len(text) > description_length:
+                text = text[:description_length - 1].rstrip() + "…"
+            self.descriptions[alias] = text
+
+        self._keywords = {alias: _keywords(self.descriptions[alias]) for alias in self.alias_to_column}
+
+    def rank(self, question: str) -> List[str]:
+        """
+        Aliases ordered by keyword overlap with the question; unrelated columns are dropped.
+        """
+        wanted = _keywords(question)
+        scored = []
+        for alias, words in self._keywords.items():
+            score = len(wanted & words)
+            if score:
+                scored.append((-score, int(alias[1:]), alias))
+        scored.sort()
+        return [alias for _, _, alias in scored]
+
+    def select(self, question: str, include: Iterable[str] = ()) -> List[str]:
+        """
+        Aliases to show for a question, in stable schema order.
+        """
+        chosen = [alias for alias in include if alias in self.alias_to_column]
+        for alias in self.rank(question):
+            if len(chosen) >= self.max_columns:
+                break
+            if alias not in chosen:
+                chosen.append(alias)
+        if not chosen:
+            # Nothing matched: show every alias rather than guess which ones to drop
+            chosen = list(self.alias_to_column)
+        return sorted(chosen, key=lambda alias: int(alias[1:]))
+
+    def render(self, question: str, include: Iterable[str] = ()) -> str:
+        """
+        Build the compact table description used in the LLM prompts.
+        """
+        aliases = self.select(question, include)
+        lines = [
+            f"Table '{self.table_name}' (one row per respondent, all answers stored as TEXT).",
+            f"Respondent columns: {', '.join(self.meta_columns)} (is_anonymous is 1 or 0)",
+            "Question columns (use the alias as the column name):",
+        ]
+        lines.extend(f"{alias}: {self.descriptions[alias]}" for alias in aliases)
+        hidden = len(self.alias_to_column) - len(aliases)
+        if hidden > 0:
+            lines.append(f"({hidden} unrelated question columns omitted)")
+        return "\n".join(lines)
+
+    def referenced_aliases(self, sql: str) -> List[str]:
+        """
+        Aliases that appear as identifiers in SQL written against the compact schema.
+        """
+        found = []
+        for quoted, literal, other in _SQL_TOKENS.findall(sql):
+            if quoted:
+                name = quoted[1:-1].replace('""', '"').lower()
+                if name in self.alias_to_column:
+                    found.append(name)
+            elif other:
+                found.extend(f"q{num}" for num in _ALIAS.findall(other) if f"q{num}" in self.alias_to_column)
+        return found
+
+    def to_real(self, sql: str) -> str:
+        """
+        Replace aliases in generated SQL with the real quoted column names.
+        """
+        def real(alias: str) -> Optional[str]:
+            column = self.alias_to_column.get(alias.lower())
+            return f'"{column}"' if column else None
+
+        parts = []
+        for quoted, literal, other in _SQL_TOKENS.findall(sql):
+            if quoted:
+                parts.append(real(quoted[1:-1]) or quoted)
+            elif literal:
+                parts.append(literal)
+            else:
+                parts.append(_ALIAS.sub(lambda m: real(m.group(0)) or m.group(0), other))
+        return "".join(parts)
+
+    def to_alias(self, sql: str) -> str:
+        """
+        Replace real column names in SQL with their aliases so it can be sent through the compact prompt.
+        Bare names match case-insensitively, like SQLite; keywords and function names are left alone.
+        """
+        bare = {column.lower(): alias for column, alias in self.column_to_alias.items()}
+
+        def rename(match) -> str:
+            name = match.group(0)
+            if name.upper() in _SQL_KEYWORDS:
+                return name
+            return bare.get(name.lower(), name)
+
+        parts = []
+        for quoted, literal, other in _SQL_TOKENS.findall(sql):
+            if quoted:
+                alias = self.column_to_alias.get(quoted[1:-1].replace('""', '"'))
+                parts.append(f'"{alias}"' if alias else quoted)
+            elif literal:
+                parts.append(literal)
+            else:
+                parts.append(_IDENTIFIER.sub(rename, other))
+        return "".join(parts)
+
+
+class PromptStats:
+    """
+    Thread-safe prompt size and LLM latency counters, keyed by stage and prompt mode.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, mode: str, full_prompt_chars: int, prompt_chars: int, llm_seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(f"{stage}:{mode}", {
+                "calls": 0, "full_chars": 0, "prompt_chars": 0, "llm_seconds": 0.0
+            })
+            entry["calls"] += 1
+            entry["full_chars"] += full_prompt_chars
+            entry["prompt_chars"] += prompt_chars
+            entry["llm_seconds"] += llm_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for key, entry in self._stages.items():
+                calls = entry["calls"]
+                # ~4 characters per token is close enough to compare prompt sizes
+                full_tokens = entry["full_chars"] / 4 / calls
+                prompt_tokens = entry["prompt_chars"] / 4 / calls
+                report[key] = {
+                    "calls": calls,
+                    "avg_full_schema_tokens": round(full_tokens, 1),
+                    "avg_prompt_schema_tokens": round(prompt_tokens, 1),
+                    "token_reduction": round(1 - prompt_tokens / full_tokens, 3) if full_tokens else 0.0,
+                    "avg_llm_ms": round(entry["llm_seconds"] / calls * 1000, 3)
+                }
+            return report
+
+
+prompt_stats = PromptStats()
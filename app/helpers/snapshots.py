@@ -0,0 +1,264 @@
+import os
+import re
+import glob
+import time
+import fcntl
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Any
+
+from .pool import pooled_writer, close_pool
+
+# Abandoned side files from crashed ingests are removed after this many seconds
+STALE_BUILD_SECONDS = float(os.getenv("SNAPSHOT_STALE_BUILD_SECONDS", "3600"))
+
+_pinned: ContextVar[Dict[str, str]] = ContextVar("pinned_snapshots", default={})
+
+
+class SnapshotStore:
+    """
+    Versioned, immutable survey databases. A survey's base path (e.g. survey_1.db)
+    names a family of files survey_1.v<N>.db plus a survey_1.current pointer.
+    Ingest builds the next version in a side file and publishes it with an
+    atomic rename and pointer swap. Readers pin the version they started on;
+    retired versions are deleted once the last pin is released.
+
+    Pins and builds are coordinated across worker processes with flock: each
+    process holding pins on a version keeps a shared lock on its .pins file,
+    and a version is only deleted by whoever can lock that file exclusively.
+    Builds of one survey are serialized through its .build.lock file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._pins: Dict[str, int] = {}
+        self._pin_fds: Dict[str, int] = {}
+        # Last current version seen per survey, to close pools of versions that were replaced
+        self._seen: Dict[str, str] = {}
+
+    @staticmethod
+    def _stem(base_path: str) -> str:
+        base_path = os.path.abspath(base_path)
+        return base_path[:-3] if base_path.endswith(".db") else base_path
+
+    def pointer_path(self, base_path: str) -> str:
+        return f"{self._stem(base_path)}.current"
+
+    def version_path(self, base_path: str, version: int) -> str:
+        return f"{self._stem(base_path)}.v{version}.db"
+
+    def current_version(self, base_path: str) -> Optional[int]:
+        try:
+            with open(self.pointer_path(base_path)) as pointer:
+                return int(pointer.read().strip())
+        except (FileNotFoundError, ValueError):
+            # Databases written before snapshots existed count as version 0
+            return 0 if os.path.exists(os.path.abspath(base_path)) else None
+
+    def current_path(self, base_path: str) -> Optional[str]:
+        version = self.current_version(base_path)
+        if version is None:
+            return None
+        if version == 0:
+            return os.path.abspath(base_path)
+        return self.version_path(base_path, version)
+
+    def exists(self, base_path: str) -> bool:
+        return self.current_path(base_path) is not None
+
+    @staticmethod
+    def _base_path(path: str) -> Optional[str]:
+        """
+        Base path of a version file, None for a pre-snapshot database (never deleted).
+        """
+        match = re.match(r"^(.*)\.v\d+\.db$", path)
+        return f"{match.group(1)}.db" if match else None
+
+    def acquire(self, base_path: str) -> Optional[str]:
+        """
+        Pin the current version so it is not deleted while in use, by this or any other worker.
+        """
+        key = os.path.abspath(base_path)
+        with self._lock:
+            while True:
+                path = self.current_path(base_path)
+                if path is None:
+                    return None
+                if path in self._pins:
+                    break
+                fd = os.open(f"{path}.pins", os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                if os.path.exists(path):
+                    self._pin_fds[path] = fd
+                    self._pins[path] = 0
+                    break
+                # Another worker deleted this version after the pointer was read; pin the new one
+                os.close(fd)
+            self._pins[path] += 1
+            stale = self._seen.get(key)
+            self._seen[key] = path
+            if stale is not None and stale != path and stale not in self._pins:
+                close_pool(stale)
+            return path
+
+    def release(self, path: str):
+        with self._lock:
+            remaining = self._pins.get(path, 0) - 1
+            if remaining > 0:
+                self._pins[path] = remaining
+                return
+            self._pins.pop(path, None)
+            fd = self._pin_fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+        base_path = self._base_path(path)
+        if base_path is not None and path != self.current_path(base_path):
+            self._try_delete(path)
+
+    def _try_delete(self, path: str) -> bool:
+        """
+        Delete a retired version unless a reader in this or another worker still pins it.
+        The last worker to release it deletes it.
+        """
+        with self._lock:
+            if path in self._pins:
+                return False
+            close_pool(path)
+            fd = os.open(f"{path}.pins", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+                self._delete(path)
+                return True
+            finally:
+                os.close(fd)
+
+    @contextmanager
+    def build(self, base_path: str):
+        """
+        Yield a side file seeded with the current version. If the block completes,
+        the side file is published as the next version; otherwise it is discarded.
+        """
+        with self._lock:
+            build_lock = self._build_locks.setdefault(os.path.abspath(base_path), threading.Lock())
+        with build_lock, open(f"{self._stem(base_path)}.build.lock", "a") as lock_file:
+            # Other workers building the same survey wait here
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            current = self.current_path(base_path)
+            next_version = (self.current_version(base_path) or 0) + 1
+            side_path = f"{self.version_path(base_path, next_version)}.{os.getpid()}.building"
+            if os.path.exists(side_path):
+                os.remove(side_path)
+            if current is not None:
+                self._copy(current, side_path)
+            try:
+                yield side_path
+                with pooled_writer(side_path) as conn:
+                    conn.execute("PRAGMA journal_mode=DELETE;")
+            except BaseException:
+                close_pool(side_path)
+                self._delete(side_path)
+                raise
+            close_pool(side_path)
+            self._publish(base_path, side_path, next_version, current)
+
+    @staticmethod
+    def _copy(source_path: str, target_path: str):
+        source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def _publish(self, base_path: str, side_path: str, version: int, previous: Optional[str]):
+        final_path = self.version_path(base_path, version)
+        os.replace(side_path, final_path)
+        pointer = self.pointer_path(base_path)
+        tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+        with open(tmp_pointer, "w") as handle:
+            handle.write(str(version))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_pointer, pointer)
+
+        if previous is not None:
+            self._try_delete(previous)
+        self.collect_garbage(base_path)
+
+    def collect_garbage(self, base_path: str):
+        """
+        Remove unpinned versions older than the current one, stale side files and
+        lock files left behind by versions that no longer exist.
+        """
+        current = self.current_path(base_path)
+        stem = self._stem(base_path)
+        now = time.time()
+        for path in glob.glob(f"{glob.escape(stem)}.v*.db*"):
+            if path.endswith(".building"):
+                if now - os.path.getmtime(path) > STALE_BUILD_SECONDS:
+                    self._delete(path)
+                continue
+            if path.endswith(".pins"):
+                if not os.path.exists(path[:-len(".pins")]):
+                    self._delete(path)
+                continue
+            if not re.search(r"\.v\d+\.db$", path) or path == current:
+                continue
+            self._try_delete(path)
+
+    @staticmethod
+    def _delete(path: str):
+        close_pool(path)
+        # The .pins file goes last, so a worker that locks it after the version is gone sees it missing
+        for suffix in ("", "-wal", "-shm", "-journal", ".pins"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pinned": dict(self._pins)}
+
+
+snapshots = SnapshotStore()
+
+
+@contextmanager
+def pinned_snapshot(base_path: str, path: Optional[str] = None):
+    """
+    Pin the survey's current version for the duration of the block. Reads inside
+    the block (resolve_snapshot) all see the same version, even if ingest publishes
+    a new one meanwhile. Nested pins reuse the outer one. Pass path, a version the
+    caller acquired with snapshots.acquire and releases itself, to read that version.
+    """
+    key = os.path.abspath(base_path)
+    current = _pinned.get()
+    if key in current:
+        yield current[key]
+        return
+    owned = path is None
+    if owned:
+        path = snapshots.acquire(base_path)
+    token = _pinned.set({**current, key: path})
+    try:
+        yield path
+    finally:
+        _pinned.reset(token)
+        if owned and path is not None:
+            snapshots.release(path)
+
+
+def resolve_snapshot(base_path: str) -> Optional[str]:
+    """
+    Path to read a survey from: the pinned version inside pinned_snapshot, else the current one.
+    """
+    path = _pinned.get().get(os.path.abspath(base_path))
+    return path or snapshots.current_path(base_path)
@@ -0,0 +1,112 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from .pool import pooled_reader, pooled_writer
+from .snapshots import snapshots
+
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+
+class StorageManager:
+    """
+    Owns where survey databases live: one snapshot family per survey under
+    <data_dir>/surveys, plus a manifest database recording each survey's
+    current version, size, row count and last sync time.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = os.path.abspath(data_dir)
+        self.surveys_dir = os.path.join(self.data_dir, "surveys")
+        self.manifest_path = os.path.join(self.data_dir, "manifest.db")
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(self.surveys_dir, exist_ok=True)
+            with pooled_writer(self.manifest_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS surveys (
+                        survey_id INTEGER PRIMARY KEY,
+                        base_path TEXT NOT NULL,
+                        version INTEGER,
+                        size_bytes INTEGER,
+                        row_count INTEGER,
+                        last_sync REAL
+                    )
+                """)
+            self._initialized = True
+
+    def survey_path(self, survey_id: int) -> str:
+        """
+        Base path of a survey's database family (see SnapshotStore).
+        """
+        self._ensure_initialized()
+        return os.path.join(self.surveys_dir, f"survey_{survey_id}.db")
+
+    def record_sync(self, survey_id: int, table_name: Optional[str] = None):
+        """
+        Update the manifest after an ingest published a new snapshot.
+        """
+        base_path = self.survey_path(survey_id)
+        current = snapshots.current_path(base_path)
+        if current is None:
+            return
+        table_name = table_name or f"survey_{survey_id}"
+        row_count = None
+        conn = sqlite3.connect(f"file:{current}?mode=ro", uri=True)
+        try:
+            row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+        with pooled_writer(self.manifest_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO surveys (survey_id, base_path, version, size_bytes, row_count, last_sync)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(survey_id) DO UPDATE SET
+                    base_path = excluded.base_path,
+                    version = excluded.version,
+                    size_bytes = excluded.size_bytes,
+                    row_count = excluded.row_count,
+                    last_sync = excluded.last_sync
+                """,
+                (
+                    survey_id,
+                    base_path,
+                    snapshots.current_version(base_path),
+                    os.path.getsize(current),
+                    row_count,
+                    time.time()
+                )
+            )
+
+    def get_entry(self, survey_id: int) -> Optional[Dict[str, Any]]:
+        self._ensure_initialized()
+        with pooled_reader(self.manifest_path) as conn:
+            cursor = conn.execute("SELECT * FROM surveys WHERE survey_id = ?", (survey_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([description[0] for description in cursor.description], row))
+
+    def list_surveys(self) -> List[Dict[str, Any]]:
+        self._ensure_initialized()
+        with pooled_reader(self.manifest_path) as conn:
+            cursor = conn.execute("SELECT * FROM surveys ORDER BY survey_id")
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+storage = StorageManager()
@@ -1,17 +1,20 @@
+import time
+import threading
+import importlib
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from routers import survey
+from helpers import metrics, profiler
+from helpers.ratelimit import limiter
+from helpers.pool import start_idle_reaper
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
 app = FastAPI(
     title="ONOW Survey Bot API",
     description="API for processing and analyzing survey data",
@@ -31,9 +34,85 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Collect per-stage timings for the request, expose them in a Server-Timing
+    header and feed the request-level Prometheus metrics. Streamed bodies (SSE,
+    batch NDJSON, exports) keep adding spans after the headers are sent, so the
+    request is only observed once its body iterator completes.
+    """
+    trace, token = metrics.start_trace()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_trace(token)
+    elapsed = time.perf_counter() - started
+
+    endpoint = request.scope.get("endpoint")
+    handler = endpoint.__name__ if endpoint else "unmatched"
+    metrics.requests_total.inc(handler=handler, method=request.method, status=response.status_code)
+
+    # The header goes out before a streamed body, so it covers the work done until then
+    timing = trace.server_timing()
+    response.headers["Server-Timing"] = f"{timing}, total;dur={elapsed * 1000:.1f}" if timing else f"total;dur={elapsed * 1000:.1f}"
+
+    body = response.body_iterator
+
+    async def observed_body():
+        sent = 0
+        try:
+            async for chunk in body:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            metrics.request_seconds.observe(time.perf_counter() - started, handler=handler)
+            metrics.llm_calls_per_request.observe(trace.llm_calls, handler=handler)
+            metrics.response_bytes.observe(sent, handler=handler)
+
+    response.body_iterator = observed_body()
+    return response
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """
+    Profile requests that opt in with the admin token (X-Profile-Token header) or are
+    picked by PROFILE_SAMPLE_RATE.
+    """
+    token = request.headers.get("X-Profile-Token")
+    if not profiler.should_profile(token):
+        return await call_next(request)
+    holder, context_token = profiler.request_profile({"method": request.method, "path": request.url.path})
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.end_request(context_token)
+    if holder["ids"]:
+        response.headers["X-Profile-Id"] = ",".join(holder["ids"])
+    return response
+
 # Include routers
 app.include_router(survey.router, prefix="/api/surveybot", tags=["survey"])
 
+def warm_up():
+    """
+    Import the LLM and visualization stack in the background so the first query does not pay for it.
+    """
+    try:
+        importlib.import_module("helpers.processor")
+    except Exception as e:
+        print(f"Warm-up import failed: {e}")
+
+@app.on_event("startup")
+async def start_warm_up():
+    if os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.on_event("startup")
+async def start_pool_reaper():
+    start_idle_reaper()
+
 @app.get("/")
 @limiter.limit("30/minute")
 async def root(request: Request):
@@ -44,3 +123,9 @@ async def root(request: Request):
 async def health_check(request: Request):
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Prometheus text exposition of stage latencies, LLM calls, cache hits and response sizes
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
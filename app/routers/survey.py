@@ -1,21 +1,91 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
+import os
 import json
-from helpers.processor import SQLProcessor
+import asyncio
 from helpers.fetcher import get_data_from_api
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+from helpers.intents import intent_stats, normalize_question
+from helpers.schema import prompt_stats
+from helpers.pool import pool_stats
+from helpers.replica import replicas
+from helpers.snapshots import snapshots
+from helpers.storage import storage
+from helpers.metrics import span, record_cache
+from helpers.profiler import profiles, is_admin
+from helpers.cache import shared_cache
+from helpers.ratelimit import limiter
+from helpers.admission import admission, admitted_request, Overloaded
+from helpers.snapshots import pinned_snapshot
+from helpers.dashboard import load_dashboard
+from helpers.export import EXPORT_FORMATS, ExportError, validate_export, export_stream
+from helpers.http_cache import snapshot_validators, is_not_modified
+from helpers.coalesce import Coalescer
 
 router = APIRouter()
 
+# Identical /query requests in flight in this worker share one pipeline run
+query_coalescer = Coalescer("query_coalescing")
+
+# Questions per batch request and how many of them run at once (LLM calls are further bounded by admission control)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Rows per "rows" event of a streamed query, and the idle time after which a keep-alive comment is sent
+STREAM_PAGE_ROWS = int(os.getenv("STREAM_PAGE_ROWS", "100"))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+def overloaded(error: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+async def run_admitted(fn, *args):
+    """
+    Run blocking pipeline work in the threadpool under the admission controller, so the
+    event loop stays free and queued work is shed at its deadline.
+    """
+    def call():
+        with admitted_request():
+            return fn(*args)
+    return await run_in_threadpool(call)
+
+async def conditional_get(request: Request, survey_id: int, load):
+    """
+    Serve a survey read endpoint with validators of the survey's data version. A matching
+    If-None-Match gets a 304 without running load, so polling does not
+    touch SQLite or the survey API. load returns the response body, or None for a 404.
+    """
+    validators = snapshot_validators(storage.survey_path(survey_id))
+    not_modified = validators is not None and is_not_modified(request.headers, validators)
+    record_cache("http_conditional", not_modified)
+    if not_modified:
+        return Response(status_code=304, headers=validators)
+    content = await run_admitted(load)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Survey data not found")
+    # A survey's first read ingests it, so it only has validators now. Validators taken before
+    # the read never describe newer data than the body.
+    validators = validators or snapshot_validators(storage.survey_path(survey_id)) or {}
+    return JSONResponse(content=jsonable_encoder(content), headers=validators)
+
+def get_processor(survey_id: int):
+    """
+    Shared SQLProcessor for a survey. helpers.processor pulls in LangChain and the chart
+    models, so it is imported on first use (or by the startup warm-up) rather than at boot.
+    """
+    from helpers.processor import get_processor as load_processor
+    return load_processor(survey_id)
+
 class QueryRequest(BaseModel):
     query: str
     survey_id: Optional[int] = 3200079
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    stream: Optional[bool] = False
+
 class SurveyDataRequest(BaseModel):
     survey_id: int
 
@@ -32,37 +102,329 @@ async def process_query(request: Request, query_request: QueryRequest):
     """
     Process a natural language query and return SQL results with visualizations
     """
+    def run(survey_id: int, query: str):
+        return get_processor(survey_id).process_query_with_visualizations(query)
+
+    survey_id = query_request.survey_id
     try:
-        processor = SQLProcessor(survey_id=query_request.survey_id)
-        result = processor.process_query_with_visualizations(query_request.query)
+        # Keyed by data version so a request arriving after a refresh does not get the older snapshot's answer
+        key = (survey_id, normalize_question(query_request.query), snapshots.current_version(storage.survey_path(survey_id)))
+        result = await query_coalescer.run(key, lambda: run_admitted(run, survey_id, query_request.query))
         
-        return QueryResponse(
+        response = QueryResponse(
             success=result["success"],
             sql_query=result.get("sql_query"),
             query_result=result.get("query_result"),
             visualizations=result.get("visualizations"),
             error=result.get("error")
         )
+        # Serialize here so the cost shows up as its own stage in Server-Timing
+        with span("serialization"):
+            return JSONResponse(content=jsonable_encoder(response))
+    except Overloaded as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+def stage_events(event: str, payload: Any) -> List[str]:
+    """
+    SSE events for one pipeline stage. A query result becomes "rows" events of STREAM_PAGE_ROWS
+    rows each, the first carrying the row count and columns.
+    """
+    if event != "query_result":
+        return [sse_event(event, payload)]
+    rows = payload["data"]
+    events = [sse_event("rows", {
+        "row_count": payload["row_count"],
+        "columns": payload["columns"],
+        "offset": 0,
+        "rows": rows[:STREAM_PAGE_ROWS]
+    })]
+    for offset in range(STREAM_PAGE_ROWS, len(rows), STREAM_PAGE_ROWS):
+        events.append(sse_event("rows", {"offset": offset, "rows": rows[offset:offset + STREAM_PAGE_ROWS]}))
+    return events
+
+async def stream_query(survey_id: int, query: str):
+    """
+    Run the query pipeline in the threadpool (one thread, so the snapshot stays pinned) and
+    yield its stages as server-sent events while it runs, ending with "done" or "error".
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def emit(event: str, payload: Any):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, payload))
+
+    def run():
+        return get_processor(survey_id).process_query_with_visualizations(query, emit=emit)
+
+    async def pipeline():
+        try:
+            result = await run_admitted(run)
+            visualizations = result.get("visualizations") or {}
+            queue.put_nowait(("done", {
+                "success": result["success"],
+                "sql_query": result.get("sql_query"),
+                "fast_path": result.get("fast_path"),
+                "reasoning": visualizations.get("reasoning"),
+                "total_charts": visualizations.get("total_charts", 0),
+                "error": result.get("error")
+            }))
+        except Overloaded as e:
+            queue.put_nowait(("error", {"error": str(e), "retry_after": e.retry_after}))
+        except Exception as e:
+            queue.put_nowait(("error", {"error": f"Processing error: {str(e)}"}))
+
+    task = asyncio.ensure_future(pipeline())
+    try:
+        while True:
+            try:
+                event, payload = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing out while SQL generation or charts are still running
+                yield ": keep-alive\n\n"
+                continue
+            for message in stage_events(event, payload):
+                yield message
+            if event in ("done", "error"):
+                break
+    finally:
+        task.cancel()
+
+@router.get("/query/stream")
+@limiter.limit("10/minute")
+async def process_query_stream(request: Request, query: str, survey_id: int = 3200079):
+    """
+    Same pipeline as POST /query, sent as server-sent events as each stage finishes: the SQL,
+    the rows page by page, each chart, the statistics and a final summary.
+    """
+    return StreamingResponse(
+        stream_query(survey_id, query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def batch_item(index: int, question: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return jsonable_encoder({
+        "index": index,
+        "question": question,
+        "success": result["success"],
+        "sql_query": result.get("sql_query"),
+        "query_result": result.get("query_result"),
+        "visualizations": result.get("visualizations"),
+        "fast_path": result.get("fast_path"),
+        "error": result.get("error"),
+        "retry_after": result.get("retry_after")
+    })
+
+def release_snapshot(path: Optional[str]):
+    if path is not None:
+        snapshots.release(path)
+
+async def run_batch(processor, questions: List[str], snapshot: Optional[str] = None):
+    """
+    Answer questions concurrently (at most BATCH_CONCURRENCY at a time) against one snapshot
+    of the survey, yielding batch items as each question completes. A question asked twice
+    runs once. Failures, including load shedding, are reported per question. snapshot is a
+    version the caller acquired; each question pins it in its own thread, so nothing is
+    pinned in this generator, which a disconnecting client may close from another context.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    def answer_pinned(question: str):
+        with pinned_snapshot(processor.db_path, snapshot):
+            return processor.process_query_with_visualizations(question, False)
+
+    async def answer(question: str):
+        async with semaphore:
+            try:
+                return question, await run_admitted(answer_pinned, question)
+            except Overloaded as e:
+                return question, {"success": False, "error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                return question, {"success": False, "error": f"Processing error: {str(e)}"}
+
+    tasks = [asyncio.ensure_future(answer(question)) for question in dict.fromkeys(questions)]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            question, result = await completed
+            for index, asked in enumerate(questions):
+                if asked == question:
+                    yield batch_item(index, question, result)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.post("/surveys/{survey_id}/query:batch")
+@limiter.limit("10/minute")
+async def process_query_batch(request: Request, survey_id: int, batch: BatchQueryRequest):
+    """
+    Answer several questions about one survey in a single request, sharing the processor,
+    schema and snapshot. With stream=true results are sent as NDJSON lines as they complete.
+    """
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    try:
+        processor = await run_admitted(get_processor, survey_id)
+    except Overloaded as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+
+    # Pinned here rather than in the stream, and released once the response is finished
+    snapshot = snapshots.acquire(processor.db_path)
+    if batch.stream:
+        async def lines():
+            async for item in run_batch(processor, batch.questions, snapshot):
+                yield json.dumps(item) + "\n"
+        return StreamingResponse(
+            lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"},
+            background=BackgroundTask(release_snapshot, snapshot)
+        )
+
+    try:
+        results = [item async for item in run_batch(processor, batch.questions, snapshot)]
+    finally:
+        release_snapshot(snapshot)
+    results.sort(key=lambda item: item["index"])
+    with span("serialization"):
+        return JSONResponse(content={
+            "success": True,
+            "survey_id": survey_id,
+            "total": len(results),
+            "succeeded": sum(1 for item in results if item["success"]),
+            "results": results
+        })
+
+@router.get("/stats/fast-path")
+@limiter.limit("30/minute")
+async def get_fast_path_stats(request: Request):
+    """
+    Hit rate and estimated latency saved by the deterministic intent fast path
+    """
+    return {
+        "success": True,
+        "stats": intent_stats.snapshot()
+    }
+
+@router.get("/stats/prompts")
+@limiter.limit("30/minute")
+async def get_prompt_stats(request: Request):
+    """
+    Schema prompt size (full vs sent) and LLM latency per stage and prompt mode
+    """
+    return {
+        "success": True,
+        "stats": prompt_stats.snapshot()
+    }
+
+@router.get("/stats/admission")
+@limiter.limit("30/minute")
+async def get_admission_stats(request: Request):
+    """
+    Concurrency, queue depth, wait time and shed counts of the LLM, ingest and SQL pools
+    """
+    return {
+        "success": True,
+        "pools": admission.stats()
+    }
+
+@router.get("/stats/pools")
+@limiter.limit("30/minute")
+async def get_pool_stats(request: Request):
+    """
+    Checkout metrics for the per-survey SQLite connection pools
+    """
+    return {
+        "success": True,
+        "pools": pool_stats(),
+        "replicas": replicas.stats(),
+        "snapshots": snapshots.stats(),
+        "cache": shared_cache.stats()
+    }
+
+def require_admin(request: Request):
+    if not is_admin(request.headers.get("X-Profile-Token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("/profiles")
+@limiter.limit("30/minute")
+async def list_profiles(request: Request):
+    """
+    Stored request profiles, newest first (admin only)
+    """
+    require_admin(request)
+    return {
+        "success": True,
+        "profiles": profiles.list(),
+        "skipped": profiles.skipped
+    }
+
+@router.get("/profiles/{profile_id}")
+@limiter.limit("30/minute")
+async def get_profile(request: Request, profile_id: str, format: str = "text",
+                      sort: str = "cumulative", limit: int = 40):
+    """
+    A stored profile as a top-functions report, or the raw pstats file with format=pstats (admin only)
+    """
+    require_admin(request)
+    try:
+        meta = profiles.get(profile_id)
+        if meta is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        if format == "pstats":
+            return FileResponse(profiles.pstats_path(profile_id), media_type="application/octet-stream",
+                                filename=f"{profile_id}.prof")
+        return PlainTextResponse(profiles.report(profile_id, sort=sort, limit=limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading profile: {str(e)}")
+
+@router.get("/surveys")
+@limiter.limit("30/minute")
+async def list_surveys(request: Request):
+    """
+    Manifest of locally stored surveys with size, row count and last sync time
+    """
+    try:
+        return {
+            "success": True,
+            "data_dir": storage.data_dir,
+            "surveys": storage.list_surveys()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing surveys: {str(e)}")
+
 @router.get("/surveys/{survey_id}/data")
 @limiter.limit("30/minute")
 async def get_survey_data(request: Request, survey_id: int):
     """
     Get survey data for a specific survey ID
     """
+    def load():
+        located = get_data_from_api(survey_id)
+        if not located:
+            return None
+        db_path, table_name = located
+        return {
+            "success": True,
+            "survey_id": survey_id,
+            "database_path": db_path,
+            "table_name": table_name
+        }
+
     try:
-        db_path, table_name = get_data_from_api(survey_id)
-        if db_path and table_name:
-            return {
-                "success": True,
-                "survey_id": survey_id,
-                "database_path": db_path,
-                "table_name": table_name
-            }
-        else:
-            raise HTTPException(status_code=404, detail="Survey data not found")
+        return await conditional_get(request, survey_id, load)
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching survey data: {str(e)}")
 
@@ -72,14 +434,23 @@ async def get_survey_questions(request: Request, survey_id: int):
     """
     Get all questions for a specific survey
     """
-    try:
-        processor = SQLProcessor(survey_id=survey_id)
-        questions = processor.get_survey_questions()
+    def load():
+        if not get_data_from_api(survey_id):
+            return None
+        processor = get_processor(survey_id)
         return {
             "success": True,
             "survey_id": survey_id,
-            "questions": questions
+            "questions": processor.get_survey_questions(),
+            "catalog": processor.get_question_catalog()
         }
+
+    try:
+        return await conditional_get(request, survey_id, load)
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching questions: {str(e)}")
 
@@ -89,17 +460,87 @@ async def get_survey_summary(request: Request, survey_id: int):
     """
     Get a summary of survey responses
     """
-    try:
-        processor = SQLProcessor(survey_id=survey_id)
-        summary = processor.get_survey_summary()
+    def load():
+        if not get_data_from_api(survey_id):
+            return None
         return {
             "success": True,
             "survey_id": survey_id,
-            "summary": summary
+            "summary": get_processor(survey_id).get_survey_summary()
         }
+
+    try:
+        return await conditional_get(request, survey_id, load)
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching summary: {str(e)}")
 
+@router.get("/surveys/{survey_id}/dashboard")
+@limiter.limit("30/minute")
+async def get_survey_dashboard(request: Request, survey_id: int):
+    """
+    Default dashboard (summary counts and one chart per question) precomputed at ingest, without LLM calls
+    """
+    def load():
+        located = get_data_from_api(survey_id)
+        if not located:
+            return None
+        db_path, table_name = located
+        return {
+            "success": True,
+            "survey_id": survey_id,
+            "dashboard": load_dashboard(db_path, survey_id, table_name)
+        }
+
+    try:
+        return await conditional_get(request, survey_id, load)
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching dashboard: {str(e)}")
+
+@router.get("/surveys/{survey_id}/export")
+@limiter.limit("5/minute")
+async def export_survey_data(request: Request, survey_id: int, format: str = "csv", columns: Optional[str] = None):
+    """
+    Stream the survey table as CSV, NDJSON, Parquet or Arrow IPC in fixed-size chunks, optionally
+    limited to a comma separated list of columns. No LLM is involved.
+    """
+    requested = [name.strip() for name in columns.split(",") if name.strip()] if columns else None
+
+    def prepare():
+        located = get_data_from_api(survey_id)
+        if not located:
+            return None
+        db_path, table_name = located
+        return db_path, table_name, validate_export(db_path, table_name, format, requested)
+
+    try:
+        prepared = await run_admitted(prepare)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting survey: {str(e)}")
+    if prepared is None:
+        raise HTTPException(status_code=404, detail="Survey data not found")
+
+    db_path, table_name, selected = prepared
+    return StreamingResponse(
+        export_stream(db_path, table_name, format, selected),
+        media_type=EXPORT_FORMATS[format]["media_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="survey_{survey_id}.{EXPORT_FORMATS[format]["extension"]}"',
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.post("/surveys/{survey_id}/refresh")
 @limiter.limit("5/minute")
 async def refresh_survey_data(request: Request, survey_id: int, background_tasks: BackgroundTasks):
@@ -107,7 +548,7 @@ async def refresh_survey_data(request: Request, survey_id: int, background_tasks
     Refresh survey data from the API
     """
     try:
-        background_tasks.add_task(get_data_from_api, survey_id)
+        background_tasks.add_task(get_data_from_api, survey_id, refresh=True)
         return {
             "success": True,
             "message": f"Survey {survey_id} data refresh initiated",
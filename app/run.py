@@ -8,14 +8,21 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
     reload = os.getenv("RELOAD", "true").lower() == "true"
+    # Rate limits and caches live under DATA_DIR, so workers share them
+    workers = int(os.getenv("WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    if reload and workers > 1:
+        print("Reload mode runs a single worker; set RELOAD=false to use WORKERS")
+        workers = 1
     
     print(f"Starting ONOW Survey Bot API on {host}:{port}")
     print(f"Reload mode: {reload}")
+    print(f"Workers: {workers}")
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
         reload=reload,
+        workers=workers,
         log_level="info"
     ) 
\ No newline at end of file
@@ -0,0 +1,14 @@
+import os
+import sys
+import shutil
+import tempfile
+
+# Tests import the app packages the same way main.py does (helpers.*, routers.*)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Caches, rate limits and survey snapshots go to a throwaway directory, never into the repo tree
+DATA_DIR = os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="surveybot-tests-")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,52 @@
+import time
+import threading
+
+import pytest
+
+from helpers.admission import AdmissionPool, Overloaded, PRIORITY_CHEAP, PRIORITY_NORMAL
+
+
+def test_waiters_time_out_with_retry_after():
+    pool = AdmissionPool("llm", limit=1)
+    pool.acquire()
+    with pytest.raises(Overloaded) as error:
+        pool.acquire(deadline=time.monotonic() + 0.05)
+    assert error.value.retry_after >= 1
+    assert pool.stats()["shed"] == 1
+    assert pool.stats()["queue_depth"] == 0
+
+
+def test_full_queue_is_rejected_immediately():
+    pool = AdmissionPool("ingest", limit=1, max_queue=0)
+    pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        pool.acquire(deadline=time.monotonic() + 5)
+    assert time.monotonic() - started < 1
+    assert pool.stats()["rejected"] == 1
+
+
+def test_cheap_work_is_served_first():
+    pool = AdmissionPool("sql", limit=1)
+    pool.acquire()
+    order = []
+
+    def worker(name, priority):
+        pool.acquire(priority, time.monotonic() + 5)
+        order.append(name)
+        pool.release(0.01)
+
+    expensive = threading.Thread(target=worker, args=("expensive", PRIORITY_NORMAL))
+    expensive.start()
+    while pool.stats()["queue_depth"] < 1:
+        time.sleep(0.001)
+    cheap = threading.Thread(target=worker, args=("cheap", PRIORITY_CHEAP))
+    cheap.start()
+    while pool.stats()["queue_depth"] < 2:
+        time.sleep(0.001)
+
+    pool.release(0.01)
+    expensive.join()
+    cheap.join()
+    assert order == ["cheap", "expensive"]
+    assert pool.stats()["active"] == 0
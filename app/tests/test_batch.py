@@ -0,0 +1,80 @@
+import time
+import asyncio
+import sqlite3
+
+from routers import survey
+from helpers.snapshots import snapshots, resolve_snapshot
+
+
+class SlowProcessor:
+    db_path = "/nonexistent/survey_1.db"
+
+    def __init__(self):
+        self.calls = []
+
+    def process_query_with_visualizations(self, question, include_stats=True):
+        self.calls.append((question, include_stats))
+        time.sleep(0.2)
+        if question == "broken":
+            raise RuntimeError("no such column")
+        return {"success": True, "sql_query": f"SELECT '{question}'", "query_result": {"data": []}}
+
+
+def collect(processor, questions):
+    async def run():
+        return [item async for item in survey.run_batch(processor, questions)]
+    return asyncio.run(run())
+
+
+def test_questions_run_concurrently_and_repeats_run_once(monkeypatch):
+    monkeypatch.setattr(survey, "BATCH_CONCURRENCY", 4)
+    processor = SlowProcessor()
+    started = time.monotonic()
+    items = collect(processor, ["a", "b", "c", "a"])
+    assert time.monotonic() - started < 0.5
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3]
+    assert sorted(processor.calls) == [("a", False), ("b", False), ("c", False)]
+
+
+def test_concurrency_is_bounded_and_failures_are_per_question(monkeypatch):
+    monkeypatch.setattr(survey, "BATCH_CONCURRENCY", 1)
+    started = time.monotonic()
+    items = {item["question"]: item for item in collect(SlowProcessor(), ["a", "broken"])}
+    assert time.monotonic() - started >= 0.4
+    assert items["a"]["success"] and items["a"]["sql_query"] == "SELECT 'a'"
+    assert not items["broken"]["success"]
+    assert "no such column" in items["broken"]["error"]
+
+
+class PinnedProcessor:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.read = []
+
+    def process_query_with_visualizations(self, question, include_stats=True):
+        self.read.append(resolve_snapshot(self.db_path))
+        return {"success": True}
+
+
+def test_questions_read_the_snapshot_acquired_before_streaming(tmp_path):
+    db_path = str(tmp_path / "survey_2.db")
+    with snapshots.build(db_path) as side_path:
+        sqlite3.connect(side_path).close()
+    pinned = snapshots.acquire(db_path)
+    with snapshots.build(db_path) as side_path:
+        sqlite3.connect(side_path).close()
+    processor = PinnedProcessor(db_path)
+
+    async def first_item():
+        # A client that disconnects after the first line closes the stream early
+        lines = survey.run_batch(processor, ["a", "b"], pinned)
+        item = await lines.__anext__()
+        await lines.aclose()
+        return item
+
+    try:
+        assert asyncio.run(first_item())["success"]
+        assert processor.read and set(processor.read) == {pinned}
+        assert snapshots.current_path(db_path) != pinned
+    finally:
+        survey.release_snapshot(pinned)
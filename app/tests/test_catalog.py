@@ -0,0 +1,51 @@
+import sqlite3
+
+from helpers.catalog import load_catalog, store_catalog, column_descriptions, describe_columns, order_columns
+from helpers.fetcher import extract_question_catalog, question_catalog
+
+DEFINITION = {
+    "success": True,
+    "data": {"survey": {"pages": [
+        {"questions": [
+            {"id": 11, "question": "How old are you?", "type": "number"},
+            {"id": 12, "question": "Do you agree?", "type": "choice",
+             "options": [{"label": "Yes"}, {"label": "No"}]},
+        ]},
+        {"questions": [{"_id": "q3", "question": "Which district / area?", "choices": ["North", "South"]}]},
+    ]}}
+}
+
+
+def test_definition_is_cataloged_in_page_order():
+    entries = extract_question_catalog(DEFINITION)
+    assert [(entry["page"], entry["page_order"], entry["question_id"]) for entry in entries] == [
+        (1, 1, "11"), (1, 2, "12"), (2, 1, "q3")
+    ]
+    assert entries[1]["options"] == ["Yes", "No"] and entries[2]["options"] == ["North", "South"]
+    assert entries[2]["column_name"] == "which_district___area"
+
+
+def test_answer_only_questions_follow_and_previous_definition_is_kept():
+    entries = question_catalog(DEFINITION, ["Do you agree?", "Comments"], [])
+    assert [entry["text"] for entry in entries][-2:] == ["Which district / area?", "Comments"]
+    assert entries[-1]["source"] == "responses"
+    kept = question_catalog(None, ["New question"], entries)
+    assert [entry["text"] for entry in kept] == [entry["text"] for entry in entries[:3]] + ["New question"]
+
+
+def test_catalog_is_rewritten_only_when_it_changes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "survey_5.db"))
+    entries = question_catalog(DEFINITION, [], [])
+    assert store_catalog(conn, entries)
+    assert not store_catalog(conn, load_catalog(conn))
+    assert load_catalog(conn) == entries
+    assert store_catalog(conn, entries[:2])
+    assert column_descriptions(load_catalog(conn)) == {"how_old_are_you": "How old are you?", "do_you_agree": "Do you agree?"}
+    assert order_columns(["extra", "do_you_agree", "how_old_are_you"], load_catalog(conn)) == [
+        "how_old_are_you", "do_you_agree", "extra"
+    ]
+    assert describe_columns(["extra", "do_you_agree"], load_catalog(conn)) == [
+        {"column_name": "do_you_agree", "text": "Do you agree?", "question_type": "choice"},
+        {"column_name": "extra", "text": None, "question_type": None}
+    ]
+    assert load_catalog(sqlite3.connect(str(tmp_path / "legacy.db"))) == []
@@ -0,0 +1,220 @@
+import sqlite3
+
+import pytest
+
+from helpers import graph
+from helpers.graph import BarChart, LineChart, PieChart, ScatterChart, SQLSource, RowSource, ChartJSGenerator
+from helpers.downsample import lttb, grid_sample
+from helpers.cache import SharedCache
+from helpers.column_profiler import profile_columns
+
+
+COLUMNS = ["district", "age", "score", "answer"]
+ROWS = [
+    ("north", str(18 + i % 60), str(i % 5 + 1), "yes" if i % 3 else "no")
+    for i in range(200)
+] + [("south", str(30 + i % 7), str(i % 4 + 2), "yes") for i in range(50)]
+
+
+@pytest.fixture(params=["sql", "rows"])
+def source(request):
+    if request.param == "rows":
+        return RowSource(rows())
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE survey (district TEXT, age TEXT, score TEXT, answer TEXT)")
+    conn.executemany("INSERT INTO survey VALUES (?, ?, ?, ?)", ROWS)
+    return SQLSource('SELECT * FROM "survey";', lambda sql, params: conn.execute(sql, params).fetchall())
+
+
+def rows(source=None):
+    return [dict(zip(COLUMNS, row)) for row in ROWS]
+
+
+def counts(config):
+    return dict(zip(config["data"]["labels"], config["data"]["datasets"][0]["data"]))
+
+
+def test_bar_counts_match_python_path(source):
+    chart = BarChart(x_column="district", y_column=None, title="t", color_column=None)
+    aggregated = chart.aggregate_config(source)
+    assert counts(aggregated) == counts(chart.to_chartjs_config(rows(source)))
+    assert aggregated["data"]["labels"][0] == "north"
+
+
+def test_numeric_bar_with_many_values_becomes_histogram(source):
+    chart = BarChart(x_column="age", y_column=None, title="t", color_column=None)
+    config = chart.aggregate_config(source)
+    values = config["data"]["datasets"][0]["data"]
+    assert len(values) == 20
+    assert sum(values) == 250
+    assert config["data"]["labels"][0].startswith("18")
+
+
+def test_line_series_are_averaged_per_label(source):
+    chart = LineChart(x_column="answer", y_column="score", title="t", color_column="district")
+    config = chart.aggregate_config(source)
+    assert config["data"]["labels"] == ["no", "yes"]
+    north, south = config["data"]["datasets"]
+    assert (north["label"], south["label"]) == ("north", "south")
+    assert south["data"][0] is None
+    assert south["data"][1] == pytest.approx(3.46)
+
+
+def test_line_without_series_averages_repeated_labels(source):
+    chart = LineChart(x_column="district", y_column="score", title="t", color_column=None)
+    config = chart.aggregate_config(source)
+    assert config["data"]["labels"] == ["north", "south"]
+    assert config["data"]["datasets"][0]["data"] == [pytest.approx(3.0), pytest.approx(3.46)]
+
+
+def test_large_sql_scatter_is_sampled_before_it_reaches_python(monkeypatch):
+    monkeypatch.setattr(graph, "CHART_MAX_POINTS", 100)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE points (x REAL, y REAL)")
+    conn.executemany("INSERT INTO points VALUES (?, ?)", [(i, i % 17) for i in range(20000)])
+    fetched = []
+
+    def run(sql, params):
+        fetched.append(conn.execute(sql, params).fetchall())
+        return fetched[-1]
+
+    chart = ScatterChart(x_column="x", y_column="y", title="t", color_column=None)
+    config = chart.aggregate_config(SQLSource("SELECT * FROM points", run))
+    assert max(len(rows) for rows in fetched) < 1000
+    assert len(config["data"]["datasets"][0]["data"]) <= 100
+    assert config["metadata"]["original_points"] == 20000
+
+
+def test_bar_with_y_totals_each_label_and_is_capped(source, monkeypatch):
+    chart = BarChart(x_column="district", y_column="score", title="t", color_column=None)
+    assert counts(chart.aggregate_config(source)) == {"north": 600, "south": 173}
+    monkeypatch.setattr(graph, "CHART_MAX_POINTS", 1)
+    assert counts(chart.aggregate_config(source)) == {"north": 600}
+
+
+class RecordingSystem:
+    def create_visualizations(self, data, columns, user_query, recommendations, source, on_chart):
+        self.source = source
+        return {}
+
+
+def test_large_query_results_are_charted_in_sqlite(monkeypatch):
+    from contextlib import contextmanager
+    from helpers import processor as processor_module
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE survey (district TEXT, age TEXT, score TEXT, answer TEXT)")
+    conn.executemany("INSERT INTO survey VALUES (?, ?, ?, ?)", ROWS)
+    processor = processor_module.SQLProcessor.__new__(processor_module.SQLProcessor)
+    processor.visualization_system = RecordingSystem()
+    processor.reader = contextmanager(lambda: (yield conn))
+    result = {"success": True, "data": rows(), "columns": COLUMNS, "query_executed": "SELECT * FROM survey"}
+
+    processor.create_visualizations(result, "q")
+    assert isinstance(processor.visualization_system.source, RowSource)
+    monkeypatch.setattr(processor_module, "QUERY_CACHE_MAX_ROWS", 100)
+    processor.create_visualizations(result, "q")
+    source = processor.visualization_system.source
+    assert isinstance(source, SQLSource)
+    assert source.category_counts("district") == (["north", "south"], [200, 50])
+
+
+def test_pie_totals_group_names(source):
+    chart = PieChart(values_column="score", names_column="district", title="t")
+    assert counts(chart.aggregate_config(source)) == {"north": 600, "south": 173}
+
+
+def test_scatter_matches_python_path(source):
+    chart = ScatterChart(x_column="age", y_column="score", title="t", color_column="district")
+    assert chart.aggregate_config(source) == chart.to_chartjs_config(rows(source))
+
+
+def test_non_numeric_values_fall_back_and_fail_like_python(source):
+    chart = LineChart(x_column="district", y_column="answer", title="t", color_column="district")
+    assert ChartJSGenerator.generate_chart_config(rows(source), chart, source) is None
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    values = [0.0] * 10000
+    values[4321] = 50.0
+    kept = lttb(values, 100)
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 9999
+    assert 4321 in kept
+
+
+def test_grid_sample_is_bounded_and_keeps_small_groups():
+    x = list(range(20000))
+    y = [i % 97 for i in x]
+    groups = ["rare" if i == 12345 else "common" for i in x]
+    kept = grid_sample(x, y, 500, groups)
+    assert len(kept) == 500
+    assert 12345 in kept
+    assert list(kept) == sorted(kept)
+
+
+def test_large_line_and_scatter_charts_are_downsampled(monkeypatch):
+    monkeypatch.setattr(graph, "CHART_MAX_POINTS", 300)
+    data = [{"x": i, "y": (i * 7919) % 1000, "group": "a" if i % 2 else "b"} for i in range(5000)]
+    line = LineChart(x_column="x", y_column="y", title="t", color_column=None).to_chartjs_config(data)
+    assert len(line["data"]["labels"]) == len(line["data"]["datasets"][0]["data"]) == 300
+    assert line["metadata"] == {"original_points": 5000, "points": 300, "sampling": "lttb"}
+
+    scatter = ScatterChart(x_column="x", y_column="y", title="t", color_column="group").to_chartjs_config(data)
+    assert sum(len(dataset["data"]) for dataset in scatter["data"]["datasets"]) == 300
+    assert scatter["metadata"]["original_points"] == 5000
+
+    small = ScatterChart(x_column="x", y_column="y", title="t", color_column=None).to_chartjs_config(data[:100])
+    assert "metadata" not in small
+
+
+class CountingLLM:
+    def __init__(self, llm):
+        self.llm = llm
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return self.llm.invoke(prompt)
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER_CHART_RECOMMENDATION", "stub")
+    monkeypatch.setattr(graph, "shared_cache", SharedCache(str(tmp_path / "cache.db"), enabled=True))
+    analyzer = graph.DataAnalyzer()
+    analyzer.llm = CountingLLM(analyzer.llm)
+    return analyzer
+
+
+def test_recommendations_are_reused_for_the_same_shape_and_question(analyzer):
+    data = [{"district": "north", "score": 3}] * 120
+    first, _ = analyzer.recommend_visualizations(data, ["district", "score"], "Scores by district?")
+    second, _ = analyzer.recommend_visualizations(data[:150], ["district", "score"], "scores  by district")
+    assert analyzer.llm.calls == 1
+    assert second == first
+
+    analyzer.recommend_visualizations(data[:5], ["district", "score"], "scores by district")
+    analyzer.recommend_visualizations(data, ["district", "score"], "scores by region")
+    assert analyzer.llm.calls == 3
+
+
+def test_cached_recommendations_are_dropped_when_columns_are_missing(analyzer):
+    data = [{"district": "north", "score": 3}]
+    first, _ = analyzer.recommend_visualizations(data, ["district", "score"], "q")
+    signature = graph.recommendation_signature({"district": "categorical", "score": "numerical"}, 1, "q")
+    assert analyzer.cached_recommendations(signature, ["score"]) is None
+    assert graph.shared_cache.get("visualization", signature) is None
+
+
+def test_profile_orders_numeric_labels_and_guides_fallback(source):
+    data = rows(source)
+    profile = profile_columns(data, ["district", "age", "score", "answer"])
+    chart = BarChart(x_column="score", y_column=None, title="t", color_column=None)
+    assert chart.aggregate_config(source, profile)["data"]["labels"] == ["1", "2", "3", "4", "5"]
+
+    info = graph.DataAnalyzer.analyze_data(None, data, ["district", "age", "score", "answer"])
+    assert info["numerical_columns"] == ["age", "score"]
+    fallback = graph.DataAnalyzer._fallback_recommendations(None, info).recommendations
+    assert [chart.chart_type for chart in fallback] == ["scatter", "bar"]
+    assert fallback[1].x_column == "district"
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from helpers.coalesce import Coalescer
+from helpers.metrics import coalesced_waiters
+
+
+def test_identical_calls_share_one_computation():
+    coalescer = Coalescer("test_coalescing")
+    runs = []
+
+    async def compute(value):
+        runs.append(value)
+        await asyncio.sleep(0.05)
+        return {"value": value}
+
+    async def burst():
+        same = [coalescer.run("q", lambda: compute(1)) for _ in range(5)]
+        other = coalescer.run("r", lambda: compute(2))
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(burst())
+    assert runs == [1, 2]
+    assert results[:5] == [{"value": 1}] * 5 and results[5] == {"value": 2}
+    # Finished computations are forgotten, so a later call runs again
+    assert asyncio.run(coalescer.run("q", lambda: compute(3))) == {"value": 3}
+    assert "surveybot_coalesced_waiters_sum{name=\"test_coalescing\"} 4" in "\n".join(coalesced_waiters.render())
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    coalescer = Coalescer("test_coalescing_errors")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    async def burst():
+        return await asyncio.gather(*[coalescer.run("q", fail) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(error, RuntimeError) for error in asyncio.run(burst()))
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.run("q", fail))
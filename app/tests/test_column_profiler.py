@@ -0,0 +1,45 @@
+from helpers import column_profiler
+from helpers.column_profiler import profile_columns, describe_column
+
+
+def test_numeric_text_dates_and_nulls_are_profiled_over_all_rows():
+    data = [
+        {"contact_id": str(i), "score": str(i % 5 + 1), "submitted": f"2024-03-{i % 28 + 1:02d}",
+         "district": None if i % 4 == 0 else "north"}
+        for i in range(400)
+    ]
+    data[0]["score"] = "n/a"
+    profile = profile_columns(data, ["contact_id", "score", "submitted", "district"])
+    columns = profile["columns"]
+    assert columns["score"]["kind"] == "numerical"
+    assert columns["score"]["numeric_share"] == round(399 / 400, 4)
+    assert (columns["score"]["min"], columns["score"]["max"]) == (1.0, 5.0)
+    assert columns["submitted"]["kind"] == "datetime"
+    assert columns["district"]["kind"] == "categorical"
+    assert columns["district"]["null_share"] == 0.25
+    assert columns["contact_id"]["unique"] and not columns["score"]["unique"]
+    assert describe_column("score", columns["score"]) == "score(numerical, 6 distinct, range 1–5)"
+
+
+def test_large_results_are_sampled():
+    data = [{"value": str(i)} for i in range(50000)]
+    profile = profile_columns(data, ["value"], limit=1000)
+    assert profile["rows"] == 50000
+    assert profile["sampled_rows"] == 1000
+    assert profile["columns"]["value"]["distinct"] == 1000
+
+
+def test_empty_result():
+    profile = profile_columns([], ["value"])
+    assert profile["columns"]["value"]["kind"] == "empty"
+
+
+def test_high_cardinality_text_parses_only_the_most_common_values(monkeypatch):
+    monkeypatch.setattr(column_profiler, "PROFILE_MAX_DISTINCT", 50)
+    parsed = []
+    monkeypatch.setattr(column_profiler, "parse_number", lambda value: parsed.append(value))
+    values = tuple(["yes"] * 500 + [f"person {i}" for i in range(2000)])
+    profile = column_profiler.profile_column(values)
+    assert len(parsed) == 50 and parsed[0] == "yes"
+    assert profile["distinct"] == 2001
+    assert profile["kind"] == "categorical"
@@ -0,0 +1,50 @@
+import sqlite3
+
+from helpers import dashboard
+from helpers.cache import SharedCache
+
+
+def make_survey(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE survey_9 (contact_id TEXT PRIMARY KEY, name TEXT, is_anonymous BOOLEAN, '
+                 'rating TEXT, district TEXT, attended TEXT, comment TEXT, submitted TEXT)')
+    conn.executemany("INSERT INTO survey_9 VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        (f"c{i}", "n", i % 3 == 0, str(i % 10 + 1) if i % 7 else None, f"district {i % 12}",
+         "yes" if i % 2 else "no", f"free text {i}", f"2024-05-{i % 9 + 1:02d}")
+        for i in range(300)
+    ])
+    conn.commit()
+    return conn
+
+
+def test_dashboard_picks_a_chart_per_question_type(tmp_path):
+    conn = make_survey(str(tmp_path / "survey_9.db"))
+    built = dashboard.build_dashboard(conn, 9, "survey_9", 3)
+    assert built["summary"]["total_responses"] == 300
+    assert built["summary"]["anonymous_responses"] == 100
+    charts = {chart["question"]: chart for chart in built["charts"]}
+    assert charts[None]["config"]["data"]["labels"] == ["Named", "Anonymous"]
+    assert charts["rating"]["chart_type"] == "bar"
+    assert charts["rating"]["config"]["data"]["labels"] == [str(i) for i in range(1, 11)]
+    assert charts["district"]["chart_type"] == "bar"
+    assert charts["attended"]["chart_type"] == "doughnut"
+    assert charts["submitted"]["chart_type"] == "line"
+    assert "comment" not in charts
+
+
+def test_stored_dashboard_is_served_and_older_snapshots_are_built_on_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard, "shared_cache", SharedCache(str(tmp_path / "cache.db"), enabled=True))
+    stored_path = str(tmp_path / "survey_9.db")
+    conn = make_survey(stored_path)
+    dashboard.precompute_dashboard(conn, 9, "survey_9", 1)
+    conn.commit()
+    conn.close()
+    loaded = dashboard.load_dashboard(stored_path, 9, "survey_9")
+    assert loaded["data_version"] == 1
+
+    legacy_path = str(tmp_path / "legacy" / "survey_9.db")
+    (tmp_path / "legacy").mkdir()
+    make_survey(legacy_path).close()
+    built = dashboard.load_dashboard(legacy_path, 9, "survey_9")
+    assert built["summary"]["total_responses"] == 300
+    assert dashboard.shared_cache.stats()["entries"]["dashboard"] == 1
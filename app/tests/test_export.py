@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from helpers.export import ExportError, validate_export, export_stream
+
+
+@pytest.fixture
+def survey(tmp_path):
+    path = str(tmp_path / "survey_4.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE survey_4 (contact_id TEXT PRIMARY KEY, name TEXT, is_anonymous BOOLEAN, "q, one" TEXT)')
+    conn.executemany("INSERT INTO survey_4 VALUES (?, ?, ?, ?)",
+                     [(f"c{i}", f"Name {i}", i % 2, f'answer "{i}"\nline') for i in range(25)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_csv_export_streams_in_chunks(survey):
+    columns = validate_export(survey, "survey_4", "csv")
+    chunks = list(export_stream(survey, "survey_4", "csv", columns, chunk_rows=10))
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == ["contact_id", "name", "is_anonymous", "q, one"]
+    assert rows[1] == ["c0", "Name 0", "0", 'answer "0"\nline']
+    assert len(rows) == 26
+
+
+def test_ndjson_export_of_selected_columns(survey):
+    columns = validate_export(survey, "survey_4", "ndjson", ["q, one", "contact_id"])
+    lines = b"".join(export_stream(survey, "survey_4", "ndjson", columns, chunk_rows=7)).decode().splitlines()
+    assert len(lines) == 25
+    assert json.loads(lines[3]) == {"q, one": 'answer "3"\nline', "contact_id": "c3"}
+
+
+def test_invalid_requests_fail_before_streaming(survey):
+    with pytest.raises(ExportError):
+        validate_export(survey, "survey_4", "xlsx")
+    with pytest.raises(ExportError):
+        validate_export(survey, "survey_4", "csv", ["missing"])
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_arrow_formats_round_trip(survey, format):
+    columns = validate_export(survey, "survey_4", format)
+    data = b"".join(export_stream(survey, "survey_4", format, columns, chunk_rows=10))
+    if format == "parquet":
+        table = pq.read_table(pa.BufferReader(data))
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 25
+    assert table.schema.field("is_anonymous").type == pa.bool_()
+    assert table.slice(3, 1).to_pylist() == [
+        {"contact_id": "c3", "name": "Name 3", "is_anonymous": True, "q, one": 'answer "3"\nline'}
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from routers import survey
+from helpers.snapshots import snapshots
+from helpers.http_cache import snapshot_validators, is_not_modified
+
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def ingest(base_path):
+    with snapshots.build(base_path) as side_path:
+        conn = sqlite3.connect(side_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS survey_3 (contact_id TEXT PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+
+
+def test_validators_follow_the_data_version(tmp_path):
+    base_path = str(tmp_path / "survey_3.db")
+    assert snapshot_validators(base_path) is None
+    ingest(base_path)
+    first = snapshot_validators(base_path)
+    assert first["ETag"].startswith('"v1-')
+    assert is_not_modified({"if-none-match": first["ETag"]}, first)
+    assert is_not_modified({"if-none-match": f'"other", W/{first["ETag"]}'}, first)
+    # Two publishes within a second share Last-Modified, so only the ETag can answer 304
+    assert not is_not_modified({"if-modified-since": first["Last-Modified"]}, first)
+    assert is_not_modified({"if-modified-since": first["Last-Modified"]}, {"Last-Modified": first["Last-Modified"]})
+    assert not is_not_modified({}, first)
+
+    ingest(base_path)
+    second = snapshot_validators(base_path)
+    assert second["ETag"].startswith('"v2-')
+    assert not is_not_modified({"if-none-match": first["ETag"]}, second)
+
+
+def test_matching_etag_is_answered_without_loading(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "survey_3.db")
+    ingest(base_path)
+    monkeypatch.setattr(survey.storage, "survey_path", lambda survey_id: base_path)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {"success": True}
+
+    fresh = asyncio.run(survey.conditional_get(FakeRequest({}), 3, load))
+    assert fresh.status_code == 200 and fresh.headers["cache-control"].startswith("public")
+    cached = asyncio.run(survey.conditional_get(FakeRequest({"if-none-match": fresh.headers["etag"]}), 3, load))
+    assert cached.status_code == 304 and cached.headers["etag"] == fresh.headers["etag"]
+    assert loads == [1]
+
+
+@pytest.mark.parametrize("endpoint", [survey.get_survey_questions, survey.get_survey_summary])
+def test_unknown_survey_is_not_found(tmp_path, monkeypatch, endpoint):
+    monkeypatch.setattr(survey.storage, "survey_path", lambda survey_id: str(tmp_path / "survey_404.db"))
+    monkeypatch.setattr(survey, "get_data_from_api", lambda survey_id: None)
+    with pytest.raises(HTTPException) as raised:
+        # Skip the rate limit decorator, which needs a real Starlette request
+        asyncio.run(endpoint.__wrapped__(FakeRequest({}), 404))
+    assert raised.value.status_code == 404
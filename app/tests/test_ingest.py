@@ -0,0 +1,20 @@
+from helpers.fetcher import anonymous_ids
+
+
+def answers(*pairs, **fields):
+    return [dict({"question": question, "surAnswer": answer}, **fields) for question, answer in pairs]
+
+
+def test_anonymous_answers_are_grouped_by_submission_id():
+    entries = (answers(("q1", "a"), ("q2", "b"), responseId=17)
+               + answers(("q1", "c"), contactId="c1", name="Ann")
+               + answers(("q1", "d"), ("q2", "e"), submissionId="s9"))
+    assert anonymous_ids(entries) == ["anon_17", "anon_17", None, "anon_s9", "anon_s9"]
+
+
+def test_derived_ids_split_on_repeated_questions_and_are_stable():
+    entries = answers(("q1", "a"), ("q2", "b"), ("q1", "a"), ("q2", "b"), ("q1", "c"))
+    ids = anonymous_ids(entries)
+    assert ids[0] == ids[1] and ids[2] == ids[3] and len(set(ids)) == 3
+    assert ids[2] == ids[0] + "_2"
+    assert anonymous_ids([dict(entry) for entry in entries]) == ids
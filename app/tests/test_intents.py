@@ -0,0 +1,85 @@
+from helpers import fetcher
+from helpers.intents import IntentMatcher
+
+COLUMNS = [
+    "contact_id", "name", "is_anonymous",
+    "what_is_your_age", "how_satisfied_are_you_with_the_service", "which_district_do_you_live_in",
+]
+
+
+def make_matcher():
+    return IntentMatcher("survey_1", COLUMNS, numeric_columns=["what_is_your_age"])
+
+
+def test_all_and_count_intents():
+    matcher = make_matcher()
+    assert matcher.match("Give me all the responses")["sql"] == 'SELECT * FROM "survey_1"'
+    assert matcher.match("How many responses are there?")["intent"] == "count_responses"
+    assert matcher.match("number of anonymous responses")["intent"] == "count_anonymous"
+    assert matcher.match("anonymous vs named")["intent"] == "anonymous_split"
+
+
+def test_question_intents_resolve_columns():
+    matcher = make_matcher()
+    found = matcher.match("Show the distribution of which district do you live in")
+    assert found["intent"] == "distribution"
+    assert found["column"] == "which_district_do_you_live_in"
+
+    found = matcher.match("What is the average age?")
+    assert found["intent"] == "average"
+    assert found["column"] == "what_is_your_age"
+
+    found = matcher.match("average of what is your age")
+    assert found["intent"] == "average"
+    assert found["column"] == "what_is_your_age"
+
+
+def test_unrecognized_questions_fall_back():
+    matcher = make_matcher()
+    assert matcher.match("Which respondents over 30 were unsatisfied?") is None
+    assert matcher.match("distribution of favourite planet") is None
+    assert matcher.match("") is None
+
+
+def test_average_needs_a_numeric_column():
+    # Averaging free text answers would CAST them to 0
+    matcher = IntentMatcher("survey_1", COLUMNS, numeric_columns=[])
+    assert matcher.match("What is the average age?") is None
+    assert matcher.match("average of how satisfied are you with the service") is None
+    assert make_matcher().match("average of how satisfied are you with the service") is None
+    assert matcher.match("distribution of what is your age")["intent"] == "distribution"
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_ingested_numeric_answers_get_the_average_fast_path(monkeypatch):
+    from helpers.processor import SQLProcessor
+
+    entries = [
+        entry
+        for i in range(20)
+        for entry in (
+            {"contactId": f"c{i}", "name": f"P{i}", "question": "What is your age?", "surAnswer": str(20 + i)},
+            {"contactId": f"c{i}", "name": f"P{i}", "question": "Which district do you live in?", "surAnswer": "North"},
+        )
+    ]
+    responses = {"data": {"meta": {"lastPage": 1}, "data": entries}}
+    monkeypatch.setattr(fetcher.http_session, "get", lambda url, headers=None: FakeResponse(
+        responses if "responses/all" in url else {"success": False}
+    ))
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    fetcher.fetch_all_survey_responses({}, 26, fetcher.storage.survey_path(26))
+
+    matcher = SQLProcessor(26).intent_matcher
+    assert matcher.numeric_columns == ["what_is_your_age"]
+    assert matcher.match("What is the average age?")["column"] == "what_is_your_age"
+    assert matcher.match("average of which district do you live in") is None
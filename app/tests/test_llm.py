@@ -0,0 +1,21 @@
+from helpers.graph import DataAnalyzer
+from helpers.llm import get_llm
+
+
+def test_stub_provider_is_selected_per_stage(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("LLM_PROVIDER_SQL_REPAIR", "stub")
+    repair = get_llm("sql_repair")
+    assert repair._llm_type == "stub"
+    prompt = "Original query:\nSELECT * FROM \"survey_1\"\n\nRules:\n1. ..."
+    assert repair.invoke(prompt) == 'SELECT * FROM "survey_1"'
+
+
+def test_stub_chart_recommendation_parses(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    analyzer = DataAnalyzer()
+    data = [{"district": "a", "age": 20}, {"district": "b", "age": 30}]
+    recommendation, _ = analyzer.recommend_visualizations(data, ["district", "age"], "where do people live")
+    assert recommendation.reasoning == "Deterministic stub recommendation"
+    assert recommendation.recommendations[0].chart_type == "bar"
+    assert recommendation.recommendations[0].x_column == "district"
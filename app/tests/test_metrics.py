@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+
+from fastapi.responses import StreamingResponse
+
+from helpers import metrics
+from helpers.metrics import Histogram, Counter, span, start_trace, end_trace, record_llm_call
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test counter")
+    counter.inc(handler='say "hi"')
+    assert 'test_total{handler="say \\"hi\\""} 1' in counter.render()
+
+
+def test_spans_and_llm_calls_land_in_current_trace():
+    trace, token = start_trace()
+    try:
+        with span("sql_generation"):
+            record_llm_call("sql_generation")
+        with span("sql_generation"):
+            pass
+        with span("chart_build"):
+            pass
+    finally:
+        end_trace(token)
+    assert trace.llm_calls == 1
+    assert set(trace.totals()) == {"sql_generation", "chart_build"}
+    assert trace.server_timing().startswith("sql_generation;dur=")
+
+
+class FakeRequest:
+    method = "GET"
+
+    def __init__(self, endpoint):
+        self.scope = {"endpoint": endpoint}
+
+
+def test_streamed_requests_are_observed_when_the_body_finishes(monkeypatch):
+    import main
+
+    observed = {}
+    for name in ("request_seconds", "llm_calls_per_request", "response_bytes"):
+        monkeypatch.setattr(getattr(metrics, name), "observe",
+                            lambda value, name=name, **labels: observed.setdefault(name, (value, labels)))
+
+    async def call_next(request):
+        # The app streams from its own task, which copied the request context
+        context = contextvars.copy_context()
+
+        async def body():
+            yield b"sql\n"
+            await asyncio.sleep(0.05)
+            context.run(record_llm_call, "visualization")
+            yield b"charts\n"
+
+        return StreamingResponse(body())
+
+    def process_query_stream():
+        pass
+
+    async def run():
+        response = await main.trace_requests(FakeRequest(process_query_stream), call_next)
+        assert observed == {}
+        return [chunk async for chunk in response.body_iterator]
+
+    assert asyncio.run(run()) == [b"sql\n", b"charts\n"]
+    assert observed["request_seconds"][0] >= 0.05
+    assert observed["request_seconds"][1] == {"handler": "process_query_stream"}
+    assert observed["llm_calls_per_request"][0] == 1
+    assert observed["response_bytes"][0] == 11
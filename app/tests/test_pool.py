@@ -0,0 +1,93 @@
+import time
+import sqlite3
+import threading
+
+import pytest
+
+from helpers import pool as pool_module
+from helpers.pool import ConnectionPool, get_pool, close_pool, start_idle_reaper, pooled_reader, pooled_writer
+
+
+def make_db(tmp_path):
+    db_path = str(tmp_path / "survey_1.db")
+    pool = ConnectionPool(db_path, max_readers=2, idle_timeout=60)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE survey_1 (contact_id TEXT PRIMARY KEY, answer TEXT)")
+        conn.executemany("INSERT INTO survey_1 VALUES (?, ?)", [(str(i), "yes") for i in range(100)])
+    return pool
+
+
+def test_readers_are_read_only_and_shared_across_threads(tmp_path):
+    pool = make_db(tmp_path)
+    results = []
+
+    def work():
+        with pool.reader() as conn:
+            results.append(conn.execute("SELECT COUNT(*) FROM survey_1").fetchone()[0])
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [100] * 8
+    stats = pool.stats()
+    assert stats["checkouts"] == 8
+    assert stats["readers_created"] <= 2
+
+    with pool.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM survey_1")
+    pool.close()
+
+
+def test_idle_readers_are_closed(tmp_path):
+    pool = make_db(tmp_path)
+    with pool.reader():
+        pass
+    assert pool.stats()["idle_readers"] == 1
+    pool.idle_timeout = 0
+    pool.close_idle()
+    assert pool.stats()["open_readers"] == 0
+    pool.close()
+
+
+def test_reaper_closes_readers_of_pools_nobody_checks_out(tmp_path):
+    make_db(tmp_path).close()
+    pool = get_pool(str(tmp_path / "survey_1.db"))
+    with pool.reader():
+        pass
+    pool.idle_timeout = 0
+    stop = start_idle_reaper(0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while pool.stats()["open_readers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()["open_readers"] == 0
+    finally:
+        stop.set()
+        close_pool(pool.db_path)
+
+
+def test_pools_evicted_before_checkout_are_looked_up_again(tmp_path, monkeypatch):
+    make_db(tmp_path).close()
+    db_path = str(tmp_path / "survey_1.db")
+    evicted = get_pool(db_path)
+    close_pool(db_path)
+    lookups = []
+    real_get_pool = pool_module.get_pool
+
+    def stale_first(path):
+        # The first lookup hands out a pool that LRU eviction closes before the checkout
+        lookups.append(path)
+        return evicted if len(lookups) == 1 else real_get_pool(path)
+
+    monkeypatch.setattr(pool_module, "get_pool", stale_first)
+    with pooled_writer(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS t (x)")
+    lookups.clear()
+    with pooled_reader(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+    assert len(lookups) == 2
+    close_pool(db_path)
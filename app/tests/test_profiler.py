@@ -0,0 +1,71 @@
+import pytest
+from fastapi import HTTPException
+
+from helpers import profiler
+from routers import survey
+from helpers.profiler import ProfileStore, profiled, request_profile, end_request
+
+
+def busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_profiles_are_stored_and_capped(tmp_path):
+    store = ProfileStore(str(tmp_path), max_retained=2)
+    ids = []
+    for _ in range(3):
+        with store.profile("test") as profile_id:
+            busy_work()
+        ids.append(profile_id)
+    listed = [entry["id"] for entry in store.list()]
+    assert len(listed) == 2
+    assert ids[0] not in listed
+    assert "busy_work" in store.report(ids[-1])
+    assert store.get("../etc") is None
+
+
+def test_only_one_profile_runs_at_a_time(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    with store.profile("outer") as outer:
+        with store.profile("inner") as inner:
+            pass
+    assert outer is not None and inner is None
+    assert store.skipped == 1
+
+
+def test_profiled_runs_only_for_requested_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "profiles", ProfileStore(str(tmp_path)))
+    work = profiled("work")(busy_work)
+
+    work()
+    assert profiler.profiles.list() == []
+
+    holder, token = request_profile({"path": "/test"})
+    try:
+        work()
+    finally:
+        end_request(token)
+    assert len(holder["ids"]) == 1
+    assert profiler.profiles.get(holder["ids"][0])["context"] == {"path": "/test"}
+
+
+class FakeRequest:
+    def __init__(self, headers, query_params):
+        self.headers = headers
+        self.query_params = query_params
+
+
+def test_admin_token_is_only_accepted_from_the_header(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_ADMIN_TOKEN", "secret")
+    survey.require_admin(FakeRequest({"X-Profile-Token": "secret"}, {}))
+    with pytest.raises(HTTPException) as raised:
+        survey.require_admin(FakeRequest({}, {"profile_token": "secret"}))
+    assert raised.value.status_code == 403
+
+
+def test_non_ascii_tokens_are_rejected_not_errors(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_ADMIN_TOKEN", "secret")
+    assert not profiler.is_admin("sécret")
+    with pytest.raises(HTTPException) as raised:
+        survey.require_admin(FakeRequest({"X-Profile-Token": "sécret"}, {}))
+    assert raised.value.status_code == 403
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+
+from helpers.pool import get_pool
+from helpers import replica
+from helpers.replica import ReplicaManager
+from helpers.snapshots import snapshots
+
+
+def make_db(tmp_path, rows):
+    db_path = str(tmp_path / "survey_1.db")
+    with snapshots.build(db_path) as side_path, get_pool(side_path).writer() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS survey_1 (contact_id TEXT PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO survey_1 VALUES (?)", [(str(i),) for i in range(rows)])
+    return db_path
+
+
+def count(manager, db_path):
+    with manager.reader(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM survey_1").fetchone()[0]
+
+
+def test_hot_survey_is_served_from_memory_and_swapped_after_ingest(tmp_path):
+    db_path = make_db(tmp_path, 10)
+    manager = ReplicaManager(enabled=True, budget_bytes=10 * 1024 * 1024, admit_after=2)
+
+    manager.record_access(db_path)
+    assert manager.stats()["replicas"] == []
+    manager.record_access(db_path)
+    manager.wait_for_loads()
+    assert manager.reader_pool(db_path).reader_uri.startswith("file:replica_")
+    assert count(manager, db_path) == 10
+
+    with manager.reader(db_path) as in_flight:
+        make_db(tmp_path, 20)
+        manager.refresh(db_path)
+        # The in-flight reader keeps seeing the previous copy
+        assert in_flight.execute("SELECT COUNT(*) FROM survey_1").fetchone()[0] == 10
+    assert count(manager, db_path) == 20
+    assert manager.stats()["refreshes"] == 1
+
+
+def test_surveys_over_budget_are_not_admitted(tmp_path):
+    db_path = make_db(tmp_path, 10)
+    manager = ReplicaManager(enabled=True, budget_bytes=1, admit_after=1)
+    manager.record_access(db_path)
+    manager.wait_for_loads()
+    assert manager.stats()["rejections"] == 1
+    assert not manager.reader_pool(db_path).reader_uri.startswith("file:replica_")
+
+
+def test_workers_that_did_not_ingest_reload_their_replica(tmp_path):
+    db_path = make_db(tmp_path, 10)
+    ingesting, other = (ReplicaManager(enabled=True, budget_bytes=10 * 1024 * 1024, admit_after=1) for _ in range(2))
+    for manager in (ingesting, other):
+        manager.record_access(db_path)
+        manager.wait_for_loads()
+
+    make_db(tmp_path, 20)
+    ingesting.refresh(db_path)
+    assert not other.reader_pool(db_path).reader_uri.startswith("file:replica_")
+    other.record_access(db_path)
+    other.wait_for_loads()
+    assert other.reader_pool(db_path).reader_uri.startswith("file:replica_")
+    assert count(other, db_path) == 20
+    assert other.stats()["refreshes"] == 1
+
+
+def test_reads_do_not_wait_for_a_replica_to_load(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path, 10)
+    manager = ReplicaManager(enabled=True, budget_bytes=10 * 1024 * 1024, admit_after=1)
+    copying, release = threading.Event(), threading.Event()
+
+    class SlowReplica(replica.Replica):
+        def __init__(self, *args):
+            copying.set()
+            release.wait(5)
+            super().__init__(*args)
+
+    monkeypatch.setattr(replica, "Replica", SlowReplica)
+    manager.record_access(db_path)
+    assert copying.wait(5)
+    # The copy is in progress: this request and other reads are served from disk meanwhile
+    assert count(manager, db_path) == 10
+    release.set()
+    manager.wait_for_loads()
+    assert manager.reader_pool(db_path).reader_uri.startswith("file:replica_")
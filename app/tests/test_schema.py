@@ -0,0 +1,30 @@
+from helpers.schema import CompactSchema
+
+COLUMNS = [
+    "contact_id", "name", "is_anonymous",
+    "what_is_your_age", "which_district_do_you_live_in", "what's_your_favourite_meal",
+]
+
+
+def test_aliases_round_trip_outside_string_literals():
+    schema = CompactSchema("survey_1", COLUMNS)
+    real = 'SELECT "what_is_your_age", COUNT(*) FROM survey_1 WHERE "what\'s_your_favourite_meal" = \'q1\' GROUP BY 1'
+    aliased = schema.to_alias(real)
+    assert aliased == 'SELECT "q1", COUNT(*) FROM survey_1 WHERE "q3" = \'q1\' GROUP BY 1'
+    assert schema.to_real(aliased) == real
+    assert schema.to_real("SELECT q2 FROM survey_1") == 'SELECT "which_district_do_you_live_in" FROM survey_1'
+
+
+def test_bare_column_names_are_aliased_but_not_keywords_or_functions():
+    schema = CompactSchema("survey_1", COLUMNS + ["count", "order"])
+    sql = "SELECT count(*), COUNT (Which_District_Do_You_Live_In), count, \"order\" FROM survey_1 ORDER BY count"
+    assert schema.to_alias(sql) == 'SELECT count(*), COUNT (q2), q4, "q5" FROM survey_1 ORDER BY q4'
+
+
+def test_render_prunes_unrelated_columns():
+    schema = CompactSchema("survey_1", COLUMNS)
+    prompt = schema.render("How many people live in each district?")
+    assert "q2: which district do you live in" in prompt
+    assert "q1:" not in prompt
+    assert "2 unrelated question columns omitted" in prompt
+    assert "q1:" in schema.render("something unrelated entirely")
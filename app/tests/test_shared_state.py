@@ -0,0 +1,49 @@
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from helpers.cache import SharedCache
+from helpers.ratelimit import SQLiteStorage
+
+
+def test_sqlite_storage_is_registered_and_enforces_limits(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}")
+    assert isinstance(storage, SQLiteStorage)
+    limiter = FixedWindowRateLimiter(storage)
+    limit = parse("2/minute")
+    assert limiter.hit(limit, "client")
+    assert limiter.hit(limit, "client")
+    assert not limiter.hit(limit, "client")
+    assert limiter.hit(limit, "other")
+
+
+def test_sqlite_storage_counts_are_shared_between_instances(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    first, second = SQLiteStorage(uri), SQLiteStorage(uri)
+    first.incr("key", 60)
+    assert second.incr("key", 60) == 2
+    assert first.get("key") == 2
+
+
+def test_sqlite_storage_window_expires(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path / 'limits.db'}")
+    storage.incr("key", 0)
+    time.sleep(0.01)
+    assert storage.get("key") == 0
+    assert storage.incr("key", 60) == 1
+
+
+def test_shared_cache_ttl_and_cap(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"), enabled=True)
+    cache.set("query", "a", {"rows": [1, 2]})
+    assert cache.get("query", "a") == {"rows": [1, 2]}
+    cache.set("auth", "user", "token", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("auth", "user") is None
+    for key in "bcd":
+        cache.set("query", key, key, max_entries=2)
+    assert cache.get("query", "a") is None
+    assert cache.get("query", "d") == "d"
+    assert cache.stats()["entries"]["query"] == 2
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+
+import pytest
+
+from helpers.pool import get_pool
+from helpers.snapshots import SnapshotStore
+
+
+def ingest(store, base_path, rows):
+    with store.build(base_path) as side_path:
+        with get_pool(side_path).writer() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS survey_1 (contact_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO survey_1 VALUES (?)", [(str(i),) for i in range(rows)])
+
+
+def count(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM survey_1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_publish_is_atomic_and_pinned_readers_keep_old_version(tmp_path):
+    store = SnapshotStore()
+    base_path = str(tmp_path / "survey_1.db")
+    assert not store.exists(base_path)
+
+    ingest(store, base_path, 5)
+    first = store.current_path(base_path)
+    assert first.endswith("survey_1.v1.db") and count(first) == 5
+
+    pinned = store.acquire(base_path)
+    ingest(store, base_path, 8)
+    second = store.current_path(base_path)
+    assert second.endswith("survey_1.v2.db") and count(second) == 8
+    # Retired but still pinned: kept until released
+    assert os.path.exists(pinned) and count(pinned) == 5
+    store.release(pinned)
+    assert not os.path.exists(pinned)
+
+
+def test_failed_build_leaves_current_version_untouched(tmp_path):
+    store = SnapshotStore()
+    base_path = str(tmp_path / "survey_1.db")
+    ingest(store, base_path, 3)
+
+    with pytest.raises(RuntimeError):
+        with store.build(base_path) as side_path:
+            with get_pool(side_path).writer() as conn:
+                conn.execute("DELETE FROM survey_1")
+            raise RuntimeError("API went away")
+
+    assert store.current_version(base_path) == 1
+    assert count(store.current_path(base_path)) == 3
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".building")]
+
+
+def test_versions_pinned_by_another_worker_survive_until_released(tmp_path):
+    # Two stores stand in for two worker processes: they share nothing but the files
+    reader_worker, ingest_worker = SnapshotStore(), SnapshotStore()
+    base_path = str(tmp_path / "survey_1.db")
+    ingest(ingest_worker, base_path, 5)
+
+    pinned = reader_worker.acquire(base_path)
+    ingest(ingest_worker, base_path, 8)
+    ingest(ingest_worker, base_path, 9)
+    assert os.path.exists(pinned) and count(pinned) == 5
+    assert not os.path.exists(ingest_worker.version_path(base_path, 2))
+
+    reader_worker.release(pinned)
+    assert not os.path.exists(pinned)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".pins") and "v3" not in name]
@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_api_import_does_not_load_llm_stack(tmp_path):
+    code = (
+        "import sys, main; "
+        "loaded = [m for m in ('helpers.processor', 'helpers.graph', 'langchain_core') if m in sys.modules]; "
+        "print(','.join(loaded))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, DATA_DIR=str(tmp_path))
+    )
+    assert completed.stdout.strip() == ""
+
+
+def test_api_import_writes_no_files(tmp_path):
+    data_dir = tmp_path / "data"
+    subprocess.run(
+        [sys.executable, "-c", "import main"], cwd=APP_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, DATA_DIR=str(data_dir))
+    )
+    assert not data_dir.exists()
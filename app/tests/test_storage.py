@@ -0,0 +1,20 @@
+from helpers.pool import get_pool
+from helpers.snapshots import snapshots
+from helpers.storage import StorageManager
+
+
+def test_each_survey_gets_its_own_database_and_manifest_entry(tmp_path):
+    manager = StorageManager(str(tmp_path))
+    first, second = manager.survey_path(1), manager.survey_path(2)
+    assert first != second and first.startswith(str(tmp_path))
+
+    for survey_id, rows in ((1, 3), (2, 7)):
+        with snapshots.build(manager.survey_path(survey_id)) as side, get_pool(side).writer() as conn:
+            conn.execute(f"CREATE TABLE survey_{survey_id} (contact_id TEXT PRIMARY KEY)")
+            conn.executemany(f"INSERT INTO survey_{survey_id} VALUES (?)", [(str(i),) for i in range(rows)])
+        manager.record_sync(survey_id)
+
+    entries = {entry["survey_id"]: entry for entry in manager.list_surveys()}
+    assert entries[1]["row_count"] == 3 and entries[2]["row_count"] == 7
+    assert entries[1]["version"] == 1 and entries[1]["size_bytes"] > 0
+    assert manager.get_entry(3) is None
@@ -0,0 +1,49 @@
+import json
+import time
+import asyncio
+
+from routers import survey
+
+
+class StagedProcessor:
+    def process_query_with_visualizations(self, question, include_stats=True, emit=None):
+        emit("sql", {"sql_query": "SELECT n FROM t", "fast_path": None})
+        time.sleep(0.1)
+        if question == "broken":
+            raise RuntimeError("no such column")
+        emit("query_result", {"data": [{"n": i} for i in range(5)], "columns": ["n"], "row_count": 5})
+        emit("chart", {"chart_type": "bar", "title": "n", "config": {}})
+        return {"success": True, "sql_query": "SELECT n FROM t", "visualizations": {"reasoning": "r", "total_charts": 1}}
+
+
+def collect(monkeypatch, question):
+    monkeypatch.setattr(survey, "get_processor", lambda survey_id: StagedProcessor())
+    monkeypatch.setattr(survey, "STREAM_PAGE_ROWS", 2)
+    monkeypatch.setattr(survey, "STREAM_KEEPALIVE_SECONDS", 0.05)
+
+    async def run():
+        return [message async for message in survey.stream_query(1, question)]
+
+    events = []
+    for message in asyncio.run(run()):
+        if message.startswith(":"):
+            events.append(("keep-alive", None))
+            continue
+        event, data = message.strip().split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_stages_are_streamed_in_order_with_paged_rows(monkeypatch):
+    events = [event for event in collect(monkeypatch, "q") if event[0] != "keep-alive"]
+    assert [name for name, _ in events] == ["sql", "rows", "rows", "rows", "chart", "done"]
+    assert events[1][1] == {"row_count": 5, "columns": ["n"], "offset": 0, "rows": [{"n": 0}, {"n": 1}]}
+    assert events[3][1] == {"offset": 4, "rows": [{"n": 4}]}
+    assert events[-1][1]["success"] and events[-1][1]["total_charts"] == 1
+
+
+def test_slow_stages_send_keep_alives_and_failures_end_the_stream(monkeypatch):
+    events = collect(monkeypatch, "broken")
+    assert events[0][0] == "sql"
+    assert ("keep-alive", None) in events
+    assert events[-1][0] == "error" and "no such column" in events[-1][1]["error"]